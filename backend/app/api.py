@@ -1,6 +1,9 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import predictR, trainR, uploadR, visualR
+import asyncio
+from app.routers import lifecycleR, predictR, trainR, uploadR, visualR
+from app.services.registry import rebuild_index
+from app.services.scheduler import scheduler
 
 # Initializes the FastAPI app and includes all routers.
 
@@ -20,6 +23,26 @@ app.include_router(uploadR.router, prefix="/upload", tags=["upload"])
 app.include_router(trainR.router, prefix="/train", tags=["train"])
 app.include_router(predictR.router, prefix="/predict", tags=["predict"])
 app.include_router(visualR.router, prefix="/visualize", tags=["visualize"])
+app.include_router(lifecycleR.router, prefix="/lifecycle", tags=["lifecycle"])
+
+# Index projects and models that were created before the registry existed
+@app.on_event("startup")
+def sync_registry():
+    rebuild_index()
+
+# Prune, archive and clean up stored artifacts in the background
+@app.on_event("startup")
+async def start_lifecycle():
+    app.state.lifecycle_task = asyncio.create_task(lifecycleR.lifecycle_loop())
+
+@app.on_event("shutdown")
+async def stop_lifecycle():
+    app.state.lifecycle_task.cancel()
+
+# Admission control state: running and queued requests, rejections and queue times per class
+@app.get("/scheduler/metrics")
+def scheduler_metrics():
+    return scheduler.metrics()
 
 @app.get("/")
 def read_root():
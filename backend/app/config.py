@@ -6,6 +6,20 @@ MODEL_DIRECTORY = "./app/models/"
 
 PROCESSED_DIRECTORY = "./app/datas/processed/"
 
+LOCK_DIRECTORY = "./app/datas/locks/" # cross-process project/model locks
+
+STAGING_DIRECTORY = "./app/datas/staging/" # models being trained before they are published
+
+REGISTRY_PATH = "./app/datas/registry.db" # metadata index of projects and models
+
+PROFILE_DIRECTORY = "./app/datas/profiles/" # cached dataset profiles, keyed by file content hash
+
+BATCH_DIRECTORY = "./app/datas/batch/" # batch scoring outputs, progress files and part files
+
+ARCHIVE_DIRECTORY = "./app/datas/archive/" # compressed projects and models moved out by the lifecycle manager
+
+LIFECYCLE_REPORT_PATH = "./app/datas/lifecycle.json" # reports of the last lifecycle runs
+
 
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
@@ -13,5 +27,15 @@ os.makedirs(MODEL_DIRECTORY, exist_ok=True)
 
 os.makedirs(PROCESSED_DIRECTORY, exist_ok=True)
 
+os.makedirs(LOCK_DIRECTORY, exist_ok=True)
+
+os.makedirs(STAGING_DIRECTORY, exist_ok=True)
+
+os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+
+os.makedirs(BATCH_DIRECTORY, exist_ok=True)
+
+os.makedirs(ARCHIVE_DIRECTORY, exist_ok=True)
+
 
 
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.services.lifecycle import load_reports, restore_project, run_lifecycle, usage, QUOTAS
+from app.services.scheduler import admit, scheduler
+
+router = APIRouter()
+
+# The background run repeats at this interval; the first run waits a while after startup
+LIFECYCLE_INTERVAL_SECONDS = 6 * 3600
+LIFECYCLE_STARTUP_DELAY_SECONDS = 600
+
+async def lifecycle_loop():
+    """Apply the retention policy and quotas periodically, holding a batch slot while it runs."""
+    await asyncio.sleep(LIFECYCLE_STARTUP_DELAY_SECONDS)
+    while True:
+        try:
+            async with scheduler.slot("batch", bounded=False):
+                await run_in_threadpool(run_lifecycle)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Lifecycle run failed: {str(e)}")
+        await asyncio.sleep(LIFECYCLE_INTERVAL_SECONDS)
+
+@router.get("/status")
+def get_lifecycle_status():
+    """Returns the storage used per area, the quotas and the report of the last run."""
+    try:
+        reports = load_reports()
+        return {"usage": usage(), "quotas": QUOTAS, "last_run": reports[-1] if reports else None}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/history")
+def get_lifecycle_history():
+    """Returns the bytes reclaimed by the last runs, without their action lists."""
+    return {"runs": [
+        {key: value for key, value in report.items() if key != "actions"} for report in load_reports()
+    ]}
+
+@router.post("/run", dependencies=[Depends(admit("batch"))])
+def run_lifecycle_now(dry_run: bool = True):
+    """Runs the lifecycle manager now; by default only reports what would be reclaimed."""
+    try:
+        return run_lifecycle(dry_run=dry_run)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error during lifecycle run: {str(e)}")
+
+@router.post("/restore/{project_name}", dependencies=[Depends(admit("preprocess"))])
+def restore_archived_project(project_name: str):
+    """Unpacks an archived project and its models and lists them as ready again."""
+    try:
+        return {"message": "Project restored", "restored": restore_project(project_name)}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error restoring project: {str(e)}")
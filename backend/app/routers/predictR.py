@@ -1,10 +1,17 @@
 import os
 import json
 import numpy as np
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from app.services.predict_service import make_prediction
+from app.services.batch_scoring import BatchScorer, get_batch_progress
+from app.services.model_export import export_model
+from app.services.ensemble import export_ensemble
+from app.services.registry import list_names
+from app.services.scheduler import admit, rate_limit, scheduler
 from app.config import MODEL_DIRECTORY, PROCESSED_DIRECTORY
-from app.schemas.predict import PredictRequest
+from app.schemas.predict import PredictRequest, BatchPredictRequest, ExportRequest, EnsembleRequest
 from fastapi.responses import JSONResponse
 
 router = APIRouter()
@@ -19,7 +26,7 @@ def convert_to_python_types(obj):
         return [convert_to_python_types(item) for item in obj]
     return obj
 
-@router.post("/predict/")
+@router.post("/predict/", dependencies=[Depends(admit("interactive"))])
 def predict_route(data: PredictRequest):
     try:
         # Call the make_prediction function to generate the prediction
@@ -34,11 +41,83 @@ def predict_route(data: PredictRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error during prediction: {str(e)}")
 
+# Batch jobs running in this process; a job left "running" on disk by a crash can be resumed
+running_batch_jobs = set()
+
+# Run a bulk scoring job over an uploaded file in the background
+async def run_batch_scoring(scorer: BatchScorer):
+    try:
+        # Accepted jobs wait for a batch slot without a queue limit
+        async with scheduler.slot("batch", bounded=False):
+            await run_in_threadpool(scorer.run)
+    except Exception:
+        # The failure is recorded in the job's progress file
+        pass
+    finally:
+        running_batch_jobs.discard(scorer.job_id)
+
+@router.post("/batch/", dependencies=[Depends(rate_limit("batch"))])
+def start_batch_prediction(request: BatchPredictRequest, background_tasks: BackgroundTasks):
+    try:
+        scorer = BatchScorer(
+            file_name=request.file_name,
+            project_name=request.project_name,
+            model_name=request.model_name,
+            output_format=request.output_format,
+            chunk_size=request.chunk_size,
+            batch_size=request.batch_size,
+            max_workers=request.max_workers
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if scorer.job_id in running_batch_jobs:
+        raise HTTPException(status_code=409, detail=f"Batch job {scorer.job_id} is already running.")
+
+    # Submitting an existing job resumes it from its last completed chunk
+    running_batch_jobs.add(scorer.job_id)
+    background_tasks.add_task(run_batch_scoring, scorer)
+    return {"message": "Batch scoring started", "job_id": scorer.job_id}
+
+@router.get("/batch/{job_id}")
+def get_batch_status(job_id: str):
+    progress = get_batch_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Batch job not found.")
+    return progress
+
+@router.post("/export/", dependencies=[Depends(admit("batch"))])
+def export_serving_model(request: ExportRequest):
+    try:
+        manifest = export_model(request.model_name, request.project_name, request.quantization)
+        return {"message": "Model exported successfully", "report": manifest["report"]}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Model cannot be exported: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting model: {str(e)}")
+
+@router.post("/ensemble/", dependencies=[Depends(admit("batch"))])
+def export_ensemble_model(request: EnsembleRequest):
+    try:
+        manifest = export_ensemble(request.project_name, request.k, request.tuner, request.ensemble_name)
+        return {"message": "Ensemble exported successfully", "model_name": manifest["model_name"],
+                "report": manifest["report"]}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Ensemble cannot be exported: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exporting ensemble: {str(e)}")
+
 @router.get("/predict/processed-files/")
-def get_processed_files():
+def get_processed_files(status: Optional[str] = "ready", offset: int = 0, limit: Optional[int] = None):
     try:
-        # Get all processed files from the PROCESSED_DIRECTORY
-        files = os.listdir(PROCESSED_DIRECTORY)
+        # Get the processed projects from the registry index
+        files = list_names("project", status=status, offset=offset, limit=limit)
         return {"files": files}
     except Exception as e:
         return {"error": str(e)}
@@ -65,13 +144,11 @@ async def get_model_params(project_name: str):
 
 # Endpoint to get the available models from the MODEL_DIRECTORY
 @router.get("/models")
-async def get_models():
+def get_models(project: Optional[str] = None, tuner: Optional[str] = None, status: Optional[str] = "ready",
+               offset: int = 0, limit: Optional[int] = None):
     try:
-        # List directories under MODEL_DIRECTORY (models)
-        models = [
-            f for f in os.listdir(MODEL_DIRECTORY)
-            if os.path.isdir(os.path.join(MODEL_DIRECTORY, f))  # Only consider directories as models
-        ]
+        # List models from the registry index; only finished models are listed by default
+        models = list_names("model", status=status, project=project, tuner=tuner, offset=offset, limit=limit)
         
         return JSONResponse(content={"models": models})
     
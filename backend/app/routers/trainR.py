@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from app.services.automl import AutoMLRegressor
-from app.schemas.train import TrainRequest, TrainResponse
+from app.services.automl import AutoMLRegressor, MultiProjectAutoMLRegressor, check_group_name
+from app.services.distributed import DistributedCoordinator, ParallelTrialsBackend
+from app.schemas.train import MultiTrainRequest, TrainRequest, TrainResponse
 from app.config import PROCESSED_DIRECTORY, MODEL_DIRECTORY
+from app.services.storage import current_project_dir, project_lock_name, read_lock
+from app.services.registry import list_names
+from app.services.scheduler import admit
 import os
 import json
 import logging
-from typing import List
+from typing import List, Optional
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 router = APIRouter()
@@ -15,39 +19,56 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Function to train the model for a given tuner
-def train_model(tuner_type, request, project_path, train_data_file, scaler_x_file, scaler_y_file):
+def train_model(tuner_type, request, concurrent_searches=1):
     """Function to train the model for a given tuner type."""
     try:
-        model_path = os.path.join(MODEL_DIRECTORY, f"{request.project_name}_{request.tuner}")
-        os.makedirs(model_path, exist_ok=True)
-        
+        backend = search_backend(request, concurrent_searches)
+
         regressor = AutoMLRegressor(
-            train_data_path=train_data_file,
-            scaler_x_path=scaler_x_file,
-            scaler_y_path=scaler_y_file,
             tuner_types=[tuner_type],
             project_name=request.project_name
         )
         
+        # Resolves the current data version under the project's read lock
         regressor.load_train_data()
-        regressor.train_model(tuner_type)
+        regressor.train_model(tuner_type, backend=backend)
     except Exception as e:
         logger.error(f"Training failed for {tuner_type} on {request.project_name}: {e}")
         raise e
 
+def search_backend(request, concurrent_searches=1):
+    """Search backend for parallel or distributed trials, or None to train in-process."""
+    # Coordinators pick free ports, so tuners trained in parallel do not collide; their local
+    # workers split the cores with the other tuners' workers
+    if request.parallel_trials is not None:
+        return ParallelTrialsBackend(parallel_trials=request.parallel_trials, concurrent_searches=concurrent_searches)
+    if request.distributed_workers is None:
+        return None
+    return DistributedCoordinator(local_workers=request.distributed_workers, concurrent_searches=concurrent_searches)
+
+# Function to train one shared model for several projects
+def train_multi_model(tuner_type, request, concurrent_searches=1):
+    """Train a single multi-output model for all projects of the request."""
+    try:
+        regressor = MultiProjectAutoMLRegressor(request.project_names, request.group_name, tuner_types=[tuner_type])
+        regressor.load_train_data()
+        regressor.train_model(tuner_type, backend=search_backend(request, concurrent_searches))
+    except Exception as e:
+        logger.error(f"Training failed for {tuner_type} on {request.group_name}: {e}")
+        raise e
+
 @router.get("/projects/", response_model=List[str])
-def get_projects():
-    """List available projects in PROCESSED_DIRECTORY."""
+def get_projects(status: Optional[str] = "ready", offset: int = 0, limit: Optional[int] = None):
+    """List available projects from the registry index."""
     try:
-        projects = [d for d in os.listdir(PROCESSED_DIRECTORY) if os.path.isdir(os.path.join(PROCESSED_DIRECTORY, d))]
-        return projects
+        return list_names("project", status=status, offset=offset, limit=limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/train/processed-files/")  # Get list of processed files
-def get_processed_files():
+def get_processed_files(status: Optional[str] = "ready", offset: int = 0, limit: Optional[int] = None):
     try:
-        files = os.listdir(PROCESSED_DIRECTORY)
+        files = list_names("project", status=status, offset=offset, limit=limit)
         return {"files": files}
     except Exception as e:
         return {"error": str(e)}
@@ -70,30 +91,28 @@ def get_params(project_name: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/train/")  # Start training for the selected project
+@router.post("/train/", dependencies=[Depends(admit("train"))])  # Start training for the selected project
 def start_training(request: TrainRequest):
     """Start training for the selected project."""
-    project_path = os.path.join(PROCESSED_DIRECTORY, request.project_name)
-    model_path = os.path.join(MODEL_DIRECTORY, f"{request.project_name}_{request.tuner}")
-    params_file = os.path.join(project_path, "params.json")
-    train_data_file = os.path.join(project_path, "train_data.npz")
-    scaler_x_file = os.path.join(project_path, "scaler_X.pkl")
-    scaler_y_file = os.path.join(project_path, "scaler_y.pkl")
-    
-    if not os.path.exists(params_file):
-        raise HTTPException(status_code=400, detail=f"params.json not found for {request.project_name}")
-    if not os.path.exists(train_data_file):
-        raise HTTPException(status_code=400, detail=f"train_data.npz not found for {request.project_name}")
-    
-    os.makedirs(model_path, exist_ok=True)
-    
-    # Load input/output parameters
-    try:
-        with open(params_file, "r") as f:
-            params = json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load params.json for {request.project_name}: {e}")
-        raise HTTPException(status_code=500, detail=f"Error loading parameters: {e}")
+    # Only validates the project here; each training job resolves the current data version
+    # itself under the project's read lock, since a newer version may be published meanwhile
+    with read_lock(project_lock_name(request.project_name)):
+        project_path = current_project_dir(request.project_name)
+        params_file = os.path.join(project_path, "params.json")
+        train_data_file = os.path.join(project_path, "train_data.npz")
+
+        if not os.path.exists(params_file):
+            raise HTTPException(status_code=400, detail=f"params.json not found for {request.project_name}")
+        if not os.path.exists(train_data_file):
+            raise HTTPException(status_code=400, detail=f"train_data.npz not found for {request.project_name}")
+
+        # Load input/output parameters
+        try:
+            with open(params_file, "r") as f:
+                params = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load params.json for {request.project_name}: {e}")
+            raise HTTPException(status_code=500, detail=f"Error loading parameters: {e}")
     
     # Run training in parallel for all tuners if the tuner is 'all'
     if request.tuner == "all":
@@ -104,7 +123,7 @@ def start_training(request: TrainRequest):
     try:
         with ProcessPoolExecutor() as executor:
             futures = {
-                executor.submit(train_model, tuner, request, project_path, train_data_file, scaler_x_file, scaler_y_file): tuner
+                executor.submit(train_model, tuner, request, len(tuner_types)): tuner
                 for tuner in tuner_types
             }
             for future in as_completed(futures):
@@ -118,3 +137,39 @@ def start_training(request: TrainRequest):
         raise HTTPException(status_code=500, detail=f"Training failed: {e}")
     
     return {"message": f"Training started for {request.project_name} with tuner(s): {', '.join(tuner_types)}"}
+
+@router.post("/train/multi/", dependencies=[Depends(admit("train"))])  # Train one shared model for several projects
+def start_multi_training(request: MultiTrainRequest):
+    """Search once for several projects that share input rows and save one model with a head per project."""
+    if len(request.project_names) < 2:
+        raise HTTPException(status_code=400, detail="Multi-project training needs at least two projects.")
+    for project_name in request.project_names:
+        if not os.path.exists(os.path.join(current_project_dir(project_name), "train_data.npz")):
+            raise HTTPException(status_code=400, detail=f"train_data.npz not found for {project_name}")
+
+    if request.tuner == "all":
+        tuner_types = ['random', 'hyperband', 'greedy', 'bayesian']
+    else:
+        tuner_types = [request.tuner]
+    try:
+        check_group_name(request.group_name, request.project_names, tuner_types)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    with ProcessPoolExecutor() as executor:
+        futures = {
+            executor.submit(train_multi_model, tuner, request, len(tuner_types)): tuner
+            for tuner in tuner_types
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except ValueError as exc:
+                # The projects do not share the same input rows
+                raise HTTPException(status_code=400, detail=str(exc))
+            except Exception as exc:
+                logger.error(f"Error during multi-project training: {exc}")
+                raise HTTPException(status_code=500, detail=f"Error in {futures[future]}: {exc}")
+
+    return {"message": f"Training started for {request.group_name} ({', '.join(request.project_names)}) "
+                       f"with tuner(s): {', '.join(tuner_types)}"}
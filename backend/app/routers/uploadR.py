@@ -1,24 +1,33 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from typing import List
 import os
 import json
+import shutil
+import logging
 import pandas as pd
-from app.schemas.upload import PreprocessRequest
+from app.schemas.upload import PreprocessRequest, AppendRequest
 from app.services.upload_service import handle_upload
+from app.services.ingestion import read_columns
+from app.services.profiler import DEFAULT_SAMPLE_SIZE, profile_dataset
+from app.services.scheduler import admit
 from app.services.data_preprocessor import DataPreprocessor  # Import the new service
+from app.services.storage import write_json_atomic
+from app.services.registry import get_entry, register_project
 from app.config import UPLOAD_DIRECTORY, PROCESSED_DIRECTORY
 
 router = APIRouter()
 
+# Handlers that touch files or run preprocessing are plain functions: FastAPI runs them in its
+# threadpool, where async handlers would block the event loop and every request behind it
+
 # Upload a new file
-@router.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
+@router.post("/upload/", dependencies=[Depends(admit("preprocess"))])
+def upload_file(file: UploadFile = File(...)):
     try:
-        # Save file to the UPLOAD_DIRECTORY
+        # Save file to the UPLOAD_DIRECTORY, copying the spooled upload in blocks
         file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
         with open(file_path, "wb") as f:
-            contents = await file.read()
-            f.write(contents)
+            shutil.copyfileobj(file.file, f)
         return {"message": "File uploaded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
@@ -39,12 +48,24 @@ def get_columns(file_name: str):
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found.")
     
-    df = pd.read_csv(file_path) if file_name.endswith(".csv") else pd.read_json(file_path)
-    return {"columns": df.columns.tolist()}
+    # Only the header is read where the format allows it
+    return {"columns": read_columns(file_path)}
+
+# Profile the columns of the selected file (cached per file content)
+@router.get("/profile/", dependencies=[Depends(admit("preprocess"))])
+def get_profile(file_name: str, sample_size: int = DEFAULT_SAMPLE_SIZE, refresh: bool = False):
+    try:
+        return profile_dataset(file_name, sample_size=sample_size, refresh=refresh)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error profiling file: {str(e)}")
 
 # Save selected input/output parameters
 @router.post("/save_params/")
-async def save_params(request: PreprocessRequest):  # Accept the body as PreprocessRequest schema
+def save_params(request: PreprocessRequest):  # Accept the body as PreprocessRequest schema
     try:
         # Define the directory where parameters will be saved
         project_dir = os.path.join(PROCESSED_DIRECTORY, request.project_name)
@@ -59,10 +80,14 @@ async def save_params(request: PreprocessRequest):  # Accept the body as Preproc
             "file_name": request.file_name
         }
 
-        # Save the parameters to a JSON file
+        # Save the parameters to a JSON file, atomically so readers never see a partial file
         params_file_path = os.path.join(project_dir, "params.json")
-        with open(params_file_path, "w") as f:
-            json.dump(params, f)
+        write_json_atomic(params_file_path, params)
+
+        # A project that is already preprocessed stays listed as ready
+        entry = get_entry("project", request.project_name)
+        if entry is None or entry["status"] != "ready":
+            register_project(request.project_name, "configured")
         
         # Return a success message
         return {"message": "Parameters saved successfully.", "file_path": params_file_path}
@@ -73,15 +98,15 @@ async def save_params(request: PreprocessRequest):  # Accept the body as Preproc
 
 
 # New: Call the DataPreprocessor class for preprocessing
-@router.post("/preprocess/")
-async def preprocess_data(request: PreprocessRequest):
+@router.post("/preprocess/", dependencies=[Depends(admit("preprocess"))])
+def preprocess_data(request: PreprocessRequest):
     try:
         # Ensure required fields are provided
         if not request.project_name or not request.input_params or not request.output_params:
             raise HTTPException(status_code=400, detail="Missing required parameters.")
 
         # Log the received request data for debugging
-        print(f"Preprocessing request received with data: {request}")
+        logging.debug(f"Preprocessing request received with data: {request}")
 
         # Instantiate the DataPreprocessor with project name, scaler type, and parameters
         preprocessor = DataPreprocessor(
@@ -96,7 +121,7 @@ async def preprocess_data(request: PreprocessRequest):
         result = preprocessor.preprocess()
 
         # Log the result of preprocessing for debugging
-        print(f"Preprocessing result: {result}")
+        logging.debug(f"Preprocessing result: {result}")
 
         return {"message": "Preprocessing successful", "data": result}
     
@@ -105,8 +130,23 @@ async def preprocess_data(request: PreprocessRequest):
         raise http_error
     except Exception as e:
         # Log the exception to the console for debugging purposes
-        print(f"Error in preprocessing: {str(e)}")
+        logging.error(f"Error in preprocessing: {str(e)}")
 
         # Raise a 500 HTTPException with the error details
         raise HTTPException(status_code=500, detail=f"Error in preprocessing: {str(e)}")
 
+
+# Append a new batch of rows to an existing project without re-preprocessing everything
+@router.post("/append/", dependencies=[Depends(admit("preprocess"))])
+def append_data(request: AppendRequest):
+    try:
+        preprocessor = DataPreprocessor.from_project(request.project_name, request.file_name)
+        result = preprocessor.append()
+        return {"message": "Append successful", "data": result}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error appending data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error appending data: {str(e)}")
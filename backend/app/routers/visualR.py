@@ -1,20 +1,81 @@
 import os
 import json
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
 from app.config import MODEL_DIRECTORY
+from app.services.artifacts import load_heads, load_profile, load_trial_index
+from app.services.registry import get_entry, list_entries, list_names
+from app.services.scheduler import admit
+from app.services.serving_profiler import profile_model
+from app.services.serving_runtime import source_mtime
 
 
 router = APIRouter()
 
 @router.get("/models")
-def list_models():
-    """Returns a list of available models in MODEL_DIRECTORY."""
+def list_models(project: Optional[str] = None, tuner: Optional[str] = None, status: Optional[str] = "ready",
+                offset: int = 0, limit: Optional[int] = None):
+    """Returns a list of available models from the registry index."""
     try:
-        models = [d for d in os.listdir(MODEL_DIRECTORY) if os.path.isdir(os.path.join(MODEL_DIRECTORY, d))]
+        models = list_names("model", status=status, project=project, tuner=tuner, offset=offset, limit=limit)
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/registry/{kind}")
+def get_registry_entries(kind: str, project: Optional[str] = None, tuner: Optional[str] = None,
+                         status: Optional[str] = None, offset: int = 0, limit: Optional[int] = 50):
+    """Returns registry metadata (status, paths, sizes, metrics, training time) for models or projects."""
+    if kind not in ("model", "project"):
+        raise HTTPException(status_code=404, detail="Unknown registry kind")
+    try:
+        entries, total = list_entries(kind, status=status, project=project, tuner=tuner, offset=offset, limit=limit)
+        return {"entries": entries, "total": total, "offset": offset, "limit": limit}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/compare")
+def compare_models(project: Optional[str] = None, tuner: Optional[str] = None):
+    """Returns accuracy, training time and serving cost of the ready models side by side."""
+    try:
+        entries, _ = list_entries("model", status="ready", project=project, tuner=tuner)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"models": [
+        {
+            "model_name": entry["name"],
+            "project": entry["project"],
+            "tuner": entry["tuner"],
+            "best_val_loss": entry["metrics"].get("best_val_loss"),
+            "training_time": entry["training_time"],
+            "size_bytes": entry["size_bytes"],
+            "serving": entry["metrics"].get("serving"),  # None until the model is profiled
+        }
+        for entry in entries
+    ]}
+
+@router.post("/profile/{model_name}", dependencies=[Depends(admit("batch"))])
+def profile_serving_cost(model_name: str, project_name: Optional[str] = None):
+    """Measures load time, memory, single-row latency and batch throughput of a model on this CPU."""
+    model_path = os.path.join(MODEL_DIRECTORY, model_name)
+    if not os.path.exists(model_path):
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    # The test set and scalers come from the model's project (the first one for multi-project models)
+    if project_name is None:
+        heads = load_heads(model_path)
+        entry = get_entry("model", model_name)
+        project_name = next(iter(heads)) if heads else (entry["project"] if entry else None)
+    if project_name is None:
+        raise HTTPException(status_code=400, detail="project_name is required for this model")
+
+    try:
+        return profile_model(model_name, project_name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error profiling model: {str(e)}")
+
 @router.get("/data/{model_name}")
 def get_model_visualization_data(model_name: str):
     """Fetches MAE vs. Trials and MAE vs. Training Time data for the selected model."""
@@ -32,25 +93,21 @@ def get_model_visualization_data(model_name: str):
             training_time_data = json.load(f)
             training_time = training_time_data.get("training_time", None)
 
-    # Load trial MAE values
-    for trial_dir in sorted(os.listdir(model_path)):
-        trial_path = os.path.join(model_path, trial_dir, "trial.json")
-        if os.path.exists(trial_path):
-            try:
-                with open(trial_path, "r") as f:
-                    trial_data = json.load(f)
-                    val_loss_observations = trial_data.get("metrics", {}).get("metrics", {}).get("val_loss", {}).get("observations", [])
-                    if val_loss_observations:
-                        val_loss_value = val_loss_observations[0].get("value", [])
-                        if val_loss_value:
-                            trial_mae.append(val_loss_value[0])
-            except json.JSONDecodeError:
-                continue
+    # Load trial MAE values from the trial index; a GET builds a missing index without saving it
+    for trial in load_trial_index(model_path, write=False)["trials"]:
+        if trial["val_loss"] is not None:
+            trial_mae.append(trial["val_loss"])
 
     if not trial_mae:
         raise HTTPException(status_code=400, detail="No valid MAE data found for the model")
 
+    # Serving cost, if the model was profiled after its last training
+    serving_profile = load_profile(model_path)
+    if serving_profile is not None and serving_profile.get("source_mtime") != source_mtime(model_path):
+        serving_profile = None
+
     return {
         "trial_mae": trial_mae,
-        "training_time": training_time
+        "training_time": training_time,
+        "serving_profile": serving_profile
     }
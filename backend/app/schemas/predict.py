@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import Dict, List, Literal, Optional
 
 class PredictRequest(BaseModel):
     model_name: str  # Add the model_name attribute
@@ -9,4 +9,32 @@ class PredictResponse(BaseModel):
     """
     Schema for the prediction response.
     """
-    prediction: List[float]  # Predicted output values
\ No newline at end of file
+    prediction: List[float]  # Predicted output values
+class BatchPredictRequest(BaseModel):
+    """
+    Schema for an offline bulk scoring job over an uploaded dataset file.
+    """
+    file_name: str  # Dataset file in UPLOAD_DIRECTORY
+    project_name: str
+    model_name: str
+    output_format: Literal['csv', 'parquet'] = 'csv'
+    chunk_size: int = 50000  # Rows read from the file per chunk
+    batch_size: int = 4096  # Rows per inference batch
+    max_workers: Optional[int] = None  # Inference worker threads
+
+class ExportRequest(BaseModel):
+    """
+    Schema for exporting a trained model into a TensorFlow-free serving artifact.
+    """
+    model_name: str
+    project_name: str
+    quantization: Optional[Literal['float16', 'int8']] = None  # Weight quantization, None keeps float32
+
+class EnsembleRequest(BaseModel):
+    """
+    Schema for exporting the top-k trials of a project's searches as one fused ensemble.
+    """
+    project_name: str
+    k: int = 5  # Number of trials averaged by the ensemble
+    tuner: Optional[Literal['random', 'hyperband', 'greedy', 'bayesian']] = None  # None ranks trials across all tuners
+    ensemble_name: Optional[str] = None  # Model directory, '{project}[_{tuner}]_ensemble' by default
@@ -1,9 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 
 class TrainRequest(BaseModel):
     project_name: str
     tuner: Optional[str] = "random"  # Default value is 'random', can be 'random', 'hyperband', 'greedy', 'bayesian', or 'all'
+    distributed_workers: Optional[int] = None  # Local workers for coordinator/worker training; None trains in-process
+    parallel_trials: Optional[int] = None  # Trials run concurrently on this host with shared-memory data
+class MultiTrainRequest(BaseModel):
+    group_name: str = Field(pattern=r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")  # Name of the shared model, saved as '{group_name}_{tuner}'
+    project_names: List[str]  # Projects preprocessed from the same file with the same input parameters
+    tuner: Optional[str] = "random"
+    distributed_workers: Optional[int] = None
+    parallel_trials: Optional[int] = None
 class TrainResponse(BaseModel):
     project_name: str
\ No newline at end of file
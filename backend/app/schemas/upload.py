@@ -23,4 +23,7 @@ class PreprocessRequest(BaseModel):
 
 class PreprocessResponse(BaseModel):
     message: str  # Success message
-    processed_data_preview: dict  # Sample of preprocessed data 
\ No newline at end of file
+    processed_data_preview: dict  # Sample of preprocessed data 
+class AppendRequest(BaseModel):
+    project_name: str  # Existing, already preprocessed project
+    file_name: str  # Dataset with only the new rows, same columns as the original file
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+from app.services.storage import write_json_atomic
+
+# Files the services read from model directories. Kept apart from the registry, lifecycle and
+# ensemble modules so all of them can use these helpers without importing each other.
+
+TUNER_TYPES = ['random', 'hyperband', 'greedy', 'bayesian']
+
+TRIAL_INDEX_FILENAME = "trial_index.json"
+PROFILE_FILENAME = "serving_profile.json"
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def split_model_name(model_name):
+    """Split '{project}_{tuner}' into (project, tuner); the tuner is None for other names."""
+    project, _, tuner = model_name.rpartition("_")
+    if project and tuner in TUNER_TYPES:
+        return project, tuner
+    return model_name, None
+
+
+def load_heads(model_dir):
+    """
+    Return the project -> [start, stop] output columns of a multi-project model, or None.
+    """
+    heads_path = os.path.join(model_dir, "heads.json")
+    if not os.path.exists(heads_path):
+        return None
+    with open(heads_path, "r") as f:
+        return json.load(f)["projects"]
+
+
+def load_profile(model_dir):
+    """Return the serving profile stored by the serving profiler, or None."""
+    profile_path = os.path.join(model_dir, PROFILE_FILENAME)
+    if not os.path.exists(profile_path):
+        return None
+    with open(profile_path, "r") as f:
+        return json.load(f)
+
+
+def summarize_profile(profile):
+    """The figures of a serving profile kept in the registry for comparing models."""
+    largest = max(profile["throughput"], key=int)
+    return {
+        "runtime": profile["runtime"],
+        "load_seconds": profile["load_seconds"],
+        "model_rss_mb": profile["model_rss_mb"],
+        "p50_ms": profile["single_row_ms"]["p50"],
+        "p95_ms": profile["single_row_ms"]["p95"],
+        "max_rows_per_second": profile["throughput"][largest]["rows_per_second"],
+        "test_mae": profile["test_mae"],
+    }
+
+
+def has_checkpoint(trial_dir):
+    """A checkpoint needs its data shards as well as the index, some searches kept only the index."""
+    if not os.path.exists(os.path.join(trial_dir, "checkpoint.index")):
+        return False
+    return any(name.startswith("checkpoint.data-") for name in os.listdir(trial_dir))
+
+
+def read_trial(trial_dir):
+    """Summarize a trial directory for the index, or None if it has no readable trial.json."""
+    try:
+        with open(os.path.join(trial_dir, "trial.json"), "r") as f:
+            trial_data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    observations = trial_data.get("metrics", {}).get("metrics", {}).get("val_loss", {}).get("observations", [])
+    val_loss = None
+    if observations and observations[0].get("value"):
+        val_loss = observations[0]["value"][0]
+    return {
+        "trial_id": trial_data.get("trial_id"),
+        "dir": os.path.basename(trial_dir),
+        "status": trial_data.get("status"),
+        "score": trial_data.get("score"),
+        "val_loss": val_loss,
+        "hyperparameters": trial_data.get("hyperparameters", {}).get("values", {}),
+        "checkpoint": has_checkpoint(trial_dir),
+    }
+
+
+def build_trial_index(model_dir):
+    """Collect the trial metrics of a search from its trial directories."""
+    trials = []
+    for name in sorted(os.listdir(model_dir)):
+        trial_dir = os.path.join(model_dir, name)
+        if os.path.isdir(trial_dir) and os.path.exists(os.path.join(trial_dir, "trial.json")):
+            trial = read_trial(trial_dir)
+            if trial is not None:
+                trials.append(trial)
+    scored = [trial for trial in trials if trial["status"] == "COMPLETED" and trial["score"] is not None]
+    return {
+        "built_at": time.time(),
+        "trials": trials,
+        "best_trial_id": min(scored, key=lambda trial: trial["score"])["trial_id"] if scored else None,
+    }
+
+
+def write_trial_index(model_dir):
+    """
+    Write the trial metrics of a search into one compact file, so listing and visualizing a
+    model reads a single file instead of every trial directory.
+    """
+    index = build_trial_index(model_dir)
+    write_json_atomic(os.path.join(model_dir, TRIAL_INDEX_FILENAME), index)
+    return index
+
+
+def load_trial_index(model_dir, write=True):
+    """
+    Return the trial index of a model directory, building it on first use.
+
+    Args:
+        model_dir (str): Model directory holding the trials.
+        write (bool): Save a newly built index; read-only callers such as dry runs keep it in memory.
+    """
+    index_path = os.path.join(model_dir, TRIAL_INDEX_FILENAME)
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            pass
+    return write_trial_index(model_dir) if write else build_trial_index(model_dir)
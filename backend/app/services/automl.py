@@ -1,13 +1,49 @@
 import os
+import re
 import time
 import json
 import autokeras as ak
 from keras.models import load_model
 import numpy as np
 import pickle
+import shutil
+import tempfile
 from sklearn.metrics import mean_absolute_error, r2_score
 from concurrent.futures import ProcessPoolExecutor, as_completed
-from app.config import PROCESSED_DIRECTORY, MODEL_DIRECTORY
+from app.config import PROCESSED_DIRECTORY, MODEL_DIRECTORY, STAGING_DIRECTORY
+from app.services.storage import (
+    current_project_dir, model_staging_directory, project_lock_name, publish_model_dir, read_lock
+)
+from app.services.artifacts import load_heads, write_trial_index
+from app.services.registry import get_entry, register_model
+
+# Search settings shared by local, distributed and parallel training so every process builds the same search
+MAX_TRIALS = 100
+EPOCHS = 100
+VALIDATION_SPLIT = 0.1
+
+# Group names become directories under MODEL_DIRECTORY; no separators or leading dots
+GROUP_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+def check_group_name(group_name, project_names, tuner_types):
+    """
+    Refuse names that would leave MODEL_DIRECTORY or replace a model other than this group's.
+
+    Publishing replaces '{group_name}_{tuner}' silently, so an existing directory may only be a
+    multi-project model trained for the same projects.
+    """
+    if not GROUP_NAME_PATTERN.fullmatch(group_name):
+        raise ValueError(f"Invalid group name {group_name!r}: use letters, digits, '_', '-' and '.'")
+    for tuner_type in tuner_types:
+        model_name = f"{group_name}_{tuner_type}"
+        model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+        if not os.path.exists(model_dir):
+            continue
+        heads = load_heads(model_dir)
+        if heads is None or list(heads) != list(project_names):
+            raise ValueError(f"{model_name} is an existing model that is not a multi-project model of "
+                             f"{', '.join(project_names)}; choose another group name")
 
 class AutoMLRegressor:
     def __init__(self, train_data_path=None, test_data_path=None, scaler_x_path=None, scaler_y_path=None,
@@ -29,14 +65,15 @@ class AutoMLRegressor:
         self.scaler_y_path = scaler_y_path
         self.tuner_types = tuner_types if tuner_types else ['random', 'hyperband', 'greedy', 'bayesian']
         self.project_name = project_name
+        # Project the model is listed under in the registry
+        self.owner_project = project_name
         self.models = {}
 
         # Define project directories under PROCESSED_DIRECTORY, MODEL_DIRECTORY
         self.project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
         self.model_dir = os.path.join(MODEL_DIRECTORY)
 
-        # Ensure the directories exist
-        os.makedirs(self.project_dir, exist_ok=True)
+        # Ensure the model directory exists
         os.makedirs(self.model_dir, exist_ok=True)
 
     def load_train_data(self):
@@ -44,11 +81,19 @@ class AutoMLRegressor:
         Load the training data and the feature/target scalers.
 
         This method loads the training data from the provided path and deserializes
-        the scalers for features (X) and target (y).
+        the scalers for features (X) and target (y). Without explicit paths the current
+        version of the project is used, resolved under the project's read lock so a
+        concurrent upload or append cannot prune it between resolving and loading.
         """
-        if self.train_data_path:
-            train_data = np.load(self.train_data_path)
-            self.X_train, self.y_train = train_data['X_train'], train_data['y_train']
+        # The read lock keeps the data version from being pruned while it is loaded
+        with read_lock(project_lock_name(self.project_name)):
+            if not self.train_data_path:
+                project_dir = current_project_dir(self.project_name)
+                self.train_data_path = os.path.join(project_dir, 'train_data.npz')
+                self.scaler_x_path = os.path.join(project_dir, 'scaler_X.pkl')
+                self.scaler_y_path = os.path.join(project_dir, 'scaler_y.pkl')
+            with np.load(self.train_data_path) as train_data:
+                self.X_train, self.y_train = train_data['X_train'], train_data['y_train']
             with open(self.scaler_x_path, 'rb') as f:
                 self.scaler_X = pickle.load(f)
             with open(self.scaler_y_path, 'rb') as f:
@@ -64,40 +109,97 @@ class AutoMLRegressor:
         test_data = np.load(test_data_path)
         self.X_test, self.y_test = test_data['X_test'], test_data['y_test']
 
-    def train_model(self, tuner_type):
+    def build_regressor(self, tuner_type, directory, max_trials=None):
         """
-        Train an AutoML model using a specific tuner type.
+        Create the AutoKeras StructuredDataRegressor for a tuner type.
 
         Args:
             tuner_type (str): The type of tuner to use (e.g., 'random', 'hyperband', etc.).
+            directory (str): Directory the search writes its project folder into.
+            max_trials (int): Trial budget; workers pass the coordinator's so both build the same search.
         """
-        print(f"Training with tuner: {tuner_type}")
-
-        # Initialize the AutoKeras StructuredDataRegressor with the specified tuner
-        regressor = ak.StructuredDataRegressor(
+        return ak.StructuredDataRegressor(
             project_name=f'{self.project_name}_{tuner_type}', # Create a project folder based on tuner type
-            directory=self.model_dir, # Save the trained model under model directory
+            directory=directory,
             tuner=tuner_type,
-            max_trials=100,  # Maximum number of trials for AutoML
+            max_trials=max_trials or MAX_TRIALS,  # Maximum number of trials for AutoML
             overwrite=True,
             loss='mean_absolute_error'  # Loss function to minimize
         )
 
-        start_time = time.time()
-
+    def run_search(self, tuner_type, directory):
+        """
+        Run the search in this process and return the fitted regressor.
+        """
+        regressor = self.build_regressor(tuner_type, directory)
         # Fit the regressor model with training data
-        regressor.fit(self.X_train, self.y_train, epochs=100, validation_split=0.1)  # Train with 100 epochs
-        end_time = time.time()
+        regressor.fit(self.X_train, self.y_train, epochs=EPOCHS, validation_split=VALIDATION_SPLIT)
+        return regressor
+
+    def train_model(self, tuner_type, backend=None):
+        """
+        Train an AutoML model using a specific tuner type.
+
+        Args:
+            tuner_type (str): The type of tuner to use (e.g., 'random', 'hyperband', etc.).
+            backend: Optional search backend with a search(automl, tuner_type, directory) method that
+                runs the trials elsewhere (e.g. DistributedCoordinator). Defaults to an in-process search.
+        """
+        print(f"Training with tuner: {tuner_type}")
+        model_name = f'{self.project_name}_{tuner_type}'
+
+        # Train in a private staging directory; the finished model is published into the model directory
+        staging_dir = model_staging_directory()
+
+        # A previously published model stays listed as ready while it is being retrained
+        entry = get_entry("model", model_name)
+        previously_ready = entry is not None and entry["status"] == "ready"
+        if not previously_ready:
+            register_model(model_name, "training", project=self.owner_project, tuner=tuner_type)
+
+        try:
+            start_time = time.time()
+
+            if backend is None:
+                regressor = self.run_search(tuner_type, staging_dir)
+            else:
+                regressor = backend.search(self, tuner_type, staging_dir)
+            end_time = time.time()
+
+            # Store the trained model and log the training time
+            self.models[tuner_type] = regressor
+            training_time = end_time - start_time
 
-        # Store the trained model and log the training time
-        self.models[tuner_type] = regressor
-        training_time = end_time - start_time
+            # Save the training time and other metadata next to the model
+            self.save_model_metadata(os.path.join(staging_dir, model_name), training_time)
 
+            # Swap the finished model in, replacing the previous model of this project and tuner
+            publish_model_dir(os.path.join(staging_dir, model_name), model_name)
+            register_model(model_name, "ready", project=self.owner_project, tuner=tuner_type,
+                           training_time=training_time)
+        except Exception:
+            if not previously_ready:
+                register_model(model_name, "failed", project=self.owner_project, tuner=tuner_type)
+            raise
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def save_model_metadata(self, model_dir, training_time):
+        """
+        Save metadata files into a trained model directory before it is published.
+
+        Args:
+            model_dir (str): The model directory inside the staging directory.
+            training_time (float): Duration of the search in seconds.
+        """
         # Save the training time to a JSON file
-        training_time_path = os.path.join(self.model_dir, f'{self.project_name}_{tuner_type}', 'training_time.json')
+        training_time_path = os.path.join(model_dir, 'training_time.json')
         with open(training_time_path, 'w') as f:
             json.dump({'training_time': training_time}, f)
 
+        # Index the trial metrics, so the model can be listed and visualized without reading every trial
+        write_trial_index(model_dir)
+
     def evaluate_model(self, tuner_type, X_test, y_test):
         """
         Evaluate a trained AutoML model using test data.
@@ -157,3 +259,79 @@ class AutoMLRegressor:
                     print(f"{tuner_type} generated an exception: {exc}")
 
         print("All training tasks completed.")
+
+
+class MultiProjectAutoMLRegressor(AutoMLRegressor):
+    def __init__(self, project_names, group_name, tuner_types=None):
+        """
+        Search once for several projects that share the same input rows.
+
+        The targets of all projects are concatenated into one multi-output regression head, so
+        N related projects (e.g. different outputs of the same scenario file) cost one search
+        instead of N. The trained model is saved as '{group_name}_{tuner}' with a heads.json
+        mapping every project to its slice of the output columns. The registry lists it under
+        the first project, and its metrics name all of them.
+
+        All projects must have the same training rows: they are preprocessed from the same file
+        with the same input parameters and keep the same rows after dropping empty values.
+
+        Args:
+            project_names (list): Processed projects trained together.
+            group_name (str): Name used for the shared model directory.
+            tuner_types (list): List of tuner types to be used in AutoML.
+        """
+        super().__init__(tuner_types=tuner_types, project_name=group_name)
+        self.project_names = project_names
+        self.owner_project = project_names[0]
+        self.heads = {}
+
+    def load_train_data(self):
+        """
+        Load every project's training data, check that the inputs are shared and stack the targets.
+        """
+        X_train, y_parts, input_params = None, [], None
+        for project_name in self.project_names:
+            with read_lock(project_lock_name(project_name)):
+                project_dir = current_project_dir(project_name)
+                with open(os.path.join(project_dir, 'params.json'), 'r') as f:
+                    params = json.load(f)
+                with np.load(os.path.join(project_dir, 'train_data.npz')) as train_data:
+                    project_X, project_y = train_data['X_train'], train_data['y_train']
+                with open(os.path.join(project_dir, 'scaler_X.pkl'), 'rb') as f:
+                    scaler_X = pickle.load(f)
+
+            if X_train is None:
+                X_train, input_params, self.scaler_X = project_X, params['input_params'], scaler_X
+            elif params['input_params'] != input_params:
+                raise ValueError(f"Project {project_name} has other input parameters than {self.project_names[0]}; "
+                                 f"multi-project training needs the same input parameters.")
+            elif not np.array_equal(project_X, X_train):
+                # Rows with empty values are dropped per project, so outputs that are empty on
+                # different rows leave the projects with different training rows
+                raise ValueError(f"Project {project_name} does not have the same training rows as "
+                                 f"{self.project_names[0]} ({len(project_X)} and {len(X_train)} rows); "
+                                 f"multi-project training needs identical rows, i.e. projects preprocessed "
+                                 f"from the same file whose outputs are empty on the same rows.")
+
+            start = sum(part.shape[1] for part in y_parts)
+            self.heads[project_name] = [start, start + project_y.shape[1]]
+            y_parts.append(project_y)
+
+        self.X_train, self.y_train = X_train, np.concatenate(y_parts, axis=1)
+
+        # Distributed workers fetch the stacked data as one file
+        fd, self.train_data_path = tempfile.mkstemp(dir=STAGING_DIRECTORY, prefix=f'{self.project_name}-', suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, X_train=self.X_train, y_train=self.y_train)
+
+    def train_model(self, tuner_type, backend=None):
+        try:
+            super().train_model(tuner_type, backend=backend)
+        finally:
+            if self.train_data_path and os.path.exists(self.train_data_path):
+                os.remove(self.train_data_path)
+
+    def save_model_metadata(self, model_dir, training_time):
+        super().save_model_metadata(model_dir, training_time)
+        with open(os.path.join(model_dir, 'heads.json'), 'w') as f:
+            json.dump({'projects': self.heads}, f)
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from app.config import BATCH_DIRECTORY, UPLOAD_DIRECTORY
+from app.services.predict_service import KerasPredictor, load_serving_components
+from app.services.ingestion import iter_dataset
+from app.services.storage import current_project_dir
+
+
+class BatchScorer:
+    def __init__(self, file_name, project_name, model_name, output_format="csv",
+                 chunk_size=50000, batch_size=4096, max_workers=None):
+        """
+        Score an uploaded dataset file against a trained model and write the predictions to disk.
+
+        The file is streamed in chunks so that files larger than memory can be scored. Every finished
+        chunk is written as its own part file, which makes the job resumable after a crash: completed
+        parts are skipped when the job is started again.
+
+        Args:
+            file_name (str): Name of the dataset file in UPLOAD_DIRECTORY.
+            project_name (str): Processed project providing the scalers and params.json.
+            model_name (str): Name of the model directory under MODEL_DIRECTORY.
+            output_format (str): 'csv' or 'parquet'.
+            chunk_size (int): Number of rows read from the input file per chunk.
+            batch_size (int): Batch size used for model inference.
+            max_workers (int): Number of inference worker threads. Keras models always use one,
+                since concurrent predict() calls on one model are not documented as safe.
+        """
+        if output_format not in ("csv", "parquet"):
+            raise ValueError("Unsupported output format")
+
+        self.file_name = file_name
+        self.project_name = project_name
+        self.model_name = model_name
+        self.output_format = output_format
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+
+        self.file_path = os.path.join(UPLOAD_DIRECTORY, file_name)
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError("Dataset file not found.")
+
+        # Predictions are written to BATCH_DIRECTORY, so they are not listed as uploaded datasets
+        self.job_id = batch_job_id(file_name, project_name, model_name)
+        self.job_dir = os.path.join(BATCH_DIRECTORY, f"{self.job_id}.parts")
+        self.progress_path = progress_path(self.job_id)
+        self.output_path = os.path.join(BATCH_DIRECTORY, f"{self.job_id}.{output_format}")
+
+    def load_progress(self):
+        """
+        Load the progress of a previous run, or start a fresh progress record.
+        """
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, "r") as f:
+                progress = json.load(f)
+            # Chunk boundaries must not move between runs, otherwise parts would overlap
+            self.chunk_size = progress.get("chunk_size", self.chunk_size)
+            self.output_format = progress.get("output_format", self.output_format)
+            self.output_path = os.path.join(BATCH_DIRECTORY, f"{self.job_id}.{self.output_format}")
+            progress.setdefault("rows_skipped", 0)
+            return progress
+
+        return {
+            "job_id": self.job_id,
+            "file_name": self.file_name,
+            "project_name": self.project_name,
+            "model_name": self.model_name,
+            "input_fingerprint": input_fingerprint(self.file_path, self.project_name),
+            "output_format": self.output_format,
+            "chunk_size": self.chunk_size,
+            "status": "pending",
+            "chunks_done": 0,
+            "rows_done": 0,
+            "rows_skipped": 0,  # Rows with missing inputs, written with NaN predictions
+            "rows_per_second": None,
+            "elapsed_seconds": 0.0,
+            "output_path": None,
+            "error": None,
+        }
+
+    def save_progress(self, progress):
+        """
+        Atomically persist the progress record so that a crash never leaves a torn file.
+        """
+        progress["updated_at"] = time.time()
+        tmp_path = f"{self.progress_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, self.progress_path)
+
+    def iter_chunks(self, columns):
+        """
+        Yield (chunk_index, DataFrame) pairs with only the requested columns.
+        """
+        yield from enumerate(iter_dataset(self.file_path, self.chunk_size, columns))
+
+    def predict(self, X):
+        # Serving artifacts work on whole chunks, Keras models are fed in batches
+        if isinstance(self.predictor, KerasPredictor):
+            return self.predictor.predict(X, batch_size=self.batch_size)
+        return self.predictor.predict(X)
+
+    def _part_path(self, index):
+        return os.path.join(self.job_dir, f"part-{index:06d}.{self.output_format}")
+
+    def score_chunk(self, index, chunk):
+        """
+        Scale, predict and write one chunk. Returns the number of rows written and skipped.
+
+        Every input row gets an output row; rows with missing inputs get NaN predictions.
+        """
+        complete = chunk.notna().all(axis=1).to_numpy()
+        X = chunk.to_numpy(dtype=np.float32)
+
+        y = np.full((len(X), len(self.output_params)), np.nan)
+        if complete.any():
+            y[complete] = self.predict(X[complete])
+
+        result = chunk.reset_index(drop=True)
+        predictions = pd.DataFrame(y, columns=self.output_params)
+        result = pd.concat([result, predictions], axis=1)
+
+        # Write to a temporary file first so a crash never leaves a half-written part behind
+        part_path = self._part_path(index)
+        tmp_path = f"{part_path}.tmp"
+        if self.output_format == "csv":
+            result.to_csv(tmp_path, index=False)
+        else:
+            result.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, part_path)
+        return len(result), int((~complete).sum())
+
+    def merge_parts(self, num_chunks):
+        """
+        Merge the part files into a single output file next to the input file.
+        """
+        tmp_path = f"{self.output_path}.tmp"
+        if self.output_format == "csv":
+            with open(tmp_path, "wb") as out:
+                for index in range(num_chunks):
+                    with open(self._part_path(index), "rb") as part:
+                        header = part.readline()
+                        if index == 0:
+                            out.write(header)
+                        while True:
+                            block = part.read(1 << 20)
+                            if not block:
+                                break
+                            out.write(block)
+        else:
+            import pyarrow.parquet as pq
+
+            writer = None
+            for index in range(num_chunks):
+                table = pq.read_table(self._part_path(index))
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, self.output_path)
+
+        for index in range(num_chunks):
+            os.remove(self._part_path(index))
+        os.rmdir(self.job_dir)
+
+    def run(self):
+        """
+        Run (or resume) the scoring job and return the final progress record.
+        """
+        progress = self.load_progress()
+        if progress["status"] == "completed":
+            return progress
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        progress.update({"status": "running", "error": None})
+        self.save_progress(progress)
+
+        try:
+            self.predictor, self.input_params, self.output_params = \
+                load_serving_components(self.model_name, self.project_name)
+
+            # Build the predict function once before worker threads start using the model
+            self.predict(np.zeros((1, len(self.input_params)), dtype=np.float32))
+
+            # Only the numpy runtime is evaluated from several threads
+            workers = 1 if isinstance(self.predictor, KerasPredictor) else self.max_workers
+
+            start_time = time.time()
+            elapsed_before = progress["elapsed_seconds"]
+            rows_this_run = 0
+            num_chunks = 0
+            in_flight = set()
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for index, chunk in self.iter_chunks(self.input_params):
+                    num_chunks = index + 1
+                    # Parts that already exist were completed by a previous run
+                    if os.path.exists(self._part_path(index)):
+                        continue
+
+                    in_flight.add(executor.submit(self.score_chunk, index, chunk))
+
+                    # Bound the number of chunks held in memory
+                    if len(in_flight) >= 2 * workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        rows_this_run += self._collect(done, progress, start_time, elapsed_before, rows_this_run)
+
+                done, in_flight = wait(in_flight)
+                rows_this_run += self._collect(done, progress, start_time, elapsed_before, rows_this_run)
+
+            self.merge_parts(num_chunks)
+            progress.update({"status": "completed", "output_path": self.output_path})
+            self.save_progress(progress)
+            logging.info("Batch scoring %s finished: %d rows at %s rows/s",
+                         self.job_id, progress["rows_done"], progress["rows_per_second"])
+            return progress
+
+        except Exception as e:
+            logging.error(f"Batch scoring {self.job_id} failed: {e}")
+            progress.update({"status": "failed", "error": str(e)})
+            self.save_progress(progress)
+            raise
+
+    def _collect(self, done, progress, start_time, elapsed_before, rows_before):
+        rows = 0
+        for future in done:
+            written, skipped = future.result()
+            rows += written
+            progress["rows_skipped"] += skipped
+            progress["chunks_done"] += 1
+
+        elapsed = time.time() - start_time
+        progress["rows_done"] += rows
+        progress["elapsed_seconds"] = elapsed_before + elapsed
+        if elapsed > 0:
+            progress["rows_per_second"] = (rows_before + rows) / elapsed
+        self.save_progress(progress)
+        return rows
+
+
+def input_fingerprint(file_path, project_name):
+    """
+    Identify what a job scores: the input file's size and modification time (uploads replace
+    files under the same name) and the project's current data version (its scalers).
+    """
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{project_name}:{os.path.basename(current_project_dir(project_name))}"
+
+
+def batch_job_id(file_name, project_name, model_name):
+    """
+    Job ids are derived from the input file, project and model, so re-submitting the same job
+    resumes it while a changed file or another project starts a new one.
+    """
+    stem = os.path.splitext(file_name)[0]
+    fingerprint = input_fingerprint(os.path.join(UPLOAD_DIRECTORY, file_name), project_name)
+    digest = hashlib.sha256(fingerprint.encode()).hexdigest()[:12]
+    return f"{stem}_{model_name}_{digest}_predictions"
+
+
+def progress_path(job_id):
+    return os.path.join(BATCH_DIRECTORY, f"{job_id}.progress")
+
+
+def get_batch_progress(job_id):
+    """
+    Return the persisted progress of a scoring job, or None if the job is unknown.
+    """
+    path = progress_path(job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
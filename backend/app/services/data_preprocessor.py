@@ -1,18 +1,26 @@
-import ast
 import os
 import json
 import logging
 import pandas as pd
 import numpy as np
 import pickle
+import copy
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.model_selection import train_test_split
 from app.config import PROCESSED_DIRECTORY, UPLOAD_DIRECTORY
+from app.services.storage import current_project_dir, new_project_version, project_lock_name, read_lock
+from app.services.registry import mark_models_stale, register_project
+from app.services.ingestion import read_dataset
+
+# Relative change of scaler statistics above which existing models should be retrained
+RETRAIN_SHIFT_THRESHOLD = 0.05
 
 class DataPreprocessor:
     def __init__(self, project_name: str, scaler_type: str, input_params: list, output_params: list, file_name: str):
         # Set the project directory and file paths
+        self.project_name = project_name
         self.project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+        self.output_dir = self.project_dir  # Replaced by a staged version directory while preprocessing
         self.param_file = os.path.join(self.project_dir, "params.json")
         
         # Ensure the file exists
@@ -23,6 +31,7 @@ class DataPreprocessor:
         self.input_params = input_params
         self.output_params = output_params
         self.scaler_type = scaler_type
+        self.file_name = file_name
         
         # Define the file path for the dataset
         self.file_path = os.path.join(UPLOAD_DIRECTORY, file_name)
@@ -31,65 +40,45 @@ class DataPreprocessor:
         if not os.path.exists(self.file_path):
             raise FileNotFoundError("Dataset file not found.")
 
-        # Load the dataset (CSV or JSON)
-        self.data = pd.read_csv(self.file_path) if self.file_path.endswith(".csv") else pd.read_json(self.file_path)
-        
+        # Load only the selected columns; nested fields are flattened and numbers downcast while parsing
+        columns = list(dict.fromkeys(self.input_params + self.output_params))
+        self.data = read_dataset(self.file_path, columns=columns)
+
+    @classmethod
+    def from_project(cls, project_name: str, file_name: str):
+        """
+        Create a preprocessor for a new batch file of an existing project, reusing the project's
+        input/output parameters and scaler type.
+        """
+        params_path = os.path.join(current_project_dir(project_name), "params.json")
+        if not os.path.exists(params_path):
+            raise FileNotFoundError("Parameters file not found.")
+        with open(params_path, "r") as f:
+            params = json.load(f)
+        return cls(
+            project_name=project_name,
+            scaler_type=params.get("scaler_type"),
+            input_params=params["input_params"],
+            output_params=params["output_params"],
+            file_name=file_name
+        )
 
 
     def extract_data(self):
         """
-        Extract input and output data based on the specified parameters from the loaded JSON data.
-        """
-        input_data = {param: [] for param in self.input_params}
-        output_data = {param: [] for param in self.output_params}
-        ids = self.data[self.input_params[0]].keys()
-
-        for id_key in ids:
-            valid = True
-            temp_input_data = {}
-            temp_output_data = {}
-
-            for param in self.input_params:
-                value = self.data[param].get(id_key)
-                if value is not None:
-                    temp_input_data[param] = value
-                else:
-                    valid = False
-                    logging.warning("Missing input parameter '%s' for ID: %s", param, id_key)
-                    break
-
-            if valid:
-                for param in self.output_params:
-                    if param == 'Throughput':
-                        throughput_value = self.data[param].get(id_key)
-                        if throughput_value is not None:
-                            try:
-                                temp_output_data[param] = ast.literal_eval(throughput_value)['Sink']
-                            except (ValueError, SyntaxError):
-                                valid = False
-                                logging.error("Invalid format for 'Throughput' at ID: %s", id_key)
-                                break
-                        else:
-                            valid = False
-                            logging.warning("Missing 'Throughput' parameter for ID: %s", id_key)
-                            break
-                    else:
-                        value = self.data[param].get(id_key)
-                        if value is not None:
-                            temp_output_data[param] = value
-                        else:
-                            valid = False
-                            logging.warning("Missing output parameter '%s' for ID: %s", param, id_key)
-                            break
-
-            if valid:
-                for param in self.input_params:
-                    input_data[param].append(temp_input_data[param])
-                for param in self.output_params:
-                    output_data[param].append(temp_output_data[param])
-
-        logging.info("Extracted data with %d valid records.", len(input_data[self.input_params[0]]))
-        return pd.DataFrame(input_data), pd.DataFrame(output_data)
+        Extract input and output data based on the specified parameters from the loaded data.
+
+        Nested outputs such as Throughput['Sink'] are already flattened by the ingestion engine;
+        records with a missing or invalid value are skipped.
+        """
+        complete = self.data.notna().all(axis=1)
+        skipped = int((~complete).sum())
+        if skipped:
+            logging.warning("Skipped %d records with missing or invalid parameters.", skipped)
+        data = self.data[complete].reset_index(drop=True)
+
+        logging.info("Extracted data with %d valid records.", len(data))
+        return data[self.input_params], data[self.output_params]
 
     def clean_data(self, input_df, output_df):
         """
@@ -131,20 +120,165 @@ class DataPreprocessor:
         """
         Save the training and testing data to .npz files.
         """
-        np.savez(os.path.join(self.project_dir, "train_data.npz"), X_train=X_train, y_train=y_train)
-        np.savez(os.path.join(self.project_dir, "test_data.npz"), X_test=X_test, y_test=y_test)
+        np.savez(os.path.join(self.output_dir, "train_data.npz"), X_train=X_train, y_train=y_train)
+        np.savez(os.path.join(self.output_dir, "test_data.npz"), X_test=X_test, y_test=y_test)
         logging.info("Training and testing data saved.")
 
     def save_scalers(self, scaler_X, scaler_y):
         """
         Save the scalers to pickle files for future use.
         """
-        with open(os.path.join(self.project_dir, 'scaler_X.pkl'), 'wb') as f:
+        with open(os.path.join(self.output_dir, 'scaler_X.pkl'), 'wb') as f:
             pickle.dump(scaler_X, f)
-        with open(os.path.join(self.project_dir, 'scaler_y.pkl'), 'wb') as f:
+        with open(os.path.join(self.output_dir, 'scaler_y.pkl'), 'wb') as f:
             pickle.dump(scaler_y, f)
         logging.info("Scalers saved.")
 
+    def save_params(self, appended_files=None):
+        """
+        Save the parameters used for this version alongside the data, so readers get them in the same snapshot.
+        """
+        params = {
+            "input_params": self.input_params,
+            "output_params": self.output_params,
+            "file_name": self.file_name,
+            "scaler_type": self.scaler_type
+        }
+        if appended_files:
+            params["appended_files"] = appended_files
+        with open(os.path.join(self.output_dir, "params.json"), "w") as f:
+            json.dump(params, f)
+
+    def load_current_version(self):
+        """
+        Load the train/test data, scalers and params of the project's current version.
+        """
+        with read_lock(project_lock_name(self.project_name)):
+            data_dir = current_project_dir(self.project_name)
+            if not os.path.exists(os.path.join(data_dir, "train_data.npz")):
+                raise FileNotFoundError("Project has not been preprocessed yet.")
+            with np.load(os.path.join(data_dir, "train_data.npz")) as train_data:
+                X_train, y_train = train_data["X_train"], train_data["y_train"]
+            with np.load(os.path.join(data_dir, "test_data.npz")) as test_data:
+                X_test, y_test = test_data["X_test"], test_data["y_test"]
+            with open(os.path.join(data_dir, "scaler_X.pkl"), "rb") as f:
+                scaler_X = pickle.load(f)
+            with open(os.path.join(data_dir, "scaler_y.pkl"), "rb") as f:
+                scaler_y = pickle.load(f)
+            with open(os.path.join(data_dir, "params.json"), "r") as f:
+                params = json.load(f)
+        return X_train, X_test, y_train, y_test, scaler_X, scaler_y, params
+
+    def assign_split(self, cleaned_data):
+        """
+        Assign new rows to train or test from a hash of their input values, so the assignment of a
+        row never changes between runs. About 10% of rows go to the test set, as in split_data.
+
+        Outputs are left out of the hash: projects built from the same inputs with other targets
+        must split the same rows alike, or they can no longer be trained together.
+        """
+        inputs = cleaned_data[self.input_params].astype(np.float64)
+        row_hashes = pd.util.hash_pandas_object(inputs, index=False).to_numpy()
+        return row_hashes % 10 == 0
+
+    def rescale(self, scaled, old_scaler, new_scaler, params):
+        """
+        Move stored scaled values from the old scaler onto the updated one.
+        """
+        raw = pd.DataFrame(old_scaler.inverse_transform(scaled), columns=params)
+        return new_scaler.transform(raw)
+
+    def scaler_shift(self, old_scaler, new_scaler, params):
+        """
+        Measure how far the scaler statistics moved, relative to the old scale, per column.
+        """
+        if isinstance(old_scaler, StandardScaler):
+            scale = np.where(old_scaler.scale_ > 0, old_scaler.scale_, 1.0)
+            shift = np.maximum(np.abs(new_scaler.mean_ - old_scaler.mean_) / scale,
+                               np.abs(new_scaler.scale_ / scale - 1.0))
+        else:
+            data_range = np.where(old_scaler.data_range_ > 0, old_scaler.data_range_, 1.0)
+            shift = np.maximum(np.abs(new_scaler.data_min_ - old_scaler.data_min_),
+                               np.abs(new_scaler.data_max_ - old_scaler.data_max_)) / data_range
+        return {param: float(value) for param, value in zip(params, shift)}
+
+    def append(self):
+        """
+        Append the rows of a new batch file to an existing project without re-reading the original data.
+
+        The scaler statistics are updated incrementally with partial_fit, the stored train/test arrays
+        are rescaled in place of a full re-preprocessing, and new rows are split by a stable row hash.
+        """
+        X_train, X_test, y_train, y_test, old_scaler_X, old_scaler_y, params = self.load_current_version()
+        self.scaler_type = type(old_scaler_X).__name__
+
+        input_df, output_df = self.extract_data()
+        cleaned_data = self.clean_data(input_df, output_df)
+        if cleaned_data.empty:
+            raise ValueError("The new file does not contain any valid rows.")
+        X_new = cleaned_data[self.input_params].astype(np.float64)
+        y_new = cleaned_data[self.output_params].astype(np.float64)
+
+        # Update the scalers with the new rows only
+        scaler_X = copy.deepcopy(old_scaler_X).partial_fit(X_new)
+        scaler_y = copy.deepcopy(old_scaler_y).partial_fit(y_new)
+
+        # Bring the stored arrays onto the updated scale
+        X_train = self.rescale(X_train, old_scaler_X, scaler_X, self.input_params)
+        X_test = self.rescale(X_test, old_scaler_X, scaler_X, self.input_params)
+        y_train = self.rescale(y_train, old_scaler_y, scaler_y, self.output_params)
+        y_test = self.rescale(y_test, old_scaler_y, scaler_y, self.output_params)
+
+        is_test = self.assign_split(cleaned_data)
+        X_new_scaled, y_new_scaled = scaler_X.transform(X_new), scaler_y.transform(y_new)
+        X_train = np.concatenate([X_train, X_new_scaled[~is_test]])
+        y_train = np.concatenate([y_train, y_new_scaled[~is_test]])
+        X_test = np.concatenate([X_test, X_new_scaled[is_test]])
+        y_test = np.concatenate([y_test, y_new_scaled[is_test]])
+
+        input_shift = self.scaler_shift(old_scaler_X, scaler_X, self.input_params)
+        output_shift = self.scaler_shift(old_scaler_y, scaler_y, self.output_params)
+        max_shift = max(list(input_shift.values()) + list(output_shift.values()))
+
+        appended_files = params.get("appended_files", []) + [self.file_name]
+        self.file_name = params.get("file_name", self.file_name)
+        with new_project_version(self.project_name) as version_dir:
+            self.output_dir = version_dir
+            self.save_data(X_train, X_test, y_train, y_test)
+            self.save_scalers(scaler_X, scaler_y)
+            self.save_params(appended_files=appended_files)
+        self.output_dir = self.project_dir
+
+        register_project(self.project_name, "ready", metrics={
+            "input_params": self.input_params,
+            "output_params": self.output_params,
+            "file_name": self.file_name,
+            "appended_files": appended_files,
+            "scaler_type": self.scaler_type,
+            "train_rows": int(len(X_train)),
+            "test_rows": int(len(X_test))
+        })
+
+        # Existing models were trained on the old scale and would now be fed inputs scaled differently
+        stale_models = mark_models_stale(self.project_name)
+
+        logging.info("Appended %d rows to %s (max scaler shift %.4f)", len(cleaned_data), self.project_name, max_shift)
+        if stale_models:
+            logging.info("Marked models of %s as stale: %s", self.project_name, ", ".join(stale_models))
+        return {
+            "message": "Append complete",
+            "appended_rows": int(len(cleaned_data)),
+            "appended_train_rows": int((~is_test).sum()),
+            "appended_test_rows": int(is_test.sum()),
+            "train_rows": int(len(X_train)),
+            "test_rows": int(len(X_test)),
+            "input_shift": input_shift,
+            "output_shift": output_shift,
+            "max_shift": max_shift,
+            "retrain_recommended": max_shift > RETRAIN_SHIFT_THRESHOLD,
+            "stale_models": stale_models
+        }
+
     def preprocess(self):
         input_df, output_df = self.extract_data()
         cleaned_data = self.clean_data(input_df, output_df)
@@ -152,8 +286,22 @@ class DataPreprocessor:
         X_scaled, y_scaled, scaler_X, scaler_y = self.scale_data(cleaned_data)
         X_train, X_test, y_train, y_test = self.split_data(X_scaled, y_scaled)
 
-        self.save_data(X_train, X_test, y_train, y_test)
-        self.save_scalers(scaler_X, scaler_y)
+        # Write into a new version of the project; it only becomes visible once complete
+        with new_project_version(self.project_name) as version_dir:
+            self.output_dir = version_dir
+            self.save_data(X_train, X_test, y_train, y_test)
+            self.save_scalers(scaler_X, scaler_y)
+            self.save_params()
+        self.output_dir = self.project_dir
+
+        register_project(self.project_name, "ready", metrics={
+            "input_params": self.input_params,
+            "output_params": self.output_params,
+            "file_name": self.file_name,
+            "scaler_type": self.scaler_type,
+            "train_rows": int(len(X_train)),
+            "test_rows": int(len(X_test))
+        })
 
         return {"message": "Preprocessing complete", "processed_data_preview": cleaned_data.head().to_dict()}
 
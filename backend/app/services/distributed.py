@@ -0,0 +1,532 @@
+import os
+import sys
+import hmac
+import json
+import time
+import shutil
+import socket
+import logging
+import argparse
+import secrets
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from urllib.parse import urlparse
+from multiprocessing import resource_tracker, shared_memory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from app.config import STAGING_DIRECTORY
+from app.services.storage import file_digest
+
+# Shared secret that workers present to the coordinator's HTTP side channel
+WORKER_TOKEN_ENV = "AUTOML_WORKER_TOKEN"
+TOKEN_HEADER = "X-Worker-Token"
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+HEARTBEAT_INTERVAL = 10  # Seconds between worker heartbeats
+LEASE_TIMEOUT = 60  # A worker without heartbeat for this long is considered dead
+MAX_RESTARTS = 3  # Restarts per local worker slot
+
+# keras-tuner release whose private oracle retry queue release_trial requeues into, as pinned in requirements.txt
+REQUEUE_KERAS_TUNER = "1.4.7"
+
+KERASTUNER_ENV = ("KERASTUNER_TUNER_ID", "KERASTUNER_ORACLE_IP", "KERASTUNER_ORACLE_PORT")
+
+SHARED_MEMORY_ALIGNMENT = 64  # Byte alignment of every array in a shared memory block
+
+
+class SearchComplete(Exception):
+    """Raised on workers in place of AutoKeras' final fit, which only the coordinator runs."""
+
+
+def free_port(host):
+    """Ask the OS for a port that is currently free on host."""
+    with socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def share_arrays(arrays):
+    """
+    Copy arrays into one new shared memory block.
+
+    Returns:
+        tuple: (SharedMemory, spec) where spec lets other processes attach with attach_shared_arrays.
+    """
+    arrays = {key: np.ascontiguousarray(array) for key, array in arrays.items()}
+    layout, size = {}, 0
+    for key, array in arrays.items():
+        layout[key] = {"shape": list(array.shape), "dtype": array.dtype.str, "offset": size}
+        size += -(-array.nbytes // SHARED_MEMORY_ALIGNMENT) * SHARED_MEMORY_ALIGNMENT
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for key, array in arrays.items():
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=layout[key]["offset"])
+        view[...] = array
+        del view
+    return block, {"name": block.name, "arrays": layout}
+
+
+def attach_shared_arrays(spec):
+    """
+    Attach to a block created by share_arrays and return (SharedMemory, {key: read-only array view}).
+
+    Raises FileNotFoundError if the block does not exist on this host.
+    """
+    # The creating process owns the block; the resource tracker of an attaching process would
+    # otherwise unlink it when that process exits
+    try:
+        block = shared_memory.SharedMemory(name=spec["name"], track=False)  # Python 3.13+
+    except TypeError:
+        block = shared_memory.SharedMemory(name=spec["name"])
+        if os.name == "posix":
+            # The tracker registered the POSIX name, the public name with its leading slash
+            resource_tracker.unregister(f"/{block.name}", "shared_memory")
+    arrays = {}
+    for key, layout in spec["arrays"].items():
+        view = np.ndarray(tuple(layout["shape"]), dtype=np.dtype(layout["dtype"]), buffer=block.buf,
+                          offset=layout["offset"])
+        view.flags.writeable = False
+        arrays[key] = view
+    return block, arrays
+
+
+class DistributedCoordinator:
+    def __init__(self, local_workers=2, bind_host="127.0.0.1", oracle_port=None, data_port=None,
+                 lease_timeout=LEASE_TIMEOUT, threads_per_worker=None, shared_memory=False, token=None,
+                 concurrent_searches=1):
+        """
+        Search backend that owns the tuner oracle and hands trials out to worker processes.
+
+        Trials are distributed with keras-tuner's chief/worker protocol: this process runs the
+        oracle as the 'chief' and every worker asks it for the next trial and reports its metrics
+        back. Next to the oracle, a small HTTP server lets workers fetch the job description and
+        the training data by content hash, and receives their heartbeats. Workers whose heartbeat
+        lapses (or local worker processes that exit) have their running trial put back into the
+        oracle's retry queue, so another worker picks it up.
+
+        By default both listen on the loopback interface only. To let remote hosts join, bind a
+        reachable interface and share a token; remote hosts then join with:
+        AUTOML_WORKER_TOKEN=<token> python -m app.services.distributed worker http://<coordinator>:<data_port>
+
+        The HTTP side channel rejects requests without the token. The keras-tuner oracle speaks
+        unauthenticated gRPC, so only bind non-loopback interfaces on a trusted network.
+
+        Args:
+            local_workers (int): Worker processes started on this host.
+            bind_host (str): Interface the oracle and HTTP server listen on.
+            oracle_port (int): Port of the keras-tuner oracle; a free port is picked by default.
+            data_port (int): Port of the HTTP side channel; a free port is picked by default.
+            lease_timeout (float): Seconds without heartbeat before a worker's trial is reassigned.
+            threads_per_worker (int): TensorFlow threads of each local worker. Defaults to an
+                even share of the CPU cores among all local workers of all concurrent searches.
+            shared_memory (bool): Place the training data in a shared memory block that workers on
+                this host attach to instead of downloading and loading their own copy.
+            token (str): Secret workers must present. Defaults to the AUTOML_WORKER_TOKEN environment
+                variable; required when bind_host is not a loopback address, generated otherwise.
+            concurrent_searches (int): Searches running on this host at the same time, e.g. one
+                per tuner when training with tuner='all'; they split the cores between them.
+        """
+        self.token = token or os.environ.get(WORKER_TOKEN_ENV)
+        if not self.token:
+            if bind_host not in LOOPBACK_HOSTS:
+                raise ValueError(f"Binding {bind_host} lets remote workers connect; "
+                                 f"set {WORKER_TOKEN_ENV} or pass a token they share")
+            self.token = secrets.token_urlsafe(32)
+        self.local_workers = local_workers
+        self.bind_host = bind_host
+        self.oracle_port = oracle_port
+        self.data_port = data_port
+        self.lease_timeout = lease_timeout
+        self.threads_per_worker = threads_per_worker
+        self.shared_memory = shared_memory
+        self.concurrent_searches = concurrent_searches
+
+        self.job = None
+        self.shared_block = None
+        self.data_path = None
+        self.oracle = None
+        self.heartbeats = {}  # worker_id -> time of last heartbeat
+        self.processes = {}  # worker_id -> Popen of local workers
+        self.restarts = 0
+        self.spawned = 0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.server = None
+
+    def search(self, automl, tuner_type, directory):
+        """
+        Run the search with trials executed by workers and return the fitted regressor.
+        """
+        from app.services.automl import EPOCHS, MAX_TRIALS, VALIDATION_SPLIT
+
+        self.data_path = automl.train_data_path
+        if not self.oracle_port:
+            self.oracle_port = free_port(self.bind_host)
+        self.job = {
+            "project_name": automl.project_name,
+            "tuner_type": tuner_type,
+            "digest": file_digest(self.data_path),
+            "oracle_port": self.oracle_port,
+            "max_trials": MAX_TRIALS,
+            "epochs": EPOCHS,
+            "validation_split": VALIDATION_SPLIT,
+        }
+        if self.shared_memory:
+            self.shared_block, self.job["shared_memory"] = share_arrays(
+                {"X_train": automl.X_train, "y_train": automl.y_train}
+            )
+        self.start_server()
+
+        # keras-tuner decides whether it is the chief from the environment when the tuner is created
+        saved_env = {key: os.environ.get(key) for key in KERASTUNER_ENV}
+        os.environ.update({
+            "KERASTUNER_TUNER_ID": "chief",
+            "KERASTUNER_ORACLE_IP": self.bind_host,
+            "KERASTUNER_ORACLE_PORT": str(self.oracle_port),
+        })
+        try:
+            regressor = automl.build_regressor(tuner_type, directory, max_trials=self.job["max_trials"])
+            self.oracle = regressor.tuner.oracle
+
+            for _ in range(self.local_workers):
+                self.spawn_local_worker()
+            threading.Thread(target=self.monitor, daemon=True).start()
+
+            # The chief serves the oracle until all trials are done, then runs the final fit itself
+            regressor.fit(automl.X_train, automl.y_train, epochs=EPOCHS, validation_split=VALIDATION_SPLIT)
+            return regressor
+        finally:
+            self.stopping.set()
+            self.stop_local_workers()
+            self.server.shutdown()
+            self.server.server_close()
+            if self.shared_block is not None:
+                self.shared_block.close()
+                self.shared_block.unlink()
+                self.shared_block = None
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    def start_server(self):
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def authorized(self):
+                if hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), coordinator.token):
+                    return True
+                self.send_error(403)
+                return False
+
+            def do_GET(self):
+                if not self.authorized():
+                    return
+                if self.path == "/job":
+                    self.send_json(coordinator.job)
+                elif self.path == f"/data/{coordinator.job['digest']}":
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(os.path.getsize(coordinator.data_path)))
+                    self.end_headers()
+                    with open(coordinator.data_path, "rb") as f:
+                        shutil.copyfileobj(f, self.wfile)
+                elif self.path == "/status":
+                    self.send_json(coordinator.status())
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if not self.authorized():
+                    return
+                if self.path != "/heartbeat":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with coordinator.lock:
+                    coordinator.heartbeats[body["worker_id"]] = time.time()
+                self.send_json({"stop": coordinator.stopping.is_set()})
+
+            def send_json(self, data):
+                payload = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logging.debug("coordinator: " + format, *args)
+
+        self.server = ThreadingHTTPServer((self.bind_host, self.data_port or 0), Handler)
+        self.data_port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        logging.info("Coordinator listening on %s:%d (oracle port %d)", self.bind_host, self.data_port, self.oracle_port)
+
+    def status(self):
+        with self.lock:
+            workers = {worker_id: time.time() - seen for worker_id, seen in self.heartbeats.items()}
+        ongoing = oracle_call(self.oracle, lambda oracle: dict(oracle.ongoing_trials)) if self.oracle is not None else {}
+        return {
+            "job": self.job,
+            "workers": workers,
+            "ongoing_trials": {worker_id: trial.trial_id for worker_id, trial in ongoing.items()},
+            "restarts": self.restarts,
+        }
+
+    def spawn_local_worker(self):
+        worker_id = f"local-{self.spawned}-{os.getpid()}"
+        self.spawned += 1
+        threads = self.threads_per_worker or max(
+            1, (os.cpu_count() or 1) // max(1, self.local_workers * self.concurrent_searches)
+        )
+        env = {key: value for key, value in os.environ.items() if key not in KERASTUNER_ENV}
+        # Passed through the environment so the token does not show up in the process list
+        env[WORKER_TOKEN_ENV] = self.token
+        command = [sys.executable, "-m", "app.services.distributed", "worker",
+                   f"http://127.0.0.1:{self.data_port}", "--worker-id", worker_id, "--threads", str(threads)]
+        self.processes[worker_id] = subprocess.Popen(command, env=env, cwd=os.getcwd())
+        logging.info("Started local worker %s", worker_id)
+
+    def stop_local_workers(self):
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def release_trial(self, worker_id):
+        """
+        Put the trial a dead worker was running back into the oracle's retry queue.
+
+        keras-tuner has no public call to hand a running trial to another tuner, so the trial is
+        moved into the oracle's private retry queue on the keras-tuner release this was written
+        for. Other releases end the trial as invalid through the public end_trial, which retries
+        it only within the oracle's max_retries_per_trial.
+        """
+        import keras_tuner
+
+        requeue = keras_tuner.__version__ == REQUEUE_KERAS_TUNER
+
+        def release(oracle):
+            # The chief only finishes the search once every tuner that joined has left, which a
+            # dead worker never does on its own
+            oracle.tuner_ids.discard(worker_id)
+            trial = oracle.ongoing_trials.get(worker_id)
+            if trial is None:
+                return None
+            if requeue:
+                del oracle.ongoing_trials[worker_id]
+                oracle._retry_queue.append(trial.trial_id)
+            else:
+                trial.status = "INVALID"
+                trial.message = f"Worker {worker_id} died while running the trial"
+                oracle.end_trial(trial)
+            return trial
+
+        trial = oracle_call(self.oracle, release)
+        if trial is None:
+            return
+        if requeue:
+            logging.warning("Worker %s died, trial %s will be reassigned", worker_id, trial.trial_id)
+        else:
+            logging.warning("Worker %s died, trial %s ended as invalid (keras-tuner %s cannot requeue it)",
+                            worker_id, trial.trial_id, keras_tuner.__version__)
+
+    def monitor(self):
+        while not self.stopping.wait(HEARTBEAT_INTERVAL):
+            # Local workers that crashed are replaced right away
+            for worker_id, process in list(self.processes.items()):
+                if process.poll() not in (None, 0):
+                    del self.processes[worker_id]
+                    self.release_trial(worker_id)
+                    if self.restarts < MAX_RESTARTS * max(1, self.local_workers):
+                        self.restarts += 1
+                        self.spawn_local_worker()
+
+            # Remote workers are detected by their heartbeat lapsing
+            now = time.time()
+            with self.lock:
+                expired = [worker_id for worker_id, seen in self.heartbeats.items() if now - seen > self.lease_timeout]
+                for worker_id in expired:
+                    del self.heartbeats[worker_id]
+            for worker_id in expired:
+                self.release_trial(worker_id)
+
+
+def oracle_call(oracle, func):
+    """
+    Run func(oracle) holding the oracle's lock.
+
+    The oracle's gRPC server threads change ongoing_trials and the retry queue inside methods
+    guarded by keras-tuner's synchronized decorator; going through the same decorator keeps
+    our reads and the requeue of a dead worker's trial from interleaving with them.
+    """
+    from keras_tuner import synchronized
+
+    return synchronized(lambda oracle: func(oracle))(oracle)
+
+
+class ParallelTrialsBackend(DistributedCoordinator):
+    def __init__(self, parallel_trials=2, threads_per_trial=None, oracle_port=None, data_port=None,
+                 concurrent_searches=1):
+        """
+        Search backend that runs several trials of one tuner at the same time on this host.
+
+        AutoKeras runs trials one after another, each using only part of a many-core CPU. This
+        backend runs parallel_trials worker processes against one oracle, using the coordinator
+        protocol on the loopback interface. Workers attach to the training data in a shared
+        memory block instead of fetching it over HTTP and loading their own copy of the npz
+        file. TensorFlow still copies the arrays into its own tensors, so this saves about one
+        copy of the data per worker, not all of it. Trial results land in the oracle's
+        trial.json files like a sequential search.
+
+        Args:
+            parallel_trials (int): Trials running concurrently, one worker process each.
+            threads_per_trial (int): TensorFlow threads per worker; defaults to an even share of the cores.
+            concurrent_searches (int): Searches sharing this host, which split the cores between them.
+            oracle_port (int): Port of the keras-tuner oracle; a free port is picked by default.
+            data_port (int): Port of the HTTP side channel; a free port is picked by default.
+        """
+        super().__init__(
+            local_workers=parallel_trials,
+            bind_host="127.0.0.1",
+            oracle_port=oracle_port,
+            data_port=data_port,
+            threads_per_worker=threads_per_trial,
+            shared_memory=True,
+            concurrent_searches=concurrent_searches
+        )
+
+
+def coordinator_request(url, token, data=None):
+    headers = {TOKEN_HEADER: token or ""}
+    if data is not None:
+        headers["Content-Type"] = "application/json"
+        data = json.dumps(data).encode()
+    return urllib.request.Request(url, data=data, headers=headers)
+
+
+def get_json(url, token=None):
+    with urllib.request.urlopen(coordinator_request(url, token), timeout=30) as response:
+        return json.loads(response.read())
+
+
+def fetch_training_data(coordinator_url, digest, cache_dir, token=None):
+    """
+    Download the training data by content hash, reusing a cached copy with the same hash.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{digest}.npz")
+    if os.path.exists(path) and file_digest(path) == digest:
+        return path
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with urllib.request.urlopen(coordinator_request(f"{coordinator_url}/data/{digest}", token), timeout=300) as response, \
+            open(tmp_path, "wb") as f:
+        shutil.copyfileobj(response, f)
+    if file_digest(tmp_path) != digest:
+        os.remove(tmp_path)
+        raise ValueError("Training data does not match the requested content hash")
+    os.replace(tmp_path, path)
+    return path
+
+
+def send_heartbeats(coordinator_url, worker_id, stop, token=None):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            request = coordinator_request(f"{coordinator_url}/heartbeat", token, {"worker_id": worker_id})
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+        except OSError as e:
+            logging.warning("Heartbeat to coordinator failed: %s", e)
+
+
+def _stop_after_search(**kwargs):
+    raise SearchComplete()
+
+
+def run_worker(coordinator_url, worker_id=None, threads=None, token=None):
+    """
+    Join a coordinator and run trials until the oracle has no trials left.
+
+    Args:
+        coordinator_url (str): URL of the coordinator's HTTP server, e.g. http://10.0.0.5:8002.
+        worker_id (str): Unique id of this worker; defaults to host name and pid.
+        threads (int): Bound on TensorFlow's intra-op threads, to share a host between workers.
+        token (str): Secret shared with the coordinator; defaults to AUTOML_WORKER_TOKEN.
+    """
+    coordinator_url = coordinator_url.rstrip("/")
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    token = token or os.environ.get(WORKER_TOKEN_ENV)
+    job = get_json(f"{coordinator_url}/job", token)
+
+    # Workers on the coordinator's host read the shared block; remote workers download the data
+    shared_block = None
+    if job.get("shared_memory"):
+        try:
+            shared_block, arrays = attach_shared_arrays(job["shared_memory"])
+            X_train, y_train = arrays["X_train"], arrays["y_train"]
+        except FileNotFoundError:
+            logging.info("Shared training data not available on this host, downloading it")
+    if shared_block is None:
+        data_path = fetch_training_data(coordinator_url, job["digest"], os.path.join(STAGING_DIRECTORY, "worker-cache"),
+                                        token)
+        with np.load(data_path) as train_data:
+            X_train, y_train = train_data["X_train"], train_data["y_train"]
+
+    os.environ.update({
+        "KERASTUNER_TUNER_ID": worker_id,
+        "KERASTUNER_ORACLE_IP": urlparse(coordinator_url).hostname,
+        "KERASTUNER_ORACLE_PORT": str(job["oracle_port"]),
+    })
+
+    import tensorflow as tf
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    from app.services.automl import AutoMLRegressor
+    automl = AutoMLRegressor(project_name=job["project_name"], tuner_types=[job["tuner_type"]])
+
+    stop = threading.Event()
+    threading.Thread(target=send_heartbeats, args=(coordinator_url, worker_id, stop, token), daemon=True).start()
+
+    directory = tempfile.mkdtemp(dir=STAGING_DIRECTORY, prefix=f"worker-{worker_id}-")
+    try:
+        regressor = automl.build_regressor(job["tuner_type"], directory, max_trials=job["max_trials"])
+        # Trial metrics go to the oracle; the final fit on the best trial is left to the coordinator
+        regressor.tuner.final_fit = _stop_after_search
+        regressor.fit(X_train, y_train, epochs=job["epochs"], validation_split=job["validation_split"])
+    except SearchComplete:
+        logging.info("Worker %s finished: no trials left", worker_id)
+    finally:
+        stop.set()
+        shutil.rmtree(directory, ignore_errors=True)
+        if shared_block is not None:
+            del X_train, y_train, arrays
+            try:
+                shared_block.close()
+            except BufferError:
+                # TensorFlow may still reference the views; the mapping goes away with the process
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed AutoML training worker.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker_parser = subparsers.add_parser("worker", help="Join a coordinator and run trials")
+    worker_parser.add_argument("coordinator_url", help="e.g. http://10.0.0.5:8002")
+    worker_parser.add_argument("--worker-id", default=None)
+    worker_parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run_worker(args.coordinator_url, args.worker_id, args.threads)
@@ -0,0 +1,400 @@
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import joblib
+import numpy as np
+from app.config import MODEL_DIRECTORY
+from app.services.model_export import MAX_EXPORT_DELTA, build_mlp, replace_artifact, scaler_affine
+from app.services.artifacts import TUNER_TYPES, load_heads, load_trial_index, split_model_name
+from app.services.registry import ensemble_manifest, register_model
+from app.services.serving_profiler import latency_percentiles
+from app.services.serving_runtime import (
+    ENSEMBLE_FORMAT, SERVING_FORMAT, EnsembleServingModel, ServingModel, load_serving_artifact,
+    scaler_digest, serving_dir
+)
+from app.services.storage import current_project_dir, model_lock_name, project_lock_name, read_lock
+
+DEFAULT_K = 5
+MAX_K = 20
+SINGLE_ROW_REQUESTS = 200  # Timed single-row predictions per runtime in the report
+BATCH_REPEATS = 5  # Timed full test set predictions per runtime; the fastest is reported
+
+# The AutoKeras release whose internals load_trial_models relies on, as pinned in requirements.txt
+SUPPORTED_AUTOKERAS = "1.0.20"
+
+# Ensemble names become directories under MODEL_DIRECTORY; no separators or leading dots
+ENSEMBLE_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+def ensemble_name_for(project_name, tuner=None):
+    """Default model directory of an ensemble: '{project}_ensemble' or '{project}_{tuner}_ensemble'."""
+    return f"{project_name}_{tuner}_ensemble" if tuner else f"{project_name}_ensemble"
+
+
+def check_ensemble_name(ensemble_name):
+    """
+    Refuse names that would leave MODEL_DIRECTORY or replace a model that is not an ensemble.
+    """
+    if not ENSEMBLE_NAME_PATTERN.fullmatch(ensemble_name):
+        raise ValueError(f"Invalid ensemble name {ensemble_name!r}: use letters, digits, '_', '-' and '.'")
+    model_dir = os.path.join(MODEL_DIRECTORY, ensemble_name)
+    if os.path.exists(model_dir) and ensemble_manifest(model_dir) is None:
+        raise ValueError(f"{ensemble_name} is an existing model that is not an ensemble; choose another name")
+
+
+def has_saved_weights(saved_model_dir):
+    """A SavedModel can only be loaded with its variables data, not just the variables index."""
+    variables_dir = os.path.join(saved_model_dir, "variables")
+    return os.path.isdir(variables_dir) and any(name.startswith("variables.data-") for name in os.listdir(variables_dir))
+
+
+def completed_trials(model_name):
+    """
+    List (val_loss, model_name, trial_id) for the trials of a search that still have their weights.
+
+    Trials whose checkpoints were pruned by the lifecycle manager cannot be rebuilt and are skipped.
+    """
+    index = load_trial_index(os.path.join(MODEL_DIRECTORY, model_name))
+    return [
+        (float(trial["score"]), model_name, trial["trial_id"])
+        for trial in index["trials"]
+        if trial["checkpoint"] and trial["status"] == "COMPLETED" and trial["score"] is not None
+    ]
+
+
+def select_members(project_name, k, tuner=None):
+    """
+    Pick the k trials with the lowest validation loss.
+
+    Args:
+        project_name (str): Project whose searches are ensembled.
+        k (int): Number of members.
+        tuner (str): Only use the '{project}_{tuner}' search; None ranks the trials of all tuners together.
+
+    Returns:
+        list: (val_loss, model_name, trial_id) of the members, best first.
+    """
+    tuners = [tuner] if tuner else TUNER_TYPES
+    candidates = []
+    for tuner_type in tuners:
+        model_name = f"{project_name}_{tuner_type}"
+        model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+        # Multi-project models have other heads in their outputs and are not ensembled
+        if not os.path.isdir(model_dir) or load_heads(model_dir) is not None:
+            continue
+        candidates.extend(completed_trials(model_name))
+    if not candidates:
+        raise FileNotFoundError(f"No completed trials found for project {project_name}")
+    candidates.sort()
+    return candidates[:k]
+
+
+def load_trial_models(model_name, trial_ids, X_train, y_train):
+    """
+    Rebuild trial networks of a finished search from their hyperparameters and checkpoints.
+
+    AutoKeras only saves the best model in full. The other trials are rebuilt the way fit() and
+    the search built them: the same analysis of the training data and the same validation split,
+    then each trial's preprocessing layers are adapted on the training part before its weights are
+    loaded. Checkpoints hold the weights but not the vocabularies of categorical encodings, which
+    is why the adaptation has to be repeated.
+
+    Public AutoKeras API only restores the best model, so this goes through the internals fit()
+    uses to analyze the data and set the graph's shapes. They change between releases; other
+    versions than SUPPORTED_AUTOKERAS are refused instead of rebuilding wrong networks.
+    """
+    import autokeras as ak
+    from autokeras.utils import data_utils
+    from app.services.automl import EPOCHS, VALIDATION_SPLIT
+
+    if ak.__version__ != SUPPORTED_AUTOKERAS:
+        raise RuntimeError(f"Rebuilding trials needs autokeras {SUPPORTED_AUTOKERAS} (installed: {ak.__version__}); "
+                           f"ensembles of other versions are not supported")
+
+    _, tuner_type = split_model_name(model_name)
+    regressor = ak.StructuredDataRegressor(
+        project_name=model_name,
+        directory=MODEL_DIRECTORY,
+        tuner=tuner_type,
+        overwrite=False,
+        loss='mean_absolute_error'
+    )
+    dataset, _ = regressor._convert_to_dataset(x=X_train, y=y_train, validation_data=None, batch_size=32)
+    regressor._analyze_data(dataset)
+    regressor._build_hyper_pipeline(dataset)
+    dataset, _ = data_utils.split_dataset(dataset, VALIDATION_SPLIT)
+    # Only shapes the optimizer schedules built with the model; the trial weights are loaded after
+    regressor.tuner.hypermodel.set_fit_args(VALIDATION_SPLIT, epochs=EPOCHS)
+
+    models = {}
+    for trial_id in trial_ids:
+        trial = regressor.tuner.oracle.get_trial(trial_id)
+        # Sets the graph's input and output shapes from the trial's preprocessing pipeline
+        _, trial_dataset, _ = regressor.tuner._prepare_model_build(trial.hyperparameters, x=dataset)
+        model = regressor.tuner.load_model(trial)
+        regressor.tuner.adapt(model, trial_dataset)
+        models[trial_id] = model
+    return models
+
+
+def stack_networks(networks):
+    """
+    Stack the dense layers of k networks into (k, fan_in, fan_out) weights for one batched evaluation.
+
+    Members are zero-padded to the widest member at every depth; padded units have zero weights
+    in and out, so they do not change any output. Shallower members get linear identity layers
+    before their output layer.
+
+    Args:
+        networks (list): Per member, the (W, b, activation) layers from build_mlp.
+
+    Returns:
+        tuple: (layers, activations) with (W, b) float64 arrays per stacked layer and the activation
+            names of the members per stacked layer.
+    """
+    depth = max(len(layers) for layers in networks)
+    aligned = []
+    for layers in networks:
+        width = layers[-1][0].shape[0]
+        identity = (np.eye(width), np.zeros(width), "linear")
+        aligned.append(list(layers[:-1]) + [identity] * (depth - len(layers)) + [layers[-1]])
+
+    k = len(networks)
+    stacked, activations = [], []
+    for i in range(depth):
+        members = [layers[i] for layers in aligned]
+        fan_in = max(W.shape[0] for W, _, _ in members)
+        fan_out = max(W.shape[1] for W, _, _ in members)
+        W_stacked = np.zeros((k, fan_in, fan_out))
+        b_stacked = np.zeros((k, fan_out))
+        for j, (W, b, _) in enumerate(members):
+            W_stacked[j, :W.shape[0], :W.shape[1]] = W
+            b_stacked[j, :len(b)] = b
+        stacked.append((W_stacked, b_stacked))
+        activations.append([activation for _, _, activation in members])
+    return stacked, activations
+
+
+def time_runtime(predict, X):
+    """Single-row latency percentiles and full-batch throughput of a predict function."""
+    for i in range(10):
+        predict(X[i % len(X)][None, :])
+    single = []
+    for i in range(SINGLE_ROW_REQUESTS):
+        row = X[i % len(X)][None, :]
+        start = time.perf_counter()
+        predict(row)
+        single.append(time.perf_counter() - start)
+    batch_seconds = []
+    for _ in range(BATCH_REPEATS):
+        start = time.perf_counter()
+        predict(X)
+        batch_seconds.append(time.perf_counter() - start)
+    return {
+        "single_row_ms": latency_percentiles(single),
+        "rows_per_second": len(X) / min(batch_seconds),
+    }
+
+
+def in_memory_model(layers, y_scale, y_offset, name):
+    """A numpy-mlp runtime for a converted network, without writing an artifact."""
+    return ServingModel(
+        [(W.astype(np.float32), b.astype(np.float32)) for W, b, _ in layers],
+        [activation for _, _, activation in layers],
+        y_scale.astype(np.float32), y_offset.astype(np.float32),
+        {"format": SERVING_FORMAT, "model_name": name}
+    )
+
+
+def ensemble_report(serving_model, members, member_models, member_networks, best_model, best_name,
+                    X_test, y_test, scaler_X, scaler_y):
+    """
+    Compare the fused ensemble with the members and the best single model on test_data.npz.
+
+    Accuracy is the raw-scale MAE. Latency is measured for the single best model (exported to
+    the same numpy runtime, so only the ensembling differs), the fused ensemble, and the k
+    members evaluated one after the other as the plain serving path would.
+    """
+    X_raw = scaler_X.inverse_transform(X_test)
+    y_true = scaler_y.inverse_transform(y_test)
+    y_scale, y_offset = scaler_affine(scaler_y)
+
+    # The fused pass must reproduce the mean of the Keras members
+    reference_scaled = np.mean([np.asarray(model.predict(X_test, verbose=0)) for model in member_models], axis=0)
+    fused_scaled = serving_model.predict_scaled(X_raw)
+    max_delta = float(np.max(np.abs(fused_scaled - reference_scaled)))
+    if max_delta > MAX_EXPORT_DELTA:
+        raise ValueError(f"Fused ensemble deviates from the averaged members by {max_delta:.2e}")
+
+    member_runtimes = [
+        in_memory_model(layers, y_scale, y_offset, f"{model_name}/trial_{trial_id}")
+        for layers, (_, model_name, trial_id) in zip(member_networks, members)
+    ]
+    best_runtime = in_memory_model(build_mlp(best_model, scaler_X), y_scale, y_offset, best_name)
+
+    def mae(predictions):
+        return float(np.mean(np.abs(predictions - y_true)))
+
+    def sequential(X):
+        return np.mean([runtime.predict_scaled(X) for runtime in member_runtimes], axis=0)
+
+    best_mae = mae(scaler_y.inverse_transform(np.asarray(best_model.predict(X_test, verbose=0))))
+    ensemble_mae = mae(serving_model.predict(X_raw))
+    timings = {
+        "best_model": time_runtime(best_runtime.predict, X_raw),
+        "ensemble": time_runtime(serving_model.predict, X_raw),
+        "members_sequential": time_runtime(sequential, X_raw),
+    }
+    best_p50 = timings["best_model"]["single_row_ms"]["p50"]
+
+    return {
+        "test_rows": int(len(X_test)),
+        "members": [
+            {"model_name": model_name, "trial_id": trial_id, "val_loss": val_loss, "test_mae": mae(runtime.predict(X_raw))}
+            for (val_loss, model_name, trial_id), runtime in zip(members, member_runtimes)
+        ],
+        "best_model": best_name,
+        "best_model_mae": best_mae,
+        "ensemble_mae": ensemble_mae,
+        "mae_gain": best_mae - ensemble_mae,
+        "mae_gain_percent": (best_mae - ensemble_mae) / best_mae * 100 if best_mae else None,
+        "max_abs_delta_scaled": max_delta,
+        "latency": timings,
+        "p50_latency_ratio": timings["ensemble"]["single_row_ms"]["p50"] / best_p50 if best_p50 else None,
+        "throughput_ratio": timings["ensemble"]["rows_per_second"] / timings["best_model"]["rows_per_second"],
+        "parameters": {
+            "members": int(sum(W.size + b.size for layers in member_networks for W, b, _ in layers)),
+            "stacked": int(sum(W.size + b.size for W, b in serving_model.layers)),
+        },
+    }
+
+
+def export_ensemble(project_name, k=DEFAULT_K, tuner=None, ensemble_name=None):
+    """
+    Export the top-k trials of a project's searches as one fused serving artifact.
+
+    The ensemble is written as a model directory of its own holding only a serving artifact,
+    so it is listed, served, batch scored and profiled like any other model.
+
+    Args:
+        project_name (str): Processed project providing the scalers and test data.
+        k (int): Number of trials to ensemble.
+        tuner (str): Rank the trials of the '{project}_{tuner}' search only; None ranks across all tuners.
+        ensemble_name (str): Model directory of the ensemble, '{project}[_{tuner}]_ensemble' by default.
+
+    Returns:
+        dict: The artifact manifest, including the accuracy and latency report.
+    """
+    if not 2 <= k <= MAX_K:
+        raise ValueError(f"k must be between 2 and {MAX_K}")
+    if tuner is not None and tuner not in TUNER_TYPES:
+        raise ValueError(f"Unknown tuner: {tuner}")
+    ensemble_name = ensemble_name or ensemble_name_for(project_name, tuner)
+    check_ensemble_name(ensemble_name)
+
+    members = select_members(project_name, k, tuner)
+    if len(members) < k:
+        # The lifecycle manager keeps the weights of only the best trials of every search
+        raise ValueError(f"k={k} members requested but only {len(members)} completed trials with weights "
+                         f"are left for {project_name}" + (f" ({tuner})" if tuner else ""))
+    # The best single model is the published best model of the search holding the best trial
+    best_name = members[0][1]
+
+    with read_lock(project_lock_name(project_name)):
+        project_dir = current_project_dir(project_name)
+        scaler_X = joblib.load(os.path.join(project_dir, "scaler_X.pkl"))
+        scaler_y = joblib.load(os.path.join(project_dir, "scaler_y.pkl"))
+        digest = scaler_digest(project_dir)
+        with open(os.path.join(project_dir, "params.json"), "r") as f:
+            params = json.load(f)
+        with np.load(os.path.join(project_dir, "train_data.npz")) as train_data:
+            X_train, y_train = train_data["X_train"], train_data["y_train"]
+        with np.load(os.path.join(project_dir, "test_data.npz")) as test_data:
+            X_test, y_test = test_data["X_test"], test_data["y_test"]
+    if len(X_test) == 0:
+        raise ValueError(f"Project {project_name} has no test rows to evaluate the ensemble with")
+
+    from tensorflow import keras
+
+    best_model = None
+    member_models = []
+    for model_name in dict.fromkeys(model_name for _, model_name, _ in members):
+        trial_ids = [trial_id for _, name, trial_id in members if name == model_name]
+        with read_lock(model_lock_name(model_name)):
+            models = load_trial_models(model_name, trial_ids, X_train, y_train)
+            best_path = os.path.join(MODEL_DIRECTORY, model_name, "best_model")
+            if model_name == best_name and has_saved_weights(best_path):
+                best_model = keras.models.load_model(best_path)
+        member_models.extend((model_name, trial_id, model) for trial_id, model in models.items())
+    # Back into ranking order
+    order = {(model_name, trial_id): i for i, (_, model_name, trial_id) in enumerate(members)}
+    member_models = [model for model_name, trial_id, model in sorted(member_models, key=lambda m: order[m[:2]])]
+    if best_model is None:
+        # The search kept no weights for its best model; compare with its best trial instead
+        logging.warning(f"best_model of {best_name} has no weights, using trial {members[0][2]} as the single model")
+        best_model = member_models[0]
+        best_name = f"{best_name}/trial_{members[0][2]}"
+
+    member_networks = [build_mlp(model, scaler_X) for model in member_models]
+    layers, activations = stack_networks(member_networks)
+
+    y_scale, y_offset = scaler_affine(scaler_y)
+    arrays = {"y_scale": y_scale.astype(np.float32), "y_offset": y_offset.astype(np.float32)}
+    for i, (W, b) in enumerate(layers):
+        arrays[f"W{i}"] = W.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+
+    manifest = {
+        "format": ENSEMBLE_FORMAT,
+        "model_name": ensemble_name,
+        "project_name": project_name,
+        "scaler_digest": digest,
+        "quantization": None,
+        "activations": activations,
+        "members": [
+            {"model_name": model_name, "trial_id": trial_id, "val_loss": val_loss}
+            for val_loss, model_name, trial_id in members
+        ],
+        "input_params": params.get("input_params", []),
+        "output_params": params.get("output_params", []),
+        "source_mtime": None,
+        "created_at": time.time(),
+    }
+
+    # Write into a temporary directory and swap it in, like exported single models
+    model_dir = os.path.join(MODEL_DIRECTORY, ensemble_name)
+    os.makedirs(model_dir, exist_ok=True)
+    artifact_dir = serving_dir(model_dir)
+    tmp_dir = f"{artifact_dir}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.savez(os.path.join(tmp_dir, "model.npz"), **arrays)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    serving_model = load_serving_artifact(tmp_dir)
+    if not isinstance(serving_model, EnsembleServingModel):
+        raise ValueError("The written artifact is not an ensemble")
+    manifest["report"] = ensemble_report(serving_model, members, member_models, member_networks, best_model,
+                                         best_name, X_test, y_test, scaler_X, scaler_y)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    replace_artifact(tmp_dir, artifact_dir, ensemble_name)
+    register_model(ensemble_name, "ready", project=project_name, tuner="ensemble")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the top-k trials of a project as one fused ensemble.")
+    parser.add_argument("project_name", help="Processed project with the scalers and test data")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="Number of trials in the ensemble")
+    parser.add_argument("--tuner", choices=TUNER_TYPES, default=None,
+                        help="Only ensemble the trials of this tuner's search (default: across all tuners)")
+    parser.add_argument("--name", default=None, help="Model directory of the ensemble")
+    args = parser.parse_args()
+
+    result = export_ensemble(args.project_name, args.k, args.tuner, args.name)
+    print(json.dumps(result["report"], indent=4))
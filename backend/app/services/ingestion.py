@@ -0,0 +1,342 @@
+import re
+import ast
+import json
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Nested fields of the scenario exports, flattened to one of their keys while parsing
+NESTED_FIELDS = {"Throughput": "Sink"}
+
+CSV_BLOCK_SIZE = 16 << 20  # Bytes parsed by Arrow per record batch
+JSON_READ_SIZE = 1 << 20  # Characters read at a time by the streaming JSON parser
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStream:
+    def __init__(self, f):
+        """
+        Incremental reader of one JSON document, decoding one value at a time with raw_decode.
+
+        Only the value being decoded has to be in memory, so arrays of records and column-oriented
+        objects can be consumed without loading the whole file.
+        """
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.read_size = JSON_READ_SIZE
+
+    def fill(self):
+        chunk = self.f.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it, or '' at the end."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Malformed JSON: expected one of {chars!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next read
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    self.read_size = JSON_READ_SIZE
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the reads while a large value is incomplete, so decoding stays linear overall
+            if not self.fill():
+                continue
+            self.read_size *= 2
+
+    def iter_array(self):
+        """Yield the items of an array whose '[' was already consumed."""
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+    def iter_object(self):
+        """
+        Yield the keys of an object whose '{' was already consumed. The caller decodes each
+        value with value() before asking for the next key.
+        """
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+def flatten_nested(series, key):
+    """
+    Replace nested values such as "{'Sink': 12.5, ...}" by the value of one key.
+
+    The exports store these fields as Python dict strings; the number is taken with a regular
+    expression and ast.literal_eval is only used for values it does not match. Values without
+    the key become NaN, so the row is dropped like any other incomplete row.
+    """
+    values = series.dropna()
+    if values.empty or pd.api.types.is_numeric_dtype(values):
+        return series
+
+    result = pd.Series(np.nan, index=series.index, dtype=np.float64)
+    is_dict = values.map(lambda v: isinstance(v, dict))
+    if is_dict.any():
+        result.loc[values.index[is_dict]] = [v.get(key, np.nan) for v in values[is_dict]]
+
+    strings = values[~is_dict].astype(str)
+    pattern = r"""['"]""" + re.escape(key) + r"""['"]\s*:\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"""
+    extracted = pd.to_numeric(strings.str.extract(pattern, expand=False), errors="coerce")
+    result.loc[extracted.index] = extracted
+
+    unmatched = extracted[extracted.isna()].index
+    invalid = 0
+    for index in unmatched:
+        try:
+            result.loc[index] = float(ast.literal_eval(strings.loc[index])[key])
+        except (ValueError, SyntaxError, KeyError, TypeError):
+            invalid += 1
+    if invalid:
+        logging.warning("%d values of '%s' have no '%s' entry", invalid, series.name, key)
+    return result
+
+
+def downcast(frame):
+    """
+    Store numeric columns in the smallest type that keeps their values.
+
+    Floats become float32 only if every value converts back to the same float64, e.g. counts
+    below 2**24 or binary fractions such as 0.5; a decimal like 0.1 would come back as
+    0.10000000149 and keeps float64. Integers become the smallest integer type that fits.
+    """
+    for column in frame.columns:
+        values = frame[column]
+        if pd.api.types.is_float_dtype(values) and values.dtype != np.float32:
+            numbers = values.to_numpy()
+            finite = numbers[np.isfinite(numbers)]
+            # Values beyond the float32 range overflow to inf and fail the comparison
+            with np.errstate(over="ignore"):
+                lossless = np.array_equal(finite.astype(np.float32).astype(np.float64), finite)
+            if lossless:
+                frame[column] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            frame[column] = pd.to_numeric(values, downcast="integer")
+    return frame
+
+
+def prepare(frame, columns=None, flatten=True, downcast_numbers=True):
+    """
+    Select, flatten and downcast one parsed chunk.
+    """
+    if columns is not None:
+        missing = [column for column in columns if column not in frame.columns]
+        if missing:
+            raise ValueError(f"Columns not found in the dataset: {', '.join(map(str, missing))}")
+        if list(frame.columns) != list(columns):
+            frame = frame[columns].copy()
+    if flatten:
+        for column, key in NESTED_FIELDS.items():
+            if column in frame.columns:
+                frame[column] = flatten_nested(frame[column], key)
+    if downcast_numbers:
+        frame = downcast(frame)
+    return frame
+
+
+def rechunk(frames, chunk_size):
+    """
+    Regroup a stream of DataFrames into chunks of exactly chunk_size rows (the last one may be shorter).
+    """
+    pending, pending_rows = [], 0
+    for frame in frames:
+        pending.append(frame)
+        pending_rows += len(frame)
+        while pending_rows >= chunk_size:
+            merged = pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0]
+            yield merged.iloc[:chunk_size].reset_index(drop=True)
+            rest = merged.iloc[chunk_size:]
+            pending, pending_rows = ([rest], len(rest)) if len(rest) else ([], 0)
+    if pending_rows:
+        yield pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0].reset_index(drop=True)
+
+
+def iter_csv(file_path, columns=None):
+    """
+    Stream a CSV file with Arrow's multithreaded reader, converting only the requested columns.
+    """
+    read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+    # Arrow fixes column types from the first block; integer columns are read as floats so
+    # a decimal value further down the file does not fail the conversion
+    schema = pa_csv.open_csv(file_path, read_options=read_options).schema
+    column_types = {field.name: pa.float64() for field in schema if pa.types.is_integer(field.type)}
+
+    convert_options = pa_csv.ConvertOptions(column_types=column_types)
+    if columns is not None:
+        convert_options.include_columns = columns
+    reader = pa_csv.open_csv(file_path, read_options=read_options, convert_options=convert_options)
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def iter_json_records(file_path, chunk_size, columns=None):
+    """
+    Stream a JSON lines file or a JSON array of records in DataFrames of chunk_size rows.
+    """
+    def records():
+        if json_layout(file_path) == "lines":
+            with open(file_path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        else:
+            with open(file_path, "r") as f:
+                stream = JSONStream(f)
+                stream.expect("[")
+                yield from stream.iter_array()
+
+    batch = []
+    for record in records():
+        # Unused fields are dropped as soon as a record is parsed
+        batch.append(record if columns is None else {column: record.get(column) for column in columns})
+        if len(batch) == chunk_size:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+            batch = []
+    if batch:
+        yield pd.DataFrame.from_records(batch, columns=columns)
+
+
+def read_json_columns(file_path, columns=None):
+    """
+    Read a column-oriented JSON object ({column: {id: value}}), keeping only the requested columns.
+
+    Every column is decoded on its own, so at most one unused column is in memory at a time.
+    """
+    selected = {}
+    with open(file_path, "r") as f:
+        stream = JSONStream(f)
+        stream.expect("{")
+        for key in stream.iter_object():
+            value = stream.value()
+            if columns is None or key in columns:
+                selected[key] = pd.Series(value)
+            del value
+    order = columns if columns is not None else list(selected)
+    return pd.DataFrame({column: selected[column] for column in order if column in selected})
+
+
+def json_layout(file_path):
+    """
+    Return 'lines' (one record per line), 'records' (array of records) or 'columns'
+    ({column: {id: value}}, the layout pd.read_json reads by default) for a JSON dataset.
+    """
+    with open(file_path, "r") as f:
+        first_line = f.readline().strip()
+        second_line = next((line.strip() for line in f if line.strip()), "")
+    if first_line.startswith("["):
+        return "records"
+    try:
+        record = json.loads(first_line)
+    except json.JSONDecodeError:
+        return "columns"
+    if not isinstance(record, dict):
+        return "columns"
+    # A column-oriented object spans one line; a second line holding a value means one record per line
+    if second_line:
+        return "lines"
+    # A single line is either a one-record file or a column-oriented object of nested values
+    if not all(isinstance(value, (dict, list)) for value in record.values()):
+        return "lines"
+    return "columns"
+
+
+def iter_dataset(file_path, chunk_size, columns=None, flatten=True, downcast_numbers=True):
+    """
+    Yield a CSV or JSON dataset as DataFrames of chunk_size rows.
+
+    CSV files are parsed by Arrow, JSON lines and arrays of records by a streaming parser and
+    column-oriented JSON objects column by column. Only the requested columns are kept, nested
+    fields (NESTED_FIELDS) are flattened and numbers are downcast while each chunk is parsed.
+
+    Args:
+        file_path (str): Path of the dataset.
+        chunk_size (int): Rows per yielded DataFrame.
+        columns (list): Columns to keep, in this order. All columns if None.
+        flatten (bool): Flatten nested fields such as Throughput['Sink'].
+        downcast_numbers (bool): Downcast floats to float32 where that is lossless and integers
+            to the smallest type.
+    """
+    if file_path.endswith(".csv"):
+        frames = iter_csv(file_path, columns)
+    elif json_layout(file_path) == "columns":
+        data = read_json_columns(file_path, columns)
+        frames = (data.iloc[start:start + chunk_size] for start in range(0, len(data), chunk_size))
+    else:
+        frames = iter_json_records(file_path, chunk_size, columns)
+
+    for chunk in rechunk(frames, chunk_size):
+        yield prepare(chunk, columns, flatten, downcast_numbers)
+
+
+def read_dataset(file_path, columns=None, flatten=True, downcast_numbers=True, chunk_size=1000000):
+    """
+    Read a whole dataset into one DataFrame through iter_dataset.
+    """
+    chunks = list(iter_dataset(file_path, chunk_size, columns, flatten, downcast_numbers))
+    if not chunks:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def read_columns(file_path):
+    """
+    Return the column names of a dataset without parsing its rows where the format allows.
+    """
+    if file_path.endswith(".csv"):
+        reader = pa_csv.open_csv(file_path, read_options=pa_csv.ReadOptions(block_size=1 << 16))
+        return reader.schema.names
+    layout = json_layout(file_path)
+    if layout == "columns":
+        names = []
+        with open(file_path, "r") as f:
+            stream = JSONStream(f)
+            stream.expect("{")
+            for key in stream.iter_object():
+                stream.value()
+                names.append(key)
+        return names
+    first_chunk = next(iter_json_records(file_path, 1), None)
+    return first_chunk.columns.tolist() if first_chunk is not None else []
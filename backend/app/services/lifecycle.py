@@ -0,0 +1,625 @@
+import os
+import json
+import time
+import shutil
+import logging
+import tarfile
+import tempfile
+import threading
+from contextlib import ExitStack
+from app.config import (
+    ARCHIVE_DIRECTORY, BATCH_DIRECTORY, LIFECYCLE_REPORT_PATH, MODEL_DIRECTORY, PROCESSED_DIRECTORY, PROFILE_DIRECTORY,
+    STAGING_DIRECTORY, UPLOAD_DIRECTORY
+)
+from app.services.artifacts import directory_size, load_heads, load_trial_index, split_model_name, write_trial_index
+from app.services.ensemble import DEFAULT_K
+from app.services.profiler import DIGEST_INDEX_PATH, PROFILE_VERSION
+from app.services.registry import (
+    PROCESS_STARTED_AT, ensemble_manifest, get_entry, list_entries, list_names, register_model, register_project,
+    remove, upsert
+)
+from app.services.storage import (
+    CURRENT_FILENAME, VERSIONS_DIRNAME, current_project_dir, list_project_versions, model_lock_name,
+    project_lock_name, write_json_atomic, write_lock
+)
+
+GIB = 1024 ** 3
+DAY = 24 * 3600
+
+# Retention policy applied on every run
+#   keep_trials: trial checkpoints kept per search, best first (enough for a default ensemble)
+#   archive_after_days: projects without training, preprocessing, exports, profiling or predictions for
+#       this long are compressed into ARCHIVE_DIRECTORY (None never archives by age)
+#   orphan_grace_days: orphaned files younger than this are left alone, e.g. an upload not preprocessed yet
+#   batch_output_days: finished batch scoring outputs are removed after this long
+RETENTION = {
+    "keep_trials": DEFAULT_K,
+    "archive_after_days": 90,
+    "orphan_grace_days": 7,
+    "batch_output_days": 30,
+}
+
+# Size quotas per storage area in bytes (None is unlimited). Areas over quota after the regular
+# pass prune all trial checkpoints, drop old data versions and archive idle projects, oldest first.
+QUOTAS = {
+    "models": 50 * GIB,
+    "processed": 10 * GIB,
+    "uploads": 20 * GIB,
+}
+# Projects touched more recently than this are never archived to meet a quota
+QUOTA_ARCHIVE_MIN_IDLE_DAYS = 7
+
+AREAS = {
+    "models": MODEL_DIRECTORY,
+    "processed": PROCESSED_DIRECTORY,
+    "uploads": UPLOAD_DIRECTORY,
+    "batch": BATCH_DIRECTORY,
+    "staging": STAGING_DIRECTORY,
+    "profiles": PROFILE_DIRECTORY,
+    "archive": ARCHIVE_DIRECTORY,
+}
+
+REPORT_HISTORY = 20  # Runs kept in the lifecycle report file
+
+# Only one run at a time, whether started by the background task or by a request
+_run_lock = threading.Lock()
+
+
+def path_size(path):
+    if os.path.isdir(path):
+        return directory_size(path)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def age_days(path, now):
+    return (now - os.path.getmtime(path)) / DAY
+
+
+class Reclaimer:
+    def __init__(self, dry_run=False):
+        """
+        Removes files and directories and accounts for the bytes reclaimed per area and action.
+
+        Args:
+            dry_run (bool): Only account for what would be removed.
+        """
+        self.dry_run = dry_run
+        self.actions = []
+        self.reclaimed = {}
+        self.removed = set()  # Paths already accounted for, so dry runs do not count them twice
+
+    def record(self, area, action, path, size):
+        self.actions.append({"area": area, "action": action, "path": path, "bytes": size})
+        self.reclaimed[area] = self.reclaimed.get(area, 0) + size
+
+    def is_removed(self, path):
+        """Whether a path was removed in this run, or would have been in a dry run."""
+        return any(path == removed or path.startswith(removed + os.sep) for removed in self.removed)
+
+    def remove(self, area, action, path):
+        if self.is_removed(path):
+            return 0
+        self.removed.add(path)
+        size = path_size(path)
+        if not self.dry_run:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        self.record(area, action, path, size)
+        return size
+
+    def summary(self):
+        by_action = {}
+        for action in self.actions:
+            by_action[action["action"]] = by_action.get(action["action"], 0) + action["bytes"]
+        return {
+            "bytes_reclaimed": sum(self.reclaimed.values()),
+            "by_area": dict(self.reclaimed),
+            "by_action": by_action,
+        }
+
+
+def search_dirs():
+    """Published model directories holding AutoKeras trials."""
+    names = []
+    for model_name in sorted(os.listdir(MODEL_DIRECTORY)):
+        model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+        if os.path.isdir(model_dir) and os.path.exists(os.path.join(model_dir, "best_model")):
+            names.append(model_name)
+    return names
+
+
+def prune_trials(model_name, keep, reclaimer):
+    """
+    Remove the checkpoints of all but the best `keep` trials of a search.
+
+    trial.json files stay, so the search history and the trial index remain complete and the
+    kept trials can still be reloaded (e.g. for ensembles).
+    """
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    index = load_trial_index(model_dir, write=not reclaimer.dry_run)
+    ranked = sorted(
+        (trial for trial in index["trials"] if trial["status"] == "COMPLETED" and trial["score"] is not None),
+        key=lambda trial: trial["score"]
+    )
+    kept = {trial["dir"] for trial in ranked[:keep]}
+    pruned = [trial for trial in index["trials"] if trial["checkpoint"] and trial["dir"] not in kept]
+    if not pruned:
+        return 0
+
+    reclaimed = 0
+    with write_lock(model_lock_name(model_name)):
+        for trial in pruned:
+            trial_dir = os.path.join(model_dir, trial["dir"])
+            for name in os.listdir(trial_dir):
+                if name != "trial.json":
+                    reclaimed += reclaimer.remove("models", "prune_trials", os.path.join(trial_dir, name))
+        if not reclaimer.dry_run:
+            write_trial_index(model_dir)
+    logging.info(f"Pruned {len(pruned)} trial checkpoints of {model_name}")
+    return reclaimed
+
+
+def prune_project_versions(project_name, reclaimer, keep=1):
+    """Remove processed data versions older than the `keep` newest ones."""
+    versions_dir = os.path.join(PROCESSED_DIRECTORY, project_name, VERSIONS_DIRNAME)
+    reclaimed = 0
+    with write_lock(project_lock_name(project_name)):
+        for version in list_project_versions(project_name)[:-keep]:
+            reclaimed += reclaimer.remove("processed", "prune_versions", os.path.join(versions_dir, version))
+    return reclaimed
+
+
+def project_models(project_name):
+    """
+    Model directories on disk that belong to a project, including its ensembles and the
+    multi-project models with a head for it.
+    """
+    names = set(list_names("model", project=project_name))
+    for model_name in os.listdir(MODEL_DIRECTORY):
+        if split_model_name(model_name)[0] == project_name:
+            names.add(model_name)
+        else:
+            heads = load_heads(os.path.join(MODEL_DIRECTORY, model_name))
+            if heads is not None and project_name in heads:
+                names.add(model_name)
+    return sorted(name for name in names if os.path.isdir(os.path.join(MODEL_DIRECTORY, name)))
+
+
+def model_owners(model_name, entry=None):
+    """Projects a model predicts for: the heads of a multi-project model, otherwise its project."""
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    heads = load_heads(model_dir)
+    if heads is not None:
+        return set(heads)
+    if entry is not None and entry["project"]:
+        return {entry["project"]}
+    manifest = ensemble_manifest(model_dir)
+    if manifest is not None:
+        return {manifest["project_name"]}
+    return {split_model_name(model_name)[0]}
+
+
+def archived_models(project_name, reclaimer):
+    """
+    Models archived together with a project. A multi-project model stays in place while another
+    of its projects is still stored, and goes into the archive of the last one.
+    """
+    def stored(owner):
+        owner_dir = os.path.join(PROCESSED_DIRECTORY, owner)
+        return os.path.isdir(owner_dir) and not reclaimer.is_removed(owner_dir)
+
+    return [
+        model_name for model_name in project_models(project_name)
+        if not any(stored(owner) for owner in model_owners(model_name) - {project_name})
+    ]
+
+
+def last_activity(project_name):
+    """
+    Time of the last training, preprocessing, export, profiling or prediction of a project or its models.
+    """
+    times = []
+    project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+    paths = [project_dir, os.path.join(project_dir, CURRENT_FILENAME), os.path.join(project_dir, "params.json")]
+    for model_name in project_models(project_name):
+        model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+        paths.extend([model_dir, os.path.join(model_dir, "serving")])
+        entry = get_entry("model", model_name)
+        if entry is not None:
+            times.append(entry["updated_at"])
+    times.extend(os.path.getmtime(path) for path in paths if os.path.exists(path))
+    entry = get_entry("project", project_name)
+    if entry is not None:
+        # Predictions are recorded on the project they were made for (see registry.mark_served), so
+        # serving a multi-project model for one project does not keep its other projects active
+        times.extend(value for value in (entry["updated_at"], entry["served_at"]) if value is not None)
+    return max(times) if times else 0.0
+
+
+def archive_path(project_name):
+    return os.path.join(ARCHIVE_DIRECTORY, f"{project_name}.tar.gz")
+
+
+def archive_project(project_name, reclaimer):
+    """
+    Compress a project's processed data and model directories into ARCHIVE_DIRECTORY and
+    remove them, marking the registry entries as 'archived'. See restore_project.
+    """
+
+    project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+    models = archived_models(project_name, reclaimer)
+    target = archive_path(project_name)
+    if reclaimer.dry_run:
+        reclaimer.remove("processed", "archive", project_dir)
+        for model_name in models:
+            reclaimer.remove("models", "archive", os.path.join(MODEL_DIRECTORY, model_name))
+        return
+
+    with ExitStack() as locks:
+        locks.enter_context(write_lock(project_lock_name(project_name)))
+        for model_name in models:
+            locks.enter_context(write_lock(model_lock_name(model_name)))
+        fd, tmp_path = tempfile.mkstemp(dir=ARCHIVE_DIRECTORY, prefix=f".{project_name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            with tarfile.open(tmp_path, "w:gz") as archive:
+                archive.add(project_dir, arcname=os.path.join("processed", project_name))
+                for model_name in models:
+                    archive.add(os.path.join(MODEL_DIRECTORY, model_name), arcname=os.path.join("models", model_name))
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        reclaimer.remove("processed", "archive", project_dir)
+        for model_name in models:
+            reclaimer.remove("models", "archive", os.path.join(MODEL_DIRECTORY, model_name))
+
+    # The archive itself takes space again
+    reclaimer.record("archive", "archive", target, -os.path.getsize(target))
+    upsert("project", project_name, status="archived", path=target, size_bytes=os.path.getsize(target))
+    for model_name in models:
+        upsert("model", model_name, status="archived", path=target)
+    logging.info(f"Archived project {project_name} with {len(models)} models into {target}")
+
+
+def restore_project(project_name):
+    """
+    Unpack an archived project and its models and list them as ready again.
+    """
+
+    source = archive_path(project_name)
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"No archive found for project {project_name}")
+
+    tmp_dir = tempfile.mkdtemp(dir=ARCHIVE_DIRECTORY, prefix=f".restore-{project_name}-")
+    try:
+        with tarfile.open(source, "r:gz") as archive:
+            members = archive.getmembers()
+            for member in members:
+                # Archives are written by archive_project; refuse anything leaving the directory
+                if os.path.isabs(member.name) or ".." in member.name.split("/") or not (member.isfile() or member.isdir()):
+                    raise ValueError(f"Unexpected entry in archive: {member.name}")
+            archive.extractall(tmp_dir, members=members)
+
+        restored = []
+        for area, directory in (("processed", PROCESSED_DIRECTORY), ("models", MODEL_DIRECTORY)):
+            area_dir = os.path.join(tmp_dir, area)
+            for name in sorted(os.listdir(area_dir)) if os.path.isdir(area_dir) else []:
+                if os.path.exists(os.path.join(directory, name)):
+                    raise ValueError(f"{name} already exists in {directory}")
+                restored.append((area, name, os.path.join(area_dir, name), os.path.join(directory, name)))
+        for area, name, source_dir, target_dir in restored:
+            lock_name = project_lock_name(name) if area == "processed" else model_lock_name(name)
+            with write_lock(lock_name):
+                os.replace(source_dir, target_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for area, name, _, target_dir in restored:
+        if area == "processed":
+            register_project(project_name, "ready", path=target_dir)
+            continue
+        training_time = None
+        training_time_path = os.path.join(target_dir, "training_time.json")
+        if os.path.exists(training_time_path):
+            with open(training_time_path, "r") as f:
+                training_time = json.load(f).get("training_time")
+        heads = load_heads(target_dir)
+        if heads is not None:
+            # Multi-project models are listed under their first project, as in rebuild_index
+            project, tuner = next(iter(heads)), split_model_name(name)[1]
+        elif not os.path.exists(os.path.join(target_dir, "best_model")):
+            project, tuner = project_name, "ensemble"
+        else:
+            project, tuner = None, None
+        register_model(name, "ready", project=project, tuner=tuner, training_time=training_time)
+    os.remove(source)
+    logging.info(f"Restored project {project_name} from {source}")
+    return [name for _, name, _, _ in restored]
+
+
+def referenced_uploads():
+    """Upload file names used by a processed project, including the files appended to it."""
+    names = set()
+    for project_name in os.listdir(PROCESSED_DIRECTORY):
+        for directory in (os.path.join(PROCESSED_DIRECTORY, project_name), current_project_dir(project_name)):
+            params_path = os.path.join(directory, "params.json")
+            if not os.path.exists(params_path):
+                continue
+            try:
+                with open(params_path, "r") as f:
+                    params = json.load(f)
+            except json.JSONDecodeError:
+                continue
+            names.add(params.get("file_name"))
+            names.update(params.get("appended_files", []))
+    return names
+
+
+def clean_batch_outputs(reclaimer, policy, now):
+    """
+    Remove finished batch outputs past their retention and part directories without a progress file.
+
+    Returns:
+        set: Upload file names scored by the batch jobs that are kept.
+    """
+    entries = set(os.listdir(BATCH_DIRECTORY))
+    jobs = {name[:-len(".progress")] for name in entries if name.endswith(".progress")}
+    inputs = set()
+
+    for job_id in jobs:
+        progress_path = os.path.join(BATCH_DIRECTORY, f"{job_id}.progress")
+        try:
+            with open(progress_path, "r") as f:
+                progress = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if progress.get("status") == "running" or age_days(progress_path, now) < policy["batch_output_days"]:
+            inputs.add(progress.get("file_name"))
+            continue
+        for name in (f"{job_id}.progress", f"{job_id}.parts", f"{job_id}.csv", f"{job_id}.parquet"):
+            if name in entries:
+                reclaimer.remove("batch", "batch_outputs", os.path.join(BATCH_DIRECTORY, name))
+
+    for name in sorted(entries):
+        path = os.path.join(BATCH_DIRECTORY, name)
+        if name.endswith(".parts") and name[:-len(".parts")] not in jobs \
+                and age_days(path, now) >= policy["orphan_grace_days"]:
+            reclaimer.remove("batch", "orphans", path)
+    return inputs
+
+
+def clean_uploads(reclaimer, policy, now, batch_inputs):
+    """Remove uploaded datasets that no project and no kept batch job uses."""
+    referenced = referenced_uploads() | batch_inputs
+    for name in sorted(os.listdir(UPLOAD_DIRECTORY)):
+        path = os.path.join(UPLOAD_DIRECTORY, name)
+        if name.endswith((".json", ".csv")) and name not in referenced \
+                and age_days(path, now) >= policy["orphan_grace_days"]:
+            reclaimer.remove("uploads", "orphans", path)
+
+
+def clean_processed(reclaimer, policy, now):
+    """Remove interrupted preprocessing output: staging versions and projects that were never configured."""
+    for project_name in os.listdir(PROCESSED_DIRECTORY):
+        project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+        if not os.path.isdir(project_dir) or age_days(project_dir, now) < policy["orphan_grace_days"]:
+            continue
+        versions_dir = os.path.join(project_dir, VERSIONS_DIRNAME)
+        if os.path.isdir(versions_dir):
+            for name in os.listdir(versions_dir):
+                path = os.path.join(versions_dir, name)
+                if name.startswith(".staging-") and age_days(path, now) >= policy["orphan_grace_days"]:
+                    reclaimer.remove("processed", "orphans", path)
+        if not os.path.exists(os.path.join(project_dir, "params.json")) and get_entry("project", project_name) is None:
+            reclaimer.remove("processed", "orphans", project_dir)
+
+
+def clean_models(reclaimer, policy, now):
+    """
+    Remove leftover artifact swaps and model directories whose project no longer exists,
+    since a model cannot be served without its project's scalers.
+    """
+    projects = set(os.listdir(PROCESSED_DIRECTORY))
+    for model_name in os.listdir(MODEL_DIRECTORY):
+        model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+        if not os.path.isdir(model_dir) or age_days(model_dir, now) < policy["orphan_grace_days"]:
+            continue
+        for name in os.listdir(model_dir):
+            if name.startswith("serving") and name.endswith((".tmp", ".old")):
+                reclaimer.remove("models", "orphans", os.path.join(model_dir, name))
+
+        entry = get_entry("model", model_name)
+        if entry is not None and entry["status"] == "training":
+            continue
+        owners = model_owners(model_name, entry)
+        if owners & projects:
+            continue
+        # A model outliving an archived project is needed again once the project is restored
+        if any((get_entry("project", owner) or {}).get("status") == "archived" for owner in owners):
+            continue
+        with write_lock(model_lock_name(model_name)):
+            reclaimer.remove("models", "orphans", model_dir)
+        if not reclaimer.dry_run:
+            remove("model", model_name)
+
+
+def clean_staging(reclaimer, policy, now):
+    """Remove models replaced by a newer training and staging directories of crashed trainings."""
+    # Entries left 'training' by an earlier server process belong to searches that died with it
+    # (see fail_stale_training) and must not keep their staging directories forever
+    training = any(entry["updated_at"] >= PROCESS_STARTED_AT for entry in list_entries("model", status="training")[0])
+    for name in os.listdir(STAGING_DIRECTORY):
+        path = os.path.join(STAGING_DIRECTORY, name)
+        if name.startswith("replaced-"):
+            reclaimer.remove("staging", "orphans", path)
+        elif os.path.getmtime(path) < PROCESS_STARTED_AT:
+            # Last written before this server process started, so no search of it uses the directory
+            reclaimer.remove("staging", "orphans", path)
+        elif not training and age_days(path, now) >= policy["orphan_grace_days"]:
+            # A running search writes into its staging directory for as long as it takes
+            reclaimer.remove("staging", "orphans", path)
+
+
+def clean_profiles(reclaimer):
+    """Remove cached dataset profiles of files that no longer exist or of an older profiler version."""
+    if not os.path.exists(DIGEST_INDEX_PATH):
+        return
+    try:
+        with open(DIGEST_INDEX_PATH, "r") as f:
+            index = json.load(f)
+    except json.JSONDecodeError:
+        return
+    live = {}
+    for key, digest in index.items():
+        path, size, mtime_ns = key.rsplit(":", 2)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if str(stat.st_size) == size and str(stat.st_mtime_ns) == mtime_ns:
+            live[key] = digest
+    digests = set(live.values())
+    for name in os.listdir(PROFILE_DIRECTORY):
+        if not name.endswith(".json") or name == os.path.basename(DIGEST_INDEX_PATH):
+            continue
+        if name.split("_")[0] not in digests or not name.endswith(f"_v{PROFILE_VERSION}.json"):
+            reclaimer.remove("profiles", "orphans", os.path.join(PROFILE_DIRECTORY, name))
+    if not reclaimer.dry_run and len(live) != len(index):
+        write_json_atomic(DIGEST_INDEX_PATH, live)
+
+
+def usage():
+    """Bytes used per storage area."""
+    return {area: path_size(directory) for area, directory in AREAS.items()}
+
+
+def enforce_quotas(reclaimer, quotas, used, now, touched, activity):
+    """
+    Bring areas over quota back under it, from the least to the most disruptive step:
+    all trial checkpoints, old data versions, then archiving idle projects, oldest first.
+
+    `activity` holds the last activity of every project from before the run, since pruning
+    rewrites the trial indexes and would make every project look active.
+
+    Returns:
+        dict: Areas still over quota with their usage.
+    """
+    def over(area):
+        return quotas.get(area) is not None and used[area] - reclaimer.reclaimed.get(area, 0) > quotas[area]
+
+    projects = sorted(activity, key=activity.get)
+    if over("models"):
+        order = {name: i for i, name in enumerate(projects)}
+        for model_name in sorted(search_dirs(), key=lambda name: order.get(split_model_name(name)[0], -1)):
+            if not over("models"):
+                break
+            if prune_trials(model_name, 0, reclaimer):
+                touched.add(model_name)
+    if over("processed"):
+        for project_name in projects:
+            if not over("processed"):
+                break
+            prune_project_versions(project_name, reclaimer)
+    for project_name in projects:
+        if not (over("models") or over("processed")):
+            break
+        if (now - activity[project_name]) / DAY >= QUOTA_ARCHIVE_MIN_IDLE_DAYS:
+            archive_project(project_name, reclaimer)
+
+    return {area: used[area] - reclaimer.reclaimed.get(area, 0) for area in quotas if over(area)}
+
+
+def run_lifecycle(dry_run=False, policy=None, quotas=None):
+    """
+    Apply the retention policy and quotas to all stored artifacts.
+
+    Steps: refresh the trial indexes, prune trial checkpoints beyond keep_trials, archive idle
+    projects, remove orphaned uploads, processed data, models, staging directories and profiles,
+    then enforce the size quotas.
+
+    Args:
+        dry_run (bool): Report what would be reclaimed without removing anything.
+        policy (dict): Overrides of RETENTION.
+        quotas (dict): Overrides of QUOTAS.
+
+    Returns:
+        dict: The run report with the bytes reclaimed per area and action.
+    """
+    policy = {**RETENTION, **(policy or {})}
+    quotas = {**QUOTAS, **(quotas or {})}
+    if not _run_lock.acquire(blocking=False):
+        raise RuntimeError("A lifecycle run is already in progress")
+    try:
+        start, now = time.perf_counter(), time.time()
+        reclaimer = Reclaimer(dry_run)
+        used = usage()
+        touched = set()  # Searches whose size changed
+        activity = {
+            project_name: last_activity(project_name) for project_name in os.listdir(PROCESSED_DIRECTORY)
+            if os.path.isdir(os.path.join(PROCESSED_DIRECTORY, project_name))
+        }
+
+        for model_name in search_dirs():
+            if prune_trials(model_name, policy["keep_trials"], reclaimer):
+                touched.add(model_name)
+
+        if policy["archive_after_days"] is not None:
+            for project_name, last in activity.items():
+                if (now - last) / DAY >= policy["archive_after_days"]:
+                    archive_project(project_name, reclaimer)
+
+        batch_inputs = clean_batch_outputs(reclaimer, policy, now)
+        clean_uploads(reclaimer, policy, now, batch_inputs)
+        clean_processed(reclaimer, policy, now)
+        clean_models(reclaimer, policy, now)
+        clean_staging(reclaimer, policy, now)
+        clean_profiles(reclaimer)
+        over_quota = enforce_quotas(reclaimer, quotas, used, now, touched, activity)
+
+        if not dry_run:
+            # Refresh the sizes listed by the registry
+            for model_name in touched:
+                model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+                if os.path.isdir(model_dir) and get_entry("model", model_name) is not None:
+                    upsert("model", model_name, size_bytes=path_size(model_dir))
+
+        report = {
+            "started_at": now,
+            "seconds": time.perf_counter() - start,
+            "dry_run": dry_run,
+            "policy": policy,
+            "quotas": quotas,
+            "usage_before": used,
+            **reclaimer.summary(),
+            "over_quota": over_quota,
+            "actions": reclaimer.actions,
+        }
+    finally:
+        _run_lock.release()
+
+    for area, size in over_quota.items():
+        logging.warning(f"Storage area {area} uses {size} bytes, over its quota of {quotas[area]}")
+    logging.info(f"Lifecycle run reclaimed {report['bytes_reclaimed']} bytes{' (dry run)' if dry_run else ''}")
+    save_report(report)
+    return report
+
+
+def save_report(report):
+    history = load_reports()
+    history.append(report)
+    write_json_atomic(LIFECYCLE_REPORT_PATH, history[-REPORT_HISTORY:])
+
+
+def load_reports():
+    if not os.path.exists(LIFECYCLE_REPORT_PATH):
+        return []
+    try:
+        with open(LIFECYCLE_REPORT_PATH, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return []
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import joblib
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from app.config import MODEL_DIRECTORY
+from app.services.artifacts import load_heads
+from app.services.serving_runtime import (
+    ACTIVATIONS, SERVING_FORMAT, load_serving_artifact, scaler_digest, serving_dir, source_mtime
+)
+from app.services.storage import (
+    current_project_dir, model_lock_name, project_lock_name, read_lock, write_lock
+)
+
+# Layers that are no-ops at inference time
+PASSTHROUGH_LAYERS = {"InputLayer", "Dropout"}
+
+# Largest acceptable difference between the exported float32 network and the SavedModel (scaled space)
+MAX_EXPORT_DELTA = 1e-3
+
+
+def scaler_affine(scaler):
+    """
+    Express a fitted scaler as an elementwise affine map: x_scaled = x * scale + offset.
+
+    Args:
+        scaler: A fitted StandardScaler or MinMaxScaler.
+
+    Returns:
+        tuple: (scale, offset) as float64 arrays.
+    """
+    if isinstance(scaler, StandardScaler):
+        n = scaler.n_features_in_
+        std = scaler.scale_ if scaler.scale_ is not None else np.ones(n)
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n)
+        return 1.0 / std, -mean / std
+    if isinstance(scaler, MinMaxScaler):
+        return scaler.scale_.astype(np.float64), scaler.min_.astype(np.float64)
+    raise ValueError(f"Unsupported scaler type: {type(scaler).__name__}")
+
+
+class MLPExporter:
+    def __init__(self, scaler_X):
+        """
+        Convert a chain of Keras layers into plain (W, b, activation) dense layers.
+
+        Elementwise affine maps (the input scaler, Normalization and BatchNormalization) are
+        folded into the neighbouring dense layer, so the exported network only contains matmuls.
+
+        Args:
+            scaler_X: The fitted input scaler, folded into the first dense layer.
+        """
+        self.layers = []
+        # Pending elementwise affine applied to the input of the next dense layer
+        self.pending_scale, self.pending_offset = scaler_affine(scaler_X)
+
+    def add_affine(self, scale, offset):
+        last = self.layers[-1] if self.layers else None
+        if last is not None and last[2] == "linear":
+            # Fold into the output columns of the previous dense layer
+            W, b, activation = last
+            self.layers[-1] = (W * scale, b * scale + offset, activation)
+        elif self.pending_scale is None:
+            # Fold into the input of the next dense layer
+            self.pending_scale, self.pending_offset = scale, offset
+        else:
+            self.pending_scale = self.pending_scale * scale
+            self.pending_offset = self.pending_offset * scale + offset
+
+    def add_dense(self, W, b, activation):
+        W = W.astype(np.float64)
+        b = b.astype(np.float64) if b is not None else np.zeros(W.shape[1])
+        if self.pending_scale is not None:
+            b = self.pending_offset @ W + b
+            W = self.pending_scale[:, None] * W
+            self.pending_scale, self.pending_offset = None, None
+        self.layers.append((W, b, activation))
+
+    def add_activation(self, activation):
+        if activation == "linear":
+            return
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation: {activation}")
+        if not self.layers or self.layers[-1][2] != "linear" or self.pending_scale is not None:
+            raise ValueError(f"Cannot fold activation '{activation}' into a dense layer")
+        W, b, _ = self.layers[-1]
+        self.layers[-1] = (W, b, activation)
+
+    def add_layer(self, layer):
+        class_name = type(layer).__name__
+        if class_name in PASSTHROUGH_LAYERS:
+            return
+        if class_name == "MultiCategoryEncoding":
+            # Purely numerical columns are passed through unchanged
+            if any(encoding != "none" for encoding in layer.encoding):
+                raise ValueError("Categorical column encodings are not supported by the serving format")
+            return
+        if class_name == "Normalization":
+            mean = np.asarray(layer.mean).reshape(-1)
+            variance = np.asarray(layer.variance).reshape(-1)
+            std = np.sqrt(np.maximum(variance, 1e-7))
+            self.add_affine(1.0 / std, -mean / std)
+            return
+        if class_name == "BatchNormalization":
+            gamma = layer.gamma.numpy() if layer.scale else 1.0
+            beta = layer.beta.numpy() if layer.center else 0.0
+            std = np.sqrt(layer.moving_variance.numpy() + layer.epsilon)
+            scale = gamma / std
+            self.add_affine(scale, beta - layer.moving_mean.numpy() * scale)
+            return
+        if class_name == "Dense":
+            W, b = layer.kernel.numpy(), layer.bias.numpy() if layer.use_bias else None
+            self.add_dense(W, b, "linear")
+            self.add_activation(layer.activation.__name__)
+            return
+        if class_name == "ReLU":
+            # Only the plain max(x, 0) has a counterpart in the serving runtime
+            if layer.max_value is not None or float(layer.negative_slope) != 0 or float(layer.threshold) != 0:
+                raise ValueError("ReLU layers with max_value, negative_slope or threshold are not supported "
+                                 "by the serving format")
+            self.add_activation("relu")
+            return
+        if class_name == "Activation":
+            self.add_activation(layer.activation.__name__)
+            return
+        raise ValueError(f"Layer type {class_name} is not supported by the serving format")
+
+
+def check_sequential(model):
+    """
+    Ensure every layer consumes the output of the layer before it.
+    """
+    config = model.get_config()
+    previous = None
+    for layer_config in config["layers"]:
+        inbound = layer_config.get("inbound_nodes") or []
+        sources = [node[0] for nodes in inbound for node in nodes] if inbound else []
+        if previous is not None and sources != [previous]:
+            raise ValueError("Only sequential models can be exported")
+        previous = layer_config["name"]
+
+
+def build_mlp(model, scaler_X):
+    """
+    Convert a Keras model into a list of (W, b, activation) dense layers taking raw inputs.
+    """
+    check_sequential(model)
+    exporter = MLPExporter(scaler_X)
+    for layer in model.layers:
+        exporter.add_layer(layer)
+    if not exporter.layers:
+        raise ValueError("The model does not contain any dense layers")
+    return exporter.layers
+
+
+def quantize(arrays, name, W, quantization):
+    """
+    Store a weight matrix with the requested quantization.
+    """
+    if quantization == "int8":
+        # Symmetric per-output-channel quantization
+        scale = np.abs(W).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        arrays[f"{name}_q"] = np.clip(np.round(W / scale), -127, 127).astype(np.int8)
+        arrays[f"{name}_scale"] = scale.astype(np.float32)
+    elif quantization == "float16":
+        arrays[name] = W.astype(np.float16)
+    else:
+        arrays[name] = W.astype(np.float32)
+
+
+def export_model(model_name, project_name, quantization=None):
+    """
+    Export a trained model and its scalers into a self-contained, TensorFlow-free serving artifact.
+
+    Args:
+        model_name (str): Name of the model directory under MODEL_DIRECTORY.
+        project_name (str): Processed project providing the scalers and test data.
+        quantization (str): None, 'float16' or 'int8' weight quantization.
+
+    Returns:
+        dict: The artifact manifest, including the accuracy-delta report.
+    """
+    from tensorflow import keras
+
+    if quantization not in (None, "float16", "int8"):
+        raise ValueError(f"Unsupported quantization: {quantization}")
+
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    model_path = os.path.join(model_dir, "best_model")
+
+    with read_lock(model_lock_name(model_name)), read_lock(project_lock_name(project_name)):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError("Model file does not exist.")
+
+        project_dir = current_project_dir(project_name)
+        model = keras.models.load_model(model_path)
+        scaler_X = joblib.load(os.path.join(project_dir, "scaler_X.pkl"))
+        scaler_y = joblib.load(os.path.join(project_dir, "scaler_y.pkl"))
+        digest = scaler_digest(project_dir)
+        with open(os.path.join(project_dir, "params.json"), "r") as f:
+            params = json.load(f)
+        with np.load(os.path.join(project_dir, "test_data.npz")) as test_data:
+            X_test, y_test = test_data["X_test"], test_data["y_test"]
+
+    layers = build_mlp(model, scaler_X)
+
+    # A multi-project model is exported per project, keeping only that project's output columns
+    heads = load_heads(model_dir)
+    head, output_slice = None, None
+    if heads is not None:
+        if project_name not in heads:
+            raise ValueError(f"Model {model_name} was not trained for project {project_name}")
+        head, output_slice = project_name, slice(*heads[project_name])
+        W, b, activation = layers[-1]
+        layers[-1] = (W[:, output_slice], b[output_slice], activation)
+
+    y_scale, y_offset = scaler_affine(scaler_y)
+    arrays = {"y_scale": y_scale.astype(np.float32), "y_offset": y_offset.astype(np.float32)}
+    for i, (W, b, _) in enumerate(layers):
+        quantize(arrays, f"W{i}", W, quantization)
+        arrays[f"b{i}"] = b.astype(np.float32)
+
+    manifest = {
+        "format": SERVING_FORMAT,
+        "model_name": model_name,
+        "project_name": project_name,
+        "scaler_digest": digest,  # Scalers folded into the weights, see serving_runtime.matches_project
+        "quantization": quantization,
+        "activations": [activation for _, _, activation in layers],
+        "input_params": params.get("input_params", []),
+        "output_params": params.get("output_params", []),
+        "source_mtime": source_mtime(model_dir),
+        "created_at": time.time(),
+    }
+
+    # Write into a temporary directory and swap it in, so readers never see a partial artifact
+    artifact_dir = serving_dir(model_dir, head)
+    tmp_dir = f"{artifact_dir}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    np.savez(os.path.join(tmp_dir, "model.npz"), **arrays)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    manifest["report"] = accuracy_report(model, tmp_dir, X_test, y_test, scaler_X, scaler_y, quantization, output_slice)
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    replace_artifact(tmp_dir, artifact_dir, model_name)
+    return manifest
+
+
+def replace_artifact(tmp_dir, artifact_dir, model_name):
+    """
+    Swap a fully written artifact directory in place of the current one under the model's write lock.
+    """
+    with write_lock(model_lock_name(model_name)):
+        if os.path.exists(artifact_dir):
+            old_dir = f"{artifact_dir}.old"
+            os.replace(artifact_dir, old_dir)
+            os.replace(tmp_dir, artifact_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, artifact_dir)
+
+
+def accuracy_report(model, artifact_dir, X_test, y_test, scaler_X, scaler_y, quantization, output_slice=None):
+    """
+    Compare the exported artifact with the SavedModel on test_data.npz.
+    """
+    # The artifact takes raw inputs, the test set is stored scaled
+    X_raw = scaler_X.inverse_transform(X_test)
+    y_true = scaler_y.inverse_transform(y_test)
+
+    start = time.perf_counter()
+    reference_scaled = np.asarray(model.predict(X_test, verbose=0))
+    reference_seconds = time.perf_counter() - start
+    if output_slice is not None:
+        reference_scaled = reference_scaled[:, output_slice]
+
+    serving_model = load_serving_artifact(artifact_dir)
+    start = time.perf_counter()
+    exported_scaled = serving_model.predict_scaled(X_raw)
+    exported_seconds = time.perf_counter() - start
+
+    max_delta = float(np.max(np.abs(exported_scaled - reference_scaled))) if len(X_test) else 0.0
+    if quantization is None and max_delta > MAX_EXPORT_DELTA:
+        raise ValueError(f"Exported model deviates from the SavedModel by {max_delta:.2e}")
+
+    reference_mae = float(np.mean(np.abs(scaler_y.inverse_transform(reference_scaled) - y_true)))
+    exported_mae = float(np.mean(np.abs(serving_model.predict(X_raw) - y_true)))
+    return {
+        "test_rows": int(len(X_test)),
+        "reference_mae": reference_mae,
+        "exported_mae": exported_mae,
+        "mae_delta": exported_mae - reference_mae,
+        "max_abs_delta_scaled": max_delta,
+        "reference_predict_seconds": reference_seconds,
+        "exported_predict_seconds": exported_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a trained model into a TensorFlow-free serving artifact.")
+    parser.add_argument("model_name", help="Model directory under MODEL_DIRECTORY, e.g. CFP_4800_bayesian")
+    parser.add_argument("project_name", help="Processed project with the scalers and test data")
+    parser.add_argument("--quantization", choices=["float16", "int8"], default=None)
+    args = parser.parse_args()
+
+    result = export_model(args.model_name, args.project_name, args.quantization)
+    print(json.dumps(result["report"], indent=4))
@@ -2,79 +2,177 @@ import os
 import joblib
 import numpy as np
 import json
+import sqlite3
+import threading
 from fastapi import HTTPException
 from app.schemas.predict import PredictRequest
 from app.config import MODEL_DIRECTORY, PROCESSED_DIRECTORY
-# from tensorflow.keras.models import load_model # changes depending on Tensorflow version
-from tensorflow import keras
-from keras.layers import Dense
-from keras.models import Sequential, load_model
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from app.services.artifacts import load_heads
+from app.services.registry import mark_served
+from app.services.serving_runtime import has_serving_artifact, load_serving_model, matches_project, source_mtime
+from app.services.storage import current_project_dir, model_lock_name, project_lock_name, read_lock
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 
-def make_prediction(data: PredictRequest):
+# (model dir, project) -> (version, KerasPredictor), so predictions do not reload the SavedModel
+_keras_cache = {}
+_keras_cache_lock = threading.Lock()
+
+class KerasPredictor:
+    """
+    Wraps a Keras SavedModel and the project scalers behind the same predict() as the serving runtime.
+    """
+    def __init__(self, model, scaler_X, scaler_y, output_slice=None):
+        self.model = model
+        self.scaler_X = scaler_X
+        self.scaler_y = scaler_y
+        self.output_slice = output_slice  # Output columns of this project in a multi-project model
+
+    def predict(self, X, batch_size=32):
+        # Scale the input data, predict and inverse scale the prediction
+        X_scaled = self.scaler_X.transform(X)
+        prediction_scaled = self.model.predict(X_scaled, batch_size=batch_size, verbose=0)
+        if self.output_slice is not None:
+            prediction_scaled = prediction_scaled[:, self.output_slice]
+        return self.scaler_y.inverse_transform(prediction_scaled)
+
+def load_serving_components(model_name: str, project_name: str):
+    """
+    Load everything needed to serve a model: a predictor taking raw inputs and returning
+    outputs in the original scale, and the input/output parameter lists from params.json.
+
+    An exported serving artifact (see model_export.py) is preferred over the SavedModel,
+    since it loads without TensorFlow.
+
+    Args:
+        model_name (str): Name of the model directory under MODEL_DIRECTORY.
+        project_name (str): Name of the processed project under PROCESSED_DIRECTORY.
+
+    Returns:
+        tuple: (predictor, input_params, output_params)
+    """
+    # Hold read locks while loading, so a publishing writer cannot swap files underneath
+    with read_lock(model_lock_name(model_name)), read_lock(project_lock_name(project_name)):
+        components = _load_serving_components(model_name, project_name)
+    # Served projects count as active for the lifecycle manager; a busy registry must not fail the prediction
     try:
-        # Extract model name and input data from the request
-        model_name = data.model_name  # Use model_name here
-        input_data = data.input_data
-        project_name = data.project_name  # Keep project name for params.json
-        
-        # Log received data for debugging
-        logging.debug(f"Received request for model: {model_name}, project: {project_name}, input data: {input_data}")
+        mark_served(model_name, project_name)
+    except sqlite3.Error as e:
+        logging.warning(f"Could not record serving of {model_name}: {str(e)}")
+    return components
+
+def _load_serving_components(model_name: str, project_name: str):
+    # Paths to the model, scaler, and parameters
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    scaler_dir = current_project_dir(project_name)
+    model_path = os.path.join(model_dir, "best_model")
 
-        # Paths to the model, scaler, and parameters
-        model_dir = os.path.join(MODEL_DIRECTORY, model_name)
-        scaler_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
-        model_path = os.path.join(model_dir, "best_model")
+    # Log the model path for debugging
+    logging.debug(f"Model path: {model_path}")
 
-        # Log the model path for debugging
-        logging.debug(f"Model path: {model_path}")
+    # Models trained for several projects predict the outputs of all of them side by side
+    heads = load_heads(model_dir)
+    head = None
+    if heads is not None:
+        if project_name not in heads:
+            raise HTTPException(status_code=400, detail=f"Model {model_name} was not trained for project {project_name}.")
+        head = project_name
 
+    predictor = None
+    if has_serving_artifact(model_dir, head):
+        predictor = load_serving_model(model_dir, head)
+        # The artifact carries the scalers of its export; after a re-preprocess or an append the
+        # project's current scalers differ and only the SavedModel can use them
+        if matches_project(predictor.manifest, project_name, scaler_dir):
+            logging.debug(f"Using serving artifact for model: {model_name}")
+        else:
+            logging.warning(f"Serving artifact of {model_name} does not match the scalers of {project_name}")
+            if not os.path.exists(model_path):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Model {model_name} was exported for other scalers than the current data of "
+                           f"{project_name}; export it again."
+                )
+            predictor = None
+
+    if predictor is None:
         # Check if model exists
         if not os.path.exists(model_path):
             logging.error(f"Model file does not exist at {model_path}")
             raise HTTPException(status_code=400, detail="Model file does not exist.")
-        
-        # Load the trained model
-        model = keras.models.load_model(model_path)
 
-        # Load the scalers for input and output
-        scaler_X = joblib.load(os.path.join(scaler_dir, "scaler_X.pkl"))
-        scaler_y = joblib.load(os.path.join(scaler_dir, "scaler_y.pkl"))
+        output_slice = slice(*heads[project_name]) if heads is not None else None
+        predictor = load_keras_predictor(model_dir, project_name, scaler_dir, output_slice)
 
-        # Load input/output parameters from the params.json file
-        params_path = os.path.join(PROCESSED_DIRECTORY, project_name, "params.json")
-        
-        # Log the params path for debugging
-        logging.debug(f"Params path: {params_path}")
+    # Load input/output parameters from the params.json file
+    params_path = os.path.join(scaler_dir, "params.json")
 
-        # Check if params file exists
-        if not os.path.exists(params_path):
-            logging.error(f"Parameters file does not exist at {params_path}")
-            raise HTTPException(status_code=400, detail="Parameters file does not exist.")
-        
-        # Load the parameters from the JSON file
-        with open(params_path, "r") as f:
-            params = json.load(f)
+    # Log the params path for debugging
+    logging.debug(f"Params path: {params_path}")
+
+    # Check if params file exists
+    if not os.path.exists(params_path):
+        logging.error(f"Parameters file does not exist at {params_path}")
+        raise HTTPException(status_code=400, detail="Parameters file does not exist.")
+
+    # Load the parameters from the JSON file
+    with open(params_path, "r") as f:
+        params = json.load(f)
+
+    # Extract input and output parameters
+    input_params = params.get("input_params", [])
+    output_params = params.get("output_params", [])
+
+    return predictor, input_params, output_params
+
+def load_keras_predictor(model_dir, project_name, scaler_dir, output_slice=None):
+    """
+    Load the SavedModel and the project scalers, reusing the last load of the same model and data version.
+
+    A retrained model changes the SavedModel's mtime and a re-preprocess or an append publishes
+    another project version, either of which loads the predictor again.
+    """
+    key = (os.path.abspath(model_dir), project_name)
+    scaler_paths = [os.path.join(scaler_dir, name) for name in ("scaler_X.pkl", "scaler_y.pkl")]
+    # Unversioned projects keep their scalers in place, so their mtimes are part of the version
+    version = (source_mtime(model_dir), os.path.abspath(scaler_dir), *[os.path.getmtime(path) for path in scaler_paths])
+
+    with _keras_cache_lock:
+        cached = _keras_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    # Load the trained model, TensorFlow is only imported when no serving artifact exists
+    from tensorflow import keras
+    model = keras.models.load_model(os.path.join(model_dir, "best_model"))
+
+    # Load the scalers for input and output
+    scaler_X, scaler_y = [joblib.load(path) for path in scaler_paths]
+    predictor = KerasPredictor(model, scaler_X, scaler_y, output_slice)
+    with _keras_cache_lock:
+        _keras_cache[key] = (version, predictor)
+    return predictor
+
+def make_prediction(data: PredictRequest):
+    try:
+        # Extract model name and input data from the request
+        model_name = data.model_name  # Use model_name here
+        input_data = data.input_data
+        project_name = data.project_name  # Keep project name for params.json
         
-        # Extract input and output parameters
-        input_params = params.get("input_params", [])
-        output_params = params.get("output_params", [])
+        # Log received data for debugging
+        logging.debug(f"Received request for model: {model_name}, project: {project_name}, input data: {input_data}")
+
+        # Load the predictor and input/output parameters
+        predictor, input_params, output_params = load_serving_components(model_name, project_name)
 
         # Ensure input data matches the expected structure
         input_values = [input_data[param] for param in input_params]
 
-        # Scale the input data using the scaler
-        input_scaled = scaler_X.transform(np.array([input_values]))
-
-        # Make the prediction using the model
-        prediction_scaled = model.predict(input_scaled)
-
-        # Inverse scale the prediction
-        prediction = scaler_y.inverse_transform(prediction_scaled)
+        # Make the prediction, scaling is handled by the predictor
+        prediction = predictor.predict(np.array([input_values]))
 
         # Return the prediction as a dictionary with output parameters
         return {
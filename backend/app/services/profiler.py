@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import logging
+import numpy as np
+import pandas as pd
+from app.config import UPLOAD_DIRECTORY, PROFILE_DIRECTORY
+from app.services.storage import atomic_write, file_digest, write_json_atomic
+from app.services.ingestion import iter_dataset
+
+DEFAULT_SAMPLE_SIZE = 10000  # Rows kept in the reservoir sample used for quantiles
+CHUNK_SIZE = 100000  # Rows parsed at a time while streaming the file
+KMV_SIZE = 1024  # Smallest hashes kept per column; distinct counts are within ~3% (1/sqrt(k))
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+MOSTLY_NULL_RATIO = 0.5  # Columns with more missing values than this are flagged
+PROFILE_VERSION = 2  # Part of the cache key; bump when the computed statistics change
+
+# Maps (path, size, mtime) to the content hash, so cache hits do not re-read the file
+DIGEST_INDEX_PATH = os.path.join(PROFILE_DIRECTORY, "digests.json")
+
+
+class ColumnStats:
+    def __init__(self, name):
+        """
+        Running statistics of one column, updated chunk by chunk.
+
+        Mean and variance are merged per chunk with Chan's parallel update, so the result
+        matches a single pass over the whole column. Cardinality is estimated with a
+        k-minimum-values sketch over 64-bit value hashes.
+        """
+        self.name = name
+        self.rows = 0
+        self.nulls = 0
+        self.kinds = set()
+        self.count = 0  # Numeric values seen
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def update(self, series):
+        self.rows += len(series)
+        values = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty:
+            return
+
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        self.kinds.add(kind)
+
+        if kind in ("integer", "floating", "mixed-integer-float", "boolean"):
+            numbers = values.to_numpy(dtype=np.float64)
+            self.update_moments(numbers)
+            # Hash the float64 values: a column read as int64 in one chunk and as float64 in another
+            # (once it holds a null) must hash 3 and 3.0 alike, or the sketch counts them twice
+            hashes = pd.util.hash_pandas_object(pd.Series(numbers), index=False).to_numpy()
+        else:
+            # Nested values (e.g. the Throughput dicts of JSON files) are hashed by their text
+            hashes = pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy()
+
+        self.hashes = np.unique(np.concatenate([self.hashes, hashes]))[:KMV_SIZE]
+
+    def update_moments(self, numbers):
+        n = len(numbers)
+        mean = float(numbers.mean())
+        m2 = float(((numbers - mean) ** 2).sum())
+        delta = mean - self.mean
+        total = self.count + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        chunk_min, chunk_max = float(numbers.min()), float(numbers.max())
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+    @property
+    def dtype(self):
+        if not self.kinds:
+            return "empty"
+        if self.kinds <= {"integer"}:
+            return "integer"
+        if self.kinds <= {"integer", "floating", "mixed-integer-float"}:
+            return "float"
+        if len(self.kinds) == 1:
+            return next(iter(self.kinds))
+        return "mixed"
+
+    @property
+    def numeric(self):
+        return self.dtype in ("integer", "float", "boolean")
+
+    def distinct(self):
+        """Return (estimate, exact); the count is exact while fewer than KMV_SIZE values were seen."""
+        if len(self.hashes) < KMV_SIZE:
+            return len(self.hashes), True
+        kth_smallest = float(self.hashes[KMV_SIZE - 1]) / 2.0 ** 64
+        return int(round((KMV_SIZE - 1) / kth_smallest)), False
+
+    def to_dict(self, sample):
+        distinct, exact = self.distinct()
+        null_ratio = self.nulls / self.rows if self.rows else 0.0
+        profile = {
+            "name": self.name,
+            "dtype": self.dtype,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "null_ratio": null_ratio,
+            "distinct": distinct,
+            "distinct_exact": exact,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean if self.count else None,
+            "std": float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None,
+            "quantiles": None,
+        }
+        if self.numeric and sample is not None:
+            sample = sample[~np.isnan(sample)]
+            if len(sample):
+                profile["quantiles"] = {
+                    str(q): float(v) for q, v in zip(QUANTILES, np.quantile(sample, QUANTILES))
+                }
+
+        # Columns that would break preprocessing or training are flagged for the selection UI
+        warnings = []
+        if distinct <= 1:
+            warnings.append("constant")
+        if null_ratio > MOSTLY_NULL_RATIO:
+            warnings.append("mostly_null")
+        if not self.numeric:
+            warnings.append("non_numeric")
+        profile["warnings"] = warnings
+        return profile
+
+
+class Reservoir:
+    def __init__(self, columns, size, seed=0):
+        """
+        Uniform sample of rows over a stream of chunks (Algorithm R, vectorized per chunk).
+
+        Values are stored as floats, non-numeric values become NaN; the sample only feeds quantiles.
+        """
+        self.columns = columns
+        self.size = size
+        self.values = np.full((size, len(columns)), np.nan)
+        self.filled = 0
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, chunk):
+        numbers = np.column_stack([
+            pd.to_numeric(chunk[column], errors="coerce").to_numpy(dtype=np.float64) for column in self.columns
+        ]) if len(chunk) else np.empty((0, len(self.columns)))
+
+        # Fill the reservoir first
+        take = min(self.size - self.filled, len(numbers))
+        self.values[self.filled:self.filled + take] = numbers[:take]
+        self.filled += take
+        self.seen += take
+        rest = numbers[take:]
+        if not len(rest):
+            return
+
+        # Row i of the stream replaces a random slot with probability size / (i + 1)
+        positions = np.arange(self.seen, self.seen + len(rest))
+        slots = self.rng.integers(0, positions + 1)
+        keep = slots < self.size
+        rows, slots = np.nonzero(keep)[0], slots[keep]
+        # Later rows win when several rows of the chunk draw the same slot
+        _, last = np.unique(slots[::-1], return_index=True)
+        last = len(slots) - 1 - last
+        self.values[slots[last]] = rest[rows[last]]
+        self.seen += len(rest)
+
+    def column(self, index):
+        return self.values[:self.filled, index]
+
+
+def dataset_digest(file_path):
+    """
+    Content hash of a dataset, remembered per (path, size, mtime) so unchanged files are hashed once.
+    """
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    index = {}
+    if os.path.exists(DIGEST_INDEX_PATH):
+        try:
+            with open(DIGEST_INDEX_PATH, "r") as f:
+                index = json.load(f)
+        except json.JSONDecodeError:
+            index = {}
+    if key not in index:
+        index[key] = file_digest(file_path)
+        write_json_atomic(DIGEST_INDEX_PATH, index)
+    return index[key]
+
+
+def profile_path(digest, sample_size):
+    return os.path.join(PROFILE_DIRECTORY, f"{digest}_{sample_size}_v{PROFILE_VERSION}.json")
+
+
+def profile_dataset(file_name, sample_size=DEFAULT_SAMPLE_SIZE, refresh=False):
+    """
+    Profile every column of an uploaded dataset in a single streaming pass.
+
+    Counts, nulls, min/max, mean and std are exact; distinct counts come from a KMV sketch and
+    quantiles from a reservoir sample of sample_size rows. Profiles are cached per file content
+    hash and sample size, so repeated requests and renamed copies return instantly.
+
+    Args:
+        file_name (str): Dataset in UPLOAD_DIRECTORY.
+        sample_size (int): Rows kept in the reservoir sample for quantiles.
+        refresh (bool): Ignore a cached profile and recompute it.
+
+    Returns:
+        dict: File level information and a list of column profiles.
+    """
+    file_path = os.path.join(UPLOAD_DIRECTORY, file_name)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Dataset {file_name} not found")
+    if sample_size < 1:
+        raise ValueError("sample_size must be positive")
+
+    digest = dataset_digest(file_path)
+    cache_path = profile_path(digest, sample_size)
+    if not refresh and os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            profile = json.load(f)
+        # The cached profile may have been computed for a copy under another name
+        profile["file_name"] = file_name
+        profile["cached"] = True
+        return profile
+
+    start_time = time.time()
+    stats, reservoir = None, None
+    # Values are profiled at full precision; nested fields are profiled as the value preprocessing uses
+    for chunk in iter_dataset(file_path, CHUNK_SIZE, downcast_numbers=False):
+        if stats is None:
+            columns = [str(column) for column in chunk.columns]
+            stats = [ColumnStats(column) for column in columns]
+            reservoir = Reservoir(list(chunk.columns), sample_size)
+        for column_stats, column in zip(stats, chunk.columns):
+            column_stats.update(chunk[column])
+        reservoir.update(chunk)
+
+    stats = stats or []
+    profile = {
+        "file_name": file_name,
+        "digest": digest,
+        "size_bytes": os.path.getsize(file_path),
+        "rows": stats[0].rows if stats else 0,
+        "sample_size": min(sample_size, reservoir.filled) if reservoir else 0,
+        "profile_seconds": time.time() - start_time,
+        "columns": [column_stats.to_dict(reservoir.column(index)) for index, column_stats in enumerate(stats)],
+    }
+    with atomic_write(cache_path) as f:
+        json.dump(profile, f)
+    logging.info(f"Profiled {file_name}: {profile['rows']} rows in {profile['profile_seconds']:.1f}s")
+
+    profile["cached"] = False
+    return profile
@@ -0,0 +1,375 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from app.config import MODEL_DIRECTORY, PROCESSED_DIRECTORY, REGISTRY_PATH
+from app.services.artifacts import (
+    TUNER_TYPES, directory_size, load_heads, load_profile, load_trial_index, split_model_name, summarize_profile
+)
+from app.services.serving_runtime import ENSEMBLE_FORMAT, serving_dir, source_mtime
+from app.services.storage import current_project_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    project TEXT,
+    tuner TEXT,
+    status TEXT NOT NULL,
+    path TEXT,
+    size_bytes INTEGER,
+    metrics TEXT,
+    training_time REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    served_at REAL,
+    PRIMARY KEY (kind, name)
+);
+CREATE INDEX IF NOT EXISTS artifacts_kind_status ON artifacts (kind, status, name);
+CREATE INDEX IF NOT EXISTS artifacts_kind_project ON artifacts (kind, project, name);
+"""
+
+COLUMNS = ["kind", "name", "project", "tuner", "status", "path", "size_bytes", "metrics",
+           "training_time", "created_at", "updated_at", "served_at"]
+
+# Serving a model records the time at most this often per model, so predictions rarely write
+SERVED_MARK_INTERVAL = 3600
+
+
+_schema_ready = False
+_served_marks = {}  # (model, project) -> last served_at written by this process
+
+# Searches run in worker processes of this server, so a model still 'training' from before
+# this time belongs to a process that has died
+PROCESS_STARTED_AT = time.time()
+
+
+def connect():
+    """
+    Open the registry database, creating the schema on first use.
+    """
+    global _schema_ready
+    connection = sqlite3.connect(REGISTRY_PATH, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    if not _schema_ready:
+        # WAL lets listing requests read while a training process writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _schema_ready = True
+    return connection
+
+
+@contextmanager
+def transaction():
+    """
+    Run statements in one write transaction. IMMEDIATE takes the write lock up front, so
+    read-modify-write updates from concurrent processes cannot interleave.
+    """
+    connection = connect()
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+
+
+@contextmanager
+def reader():
+    """Read without taking the write lock; WAL readers see the last committed state."""
+    connection = connect()
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def upsert(kind, name, **fields):
+    """
+    Insert or update a registry entry. Fields that are not given keep their stored value.
+    """
+    now = time.time()
+    if "metrics" in fields and fields["metrics"] is not None:
+        fields["metrics"] = json.dumps(fields["metrics"])
+    with transaction() as connection:
+        existing = connection.execute(
+            "SELECT * FROM artifacts WHERE kind = ? AND name = ?", (kind, name)
+        ).fetchone()
+        if existing is None:
+            row = {column: None for column in COLUMNS}
+            row.update({"kind": kind, "name": name, "status": "unknown", "created_at": now})
+        else:
+            row = dict(existing)
+        row.update(fields)
+        row["updated_at"] = now
+        connection.execute(
+            f"INSERT OR REPLACE INTO artifacts ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [row[column] for column in COLUMNS]
+        )
+
+
+def register_project(project_name, status, path=None, metrics=None):
+    """
+    Record a processed project, e.g. 'configured' after save_params or 'ready' after preprocessing.
+    """
+    path = path or os.path.join(PROCESSED_DIRECTORY, project_name)
+    fields = {"project": project_name, "status": status, "path": path, "size_bytes": directory_size(path)}
+    if metrics is not None:
+        fields["metrics"] = metrics
+    upsert("project", project_name, **fields)
+
+
+def register_model(model_name, status, project=None, tuner=None, training_time=None, metrics=None):
+    """
+    Record a model directory, e.g. 'training' when a search starts and 'ready' once it is published.
+    """
+    if project is None:
+        project, tuner = split_model_name(model_name)
+    path = os.path.join(MODEL_DIRECTORY, model_name)
+    fields = {"project": project, "tuner": tuner, "status": status, "path": path}
+    if status == "ready":
+        fields["size_bytes"] = directory_size(path)
+        fields["metrics"] = metrics if metrics is not None else model_metrics(path)
+    elif metrics is not None:
+        fields["metrics"] = metrics
+    if training_time is not None:
+        fields["training_time"] = training_time
+    upsert("model", model_name, **fields)
+
+
+def model_metrics(model_path):
+    """
+    Summarize the search of a model directory from its trial index.
+    """
+    index = load_trial_index(model_path)
+    val_losses = [trial["val_loss"] for trial in index["trials"] if trial["val_loss"] is not None]
+    metrics = {
+        "trials": len(val_losses),
+        "best_val_loss": min(val_losses) if val_losses else None,
+    }
+
+    # Multi-project models are listed under their first project and serve all of these
+    heads = load_heads(model_path)
+    if heads is not None:
+        metrics["projects"] = list(heads)
+
+    # Serving cost measured by the serving profiler, unless the model was retrained since
+    profile = load_profile(model_path)
+    if profile is not None and profile.get("source_mtime") == source_mtime(model_path):
+        metrics["serving"] = summarize_profile(profile)
+
+    # Ensembles carry their accuracy and latency comparison in the artifact manifest
+    manifest = ensemble_manifest(model_path)
+    if manifest is not None and "report" in manifest:
+        metrics["ensemble"] = summarize_ensemble(manifest["report"])
+    return metrics
+
+
+def summarize_ensemble(report):
+    """The figures of an ensemble report kept in the registry for comparing it with single models."""
+    return {
+        "k": len(report["members"]),
+        "best_model": report["best_model"],
+        "best_model_mae": report["best_model_mae"],
+        "ensemble_mae": report["ensemble_mae"],
+        "mae_gain_percent": report["mae_gain_percent"],
+        "p50_latency_ratio": report["p50_latency_ratio"],
+    }
+
+
+def ensemble_manifest(model_path):
+    """Return the manifest of an ensemble model directory, or None for other directories."""
+    manifest_path = os.path.join(serving_dir(model_path), "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except json.JSONDecodeError:
+        return None
+    return manifest if manifest.get("format") == ENSEMBLE_FORMAT else None
+
+
+def merge_metrics(kind, name, values):
+    """
+    Merge values into the metrics of an existing entry, keeping the other metrics.
+    """
+    with transaction() as connection:
+        row = connection.execute(
+            "SELECT metrics FROM artifacts WHERE kind = ? AND name = ?", (kind, name)
+        ).fetchone()
+        if row is None:
+            return
+        metrics = json.loads(row["metrics"]) if row["metrics"] else {}
+        metrics.update(values)
+        connection.execute(
+            "UPDATE artifacts SET metrics = ?, updated_at = ? WHERE kind = ? AND name = ?",
+            (json.dumps(metrics), time.time(), kind, name)
+        )
+
+
+def serves_project(entry, project_name):
+    """Whether a model entry predicts for a project, as its own model or as a head of a multi-project model."""
+    return entry["project"] == project_name or project_name in (entry["metrics"] or {}).get("projects", [])
+
+
+def mark_models_stale(project_name):
+    """
+    Mark the ready models of a project as stale, e.g. after an append replaced its scalers.
+
+    Returns:
+        list: Names of the models marked as stale.
+    """
+    with transaction() as connection:
+        rows = connection.execute("SELECT * FROM artifacts WHERE kind = 'model' AND status = 'ready'").fetchall()
+        names = [row["name"] for row in rows if serves_project(to_dict(row), project_name)]
+        connection.executemany(
+            "UPDATE artifacts SET status = 'stale', updated_at = ? WHERE kind = 'model' AND name = ?",
+            [(time.time(), name) for name in names]
+        )
+    return names
+
+
+def mark_served(model_name, project_name):
+    """
+    Record that a model served predictions for a project, so the lifecycle manager does not
+    archive projects that are only used for predictions. Written at most every SERVED_MARK_INTERVAL.
+    """
+    now = time.time()
+    if now - _served_marks.get((model_name, project_name), 0) < SERVED_MARK_INTERVAL:
+        return
+    _served_marks[(model_name, project_name)] = now
+    with transaction() as connection:
+        connection.execute(
+            "UPDATE artifacts SET served_at = ? WHERE (kind = 'model' AND name = ?) OR (kind = 'project' AND name = ?)",
+            (now, model_name, project_name)
+        )
+
+
+def remove(kind, name):
+    with transaction() as connection:
+        connection.execute("DELETE FROM artifacts WHERE kind = ? AND name = ?", (kind, name))
+
+
+def to_dict(row):
+    entry = dict(row)
+    entry["metrics"] = json.loads(entry["metrics"]) if entry["metrics"] else {}
+    return entry
+
+
+def list_entries(kind, status=None, project=None, tuner=None, offset=0, limit=None):
+    """
+    List registry entries of one kind with optional filters and pagination.
+
+    Returns:
+        tuple: (entries, total) where total is the number of entries matching the filters.
+    """
+    conditions, values = ["kind = ?"], [kind]
+    for column, value in (("status", status), ("project", project), ("tuner", tuner)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            values.append(value)
+    where = " AND ".join(conditions)
+
+    with reader() as connection:
+        total = connection.execute(f"SELECT COUNT(*) FROM artifacts WHERE {where}", values).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT * FROM artifacts WHERE {where} ORDER BY name LIMIT ? OFFSET ?",
+            values + [limit if limit is not None else -1, offset]
+        ).fetchall()
+    return [to_dict(row) for row in rows], total
+
+
+def list_names(kind, **filters):
+    entries, _ = list_entries(kind, **filters)
+    return [entry["name"] for entry in entries]
+
+
+def get_entry(kind, name):
+    with reader() as connection:
+        row = connection.execute("SELECT * FROM artifacts WHERE kind = ? AND name = ?", (kind, name)).fetchone()
+    return to_dict(row) if row else None
+
+
+def fail_stale_training(started_before=None):
+    """
+    Mark models left 'training' by a server process that stopped before finishing them as failed.
+
+    Args:
+        started_before (float): Entries last updated before this time are stale. Defaults to
+            the start of this process.
+
+    Returns:
+        list: Names of the models marked as failed.
+    """
+    started_before = started_before if started_before is not None else PROCESS_STARTED_AT
+    with transaction() as connection:
+        names = [row["name"] for row in connection.execute(
+            "SELECT name FROM artifacts WHERE kind = 'model' AND status = 'training' AND updated_at < ?",
+            (started_before,)
+        ).fetchall()]
+        connection.execute(
+            "UPDATE artifacts SET status = 'failed', updated_at = ? "
+            "WHERE kind = 'model' AND status = 'training' AND updated_at < ?",
+            (time.time(), started_before)
+        )
+    for name in names:
+        logging.warning("Model %s was still training when the server stopped; marked as failed", name)
+    return names
+
+
+def rebuild_index():
+    """
+    Index projects and models that exist on disk but not in the registry.
+
+    Run once at startup so directories created before the registry existed are listed too.
+    """
+
+    fail_stale_training()
+
+    # Drop entries whose directories were removed by hand; archived entries point to their archive.
+    # Failed models never had a directory and stay listed so the failure remains visible
+    for kind in ("project", "model"):
+        entries, _ = list_entries(kind)
+        for entry in entries:
+            if entry["status"] != "failed" and entry["path"] and not os.path.exists(entry["path"]):
+                remove(kind, entry["name"])
+
+    known_projects = set(list_names("project"))
+    for project_name in os.listdir(PROCESSED_DIRECTORY):
+        project_path = os.path.join(PROCESSED_DIRECTORY, project_name)
+        if project_name in known_projects or not os.path.isdir(project_path):
+            continue
+        data_dir = current_project_dir(project_name)
+        if os.path.exists(os.path.join(data_dir, "train_data.npz")):
+            register_project(project_name, "ready", path=project_path)
+        elif os.path.exists(os.path.join(project_path, "params.json")):
+            register_project(project_name, "configured", path=project_path)
+
+    known_models = set(list_names("model"))
+    for model_name in os.listdir(MODEL_DIRECTORY):
+        model_path = os.path.join(MODEL_DIRECTORY, model_name)
+        if model_name in known_models or not os.path.isdir(model_path):
+            continue
+        if os.path.exists(os.path.join(model_path, "best_model")):
+            # Multi-project models are named after their group and listed under their first project
+            heads = load_heads(model_path)
+            project, tuner = (next(iter(heads)), split_model_name(model_name)[1]) if heads else (None, None)
+            training_time = None
+            training_time_path = os.path.join(model_path, "training_time.json")
+            if os.path.exists(training_time_path):
+                with open(training_time_path, "r") as f:
+                    training_time = json.load(f).get("training_time")
+            register_model(model_name, "ready", project=project, tuner=tuner, training_time=training_time)
+        elif ensemble_manifest(model_path) is not None:
+            project = ensemble_manifest(model_path)["project_name"]
+            register_model(model_name, "ready", project=project, tuner="ensemble")
+        else:
+            register_model(model_name, "incomplete")
+    logging.info("Registry index synchronized with %s and %s", PROCESSED_DIRECTORY, MODEL_DIRECTORY)
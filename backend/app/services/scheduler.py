@@ -0,0 +1,228 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Request
+
+# Header identifying the calling client; requests without it are keyed by their address
+CLIENT_HEADER = "X-Client-ID"
+
+# Queue and latency samples kept per class for the percentiles of the metrics endpoint
+METRICS_WINDOW = 1000
+
+# Buckets untouched for this long are dropped, so the bucket table does not grow without bound
+BUCKET_IDLE_SECONDS = 600
+
+# Work classes, from the most to the least latency sensitive. Every class has its own concurrency
+# cap and queue, so long preprocessing or training calls can never take the worker threads that
+# interactive predictions need.
+#   concurrency: requests of the class running at the same time
+#   queue: requests waiting for a slot before new ones are rejected with 503
+#   max_wait: seconds a request may wait in the queue (None waits until a slot is free)
+#   rate, burst: per-client token bucket, requests per second and bucket size
+CLASSES = {
+    "interactive": {"concurrency": 16, "queue": 64, "max_wait": 2.0, "rate": 20.0, "burst": 40},
+    "batch": {"concurrency": 2, "queue": 16, "max_wait": 30.0, "rate": 1.0, "burst": 5},
+    "preprocess": {"concurrency": 2, "queue": 8, "max_wait": 60.0, "rate": 0.2, "burst": 3},
+    "train": {"concurrency": 1, "queue": 4, "max_wait": None, "rate": 1 / 60, "burst": 2},
+}
+
+
+def percentiles(samples):
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": ordered[-1]}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take one token. Returns 0 on success, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class WorkClass:
+    def __init__(self, name, concurrency, queue, max_wait, rate, burst):
+        """
+        Admission state of one class of requests: running slots, the FIFO of waiting requests
+        and the counters reported by the metrics endpoint.
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.max_wait = max_wait
+        self.rate = rate
+        self.burst = burst
+        self.running = 0
+        self.waiters = deque()
+        self.counters = {"admitted": 0, "rate_limited": 0, "queue_full": 0, "timed_out": 0}
+        self.queue_times = deque(maxlen=METRICS_WINDOW)
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+
+    def metrics(self):
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queued": len(self.waiters),
+            **self.counters,
+            "queue_seconds": percentiles(list(self.queue_times)),
+            "latency_seconds": percentiles(list(self.latencies)),
+        }
+
+
+class Scheduler:
+    def __init__(self, classes=CLASSES):
+        """
+        Admission control for the API process: per-client token buckets and one bounded queue
+        and concurrency cap per work class.
+
+        All state is touched from the event loop only, so no locking is needed.
+        """
+        self.classes = {name: WorkClass(name, **settings) for name, settings in classes.items()}
+        self.buckets = {}
+        self.last_prune = time.monotonic()
+
+    def check_rate(self, class_name, client_id):
+        """Raise 429 if the client has used up its token bucket for the class."""
+        work_class = self.classes[class_name]
+        key = (client_id, class_name)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(work_class.rate, work_class.burst)
+        retry_after = bucket.take()
+        self.prune_buckets()
+        if retry_after:
+            work_class.counters["rate_limited"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for {class_name} requests.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+    def prune_buckets(self):
+        now = time.monotonic()
+        if now - self.last_prune < BUCKET_IDLE_SECONDS:
+            return
+        self.last_prune = now
+        self.buckets = {key: bucket for key, bucket in self.buckets.items()
+                        if now - bucket.updated < BUCKET_IDLE_SECONDS}
+
+    async def acquire(self, class_name, bounded=True):
+        """
+        Wait for a running slot of the class and return the seconds spent queued.
+
+        Args:
+            class_name (str): Work class of the request.
+            bounded (bool): Apply the queue length and max_wait limits. Background jobs that
+                were already accepted wait without limits.
+        """
+        work_class = self.classes[class_name]
+        if work_class.running < work_class.concurrency and not work_class.waiters:
+            work_class.running += 1
+            work_class.counters["admitted"] += 1
+            work_class.queue_times.append(0.0)
+            return 0.0
+
+        if bounded and len(work_class.waiters) >= work_class.queue:
+            work_class.counters["queue_full"] += 1
+            raise HTTPException(status_code=503, detail=f"Too many {class_name} requests queued, try again later.",
+                                headers={"Retry-After": "1"})
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        work_class.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), work_class.max_wait if bounded else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on
+                self.release(class_name)
+            else:
+                waiter.cancel()
+                work_class.waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            work_class.counters["timed_out"] += 1
+            raise HTTPException(status_code=503, detail=f"Timed out waiting for a {class_name} slot.",
+                                headers={"Retry-After": "1"})
+
+        waited = time.monotonic() - start
+        work_class.counters["admitted"] += 1
+        work_class.queue_times.append(waited)
+        return waited
+
+    def release(self, class_name):
+        """Free a running slot, handing it directly to the next queued request of the class."""
+        work_class = self.classes[class_name]
+        while work_class.waiters:
+            waiter = work_class.waiters.popleft()
+            if not waiter.done():
+                # The running count stays the same, the slot changes owner
+                waiter.set_result(None)
+                return
+        work_class.running -= 1
+
+    @asynccontextmanager
+    async def slot(self, class_name, bounded=True):
+        """Hold a running slot of a class for the duration of the block."""
+        start = time.monotonic()
+        await self.acquire(class_name, bounded=bounded)
+        try:
+            yield
+        finally:
+            self.release(class_name)
+            self.classes[class_name].latencies.append(time.monotonic() - start)
+
+    def metrics(self):
+        return {
+            "classes": {name: work_class.metrics() for name, work_class in self.classes.items()},
+            "clients": len({client for client, _ in self.buckets}),
+        }
+
+
+scheduler = Scheduler()
+
+
+def client_id(request: Request):
+    return request.headers.get(CLIENT_HEADER) or (request.client.host if request.client else "unknown")
+
+
+def admit(class_name):
+    """
+    Dependency that rate limits a request and holds a slot of its class while the endpoint runs.
+
+    Usage: @router.post("/predict/", dependencies=[Depends(admit("interactive"))])
+    """
+    async def dependency(request: Request):
+        scheduler.check_rate(class_name, client_id(request))
+        async with scheduler.slot(class_name):
+            yield
+    return dependency
+
+
+def rate_limit(class_name):
+    """
+    Dependency that only applies the client's token bucket, for endpoints that queue their work
+    as a background job holding the slot (e.g. batch scoring).
+    """
+    async def dependency(request: Request):
+        scheduler.check_rate(class_name, client_id(request))
+    return dependency
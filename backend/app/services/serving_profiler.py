@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import subprocess
+import numpy as np
+from app.config import MODEL_DIRECTORY
+from app.services.artifacts import PROFILE_FILENAME, summarize_profile
+from app.services.registry import merge_metrics
+from app.services.storage import current_project_dir, project_lock_name, read_lock, write_json_atomic
+from app.services.serving_runtime import source_mtime
+
+BATCH_SIZES = [1, 32, 256, 4096]
+SINGLE_ROW_REQUESTS = 200  # Timed single-row predictions for the latency percentiles
+WARMUP_REQUESTS = 10  # Untimed predictions before measuring, e.g. for tf.function tracing
+MIN_BATCH_SECONDS = 0.5  # Each batch size is repeated for at least this long
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # No procfs (e.g. macOS): fall back to the peak, which only ever grows
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def load_raw_test_data(project_name):
+    """
+    Return the project's test set in the original (unscaled) units, the inputs predictors take.
+    """
+    with read_lock(project_lock_name(project_name)):
+        data_dir = current_project_dir(project_name)
+        with np.load(os.path.join(data_dir, "test_data.npz")) as test_data:
+            X_test, y_test = test_data["X_test"], test_data["y_test"]
+        with open(os.path.join(data_dir, "scaler_X.pkl"), "rb") as f:
+            scaler_X = pickle.load(f)
+        with open(os.path.join(data_dir, "scaler_y.pkl"), "rb") as f:
+            scaler_y = pickle.load(f)
+    return scaler_X.inverse_transform(X_test), scaler_y.inverse_transform(y_test)
+
+
+def latency_percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        "mean": float(ms.mean()),
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+    }
+
+
+def measure(model_name, project_name, batch_sizes=BATCH_SIZES, single_row_requests=SINGLE_ROW_REQUESTS):
+    """
+    Measure the serving cost of a model in the current process.
+
+    Run this in a fresh process (see profile_model): load time and memory are only meaningful
+    when nothing has been loaded before.
+    """
+    # Libraries every runtime needs are loaded first, so they do not count towards the model
+    import sklearn  # noqa: F401
+    from app.services.predict_service import KerasPredictor, load_serving_components
+
+    X_test, y_test = load_raw_test_data(project_name)
+    if len(X_test) == 0:
+        raise ValueError(f"Project {project_name} has no test rows to profile with")
+    baseline_rss = current_rss_mb()
+
+    start = time.perf_counter()
+    predictor, _, _ = load_serving_components(model_name, project_name)
+    load_seconds = time.perf_counter() - start
+    loaded_rss = current_rss_mb()
+    runtime = "keras" if isinstance(predictor, KerasPredictor) else predictor.manifest.get("format")
+
+    def predict(X, batch_size):
+        if isinstance(predictor, KerasPredictor):
+            return predictor.predict(X, batch_size=batch_size)
+        return predictor.predict(X)
+
+    # Single-row latency, as seen by an interactive /predict call
+    for i in range(WARMUP_REQUESTS):
+        predict(X_test[i % len(X_test)][None, :], 1)
+    single = []
+    for i in range(single_row_requests):
+        row = X_test[i % len(X_test)][None, :]
+        start = time.perf_counter()
+        predict(row, 1)
+        single.append(time.perf_counter() - start)
+
+    # Batch throughput, rows are repeated from the test set to fill large batches
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = X_test[np.arange(batch_size) % len(X_test)]
+        predict(batch, batch_size)
+        calls, start = 0, time.perf_counter()
+        while calls == 0 or time.perf_counter() - start < MIN_BATCH_SECONDS:
+            predict(batch, batch_size)
+            calls += 1
+        elapsed = time.perf_counter() - start
+        throughput[str(batch_size)] = {
+            "rows_per_second": calls * batch_size / elapsed,
+            "batch_ms": elapsed / calls * 1000,
+        }
+
+    # Accuracy on the same footing as the timings: raw-scale MAE on the project's test set
+    predictions = predict(X_test, max(batch_sizes))
+    test_mae = float(np.mean(np.abs(np.asarray(predictions) - y_test)))
+
+    return {
+        "model_name": model_name,
+        "project_name": project_name,
+        "runtime": runtime,
+        "load_seconds": load_seconds,
+        "model_rss_mb": loaded_rss - baseline_rss,
+        "peak_rss_mb": current_rss_mb(),
+        "single_row_ms": latency_percentiles(single),
+        "throughput": throughput,
+        "test_mae": test_mae,
+        "test_rows": int(len(X_test)),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def profile_model(model_name, project_name, batch_sizes=BATCH_SIZES, timeout=900):
+    """
+    Profile a model in a fresh subprocess and store the result with the model's metadata.
+
+    The profile is written to serving_profile.json in the model directory and its summary is
+    merged into the model's registry metrics.
+
+    Args:
+        model_name (str): Model directory under MODEL_DIRECTORY.
+        project_name (str): Project providing the scalers and the test set.
+        batch_sizes (list): Batch sizes to measure throughput at.
+        timeout (float): Seconds before the profiling process is stopped.
+
+    Returns:
+        dict: The serving profile.
+    """
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    if not os.path.isdir(model_dir):
+        raise FileNotFoundError(f"Model {model_name} not found")
+
+    command = [sys.executable, "-m", "app.services.serving_profiler", model_name, project_name,
+               "--batch-sizes", *map(str, batch_sizes)]
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout, cwd=os.getcwd())
+    if result.returncode != 0:
+        raise RuntimeError(f"Profiling failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    profile["profiled_at"] = time.time()
+    profile["source_mtime"] = source_mtime(model_dir)
+    write_json_atomic(os.path.join(model_dir, PROFILE_FILENAME), profile)
+    merge_metrics("model", model_name, {"serving": summarize_profile(profile)})
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the serving cost of a trained model on this CPU.")
+    parser.add_argument("model_name")
+    parser.add_argument("project_name")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    args = parser.parse_args()
+
+    # Only the JSON result goes to stdout
+    print(json.dumps(measure(args.model_name, args.project_name, batch_sizes=args.batch_sizes)))
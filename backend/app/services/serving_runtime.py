@@ -0,0 +1,222 @@
+import os
+import json
+import threading
+import numpy as np
+from app.services.storage import file_digest
+
+# Serving artifacts live next to best_model inside the model directory
+SERVING_DIRNAME = "serving"
+SERVING_FORMAT = "numpy-mlp"
+# k networks stacked into one set of (k, fan_in, fan_out) weights, see ensemble.py
+ENSEMBLE_FORMAT = "numpy-mlp-ensemble"
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0, out=x),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+# (path, size, mtime) -> digest of the scaler files, so predictions do not re-hash unchanged files
+_digest_cache = {}
+
+
+class ServingModel:
+    def __init__(self, layers, activations, y_scale, y_offset, manifest):
+        """
+        TensorFlow-free runtime for an exported model.
+
+        The exported network is a chain of dense layers with the input scaler and any
+        normalization layers already folded into the weights, so a prediction is a few
+        matrix multiplications on raw (unscaled) inputs.
+
+        Args:
+            layers (list): (W, b) float32 arrays per dense layer.
+            activations (list): Activation name per dense layer.
+            y_scale (numpy array): Scale of the output scaler (y_scaled = y * y_scale + y_offset).
+            y_offset (numpy array): Offset of the output scaler.
+            manifest (dict): The artifact manifest.
+        """
+        self.layers = layers
+        self.activations = [ACTIVATIONS[name] for name in activations]
+        self.y_scale = y_scale
+        self.y_offset = y_offset
+        self.manifest = manifest
+
+    def predict_scaled(self, X):
+        """
+        Run the network on raw inputs and return predictions in the scaled output space.
+        """
+        h = np.asarray(X, dtype=np.float32)
+        for (W, b), activation in zip(self.layers, self.activations):
+            h = activation(h @ W + b)
+        return h
+
+    def predict(self, X):
+        """
+        Run the network on raw inputs and return predictions in the original output scale.
+        """
+        return (self.predict_scaled(X) - self.y_offset) / self.y_scale
+
+
+class EnsembleServingModel:
+    def __init__(self, layers, activations, y_scale, y_offset, manifest):
+        """
+        TensorFlow-free runtime for an ensemble of exported networks evaluated in one pass.
+
+        The member networks are stacked layer by layer into (k, fan_in, fan_out) weights,
+        zero-padded to the widest member. The first layer of every member reads the same
+        inputs, so it runs as a single wide matmul; the deeper layers run as one batched
+        matmul over the k members. The member outputs are averaged in the scaled space.
+
+        Args:
+            layers (list): (W, b) float32 arrays per stacked layer, shaped (k, fan_in, fan_out) and (k, fan_out).
+            activations (list): Per stacked layer, the activation name of every member.
+            y_scale (numpy array): Scale of the output scaler (y_scaled = y * y_scale + y_offset).
+            y_offset (numpy array): Offset of the output scaler.
+            manifest (dict): The artifact manifest.
+        """
+        self.layers = layers
+        self.activations = [self.group_activations(names) for names in activations]
+        self.y_scale = y_scale
+        self.y_offset = y_offset
+        self.manifest = manifest
+        # First layers side by side: (n_inputs, k * width)
+        W, _ = layers[0]
+        self.first_kernel = np.ascontiguousarray(W.transpose(1, 0, 2).reshape(W.shape[1], -1))
+
+    @staticmethod
+    def group_activations(names):
+        """Group the members of a layer by activation; None selects all members."""
+        if len(set(names)) == 1:
+            return [(ACTIVATIONS[names[0]], None)] if names[0] != "linear" else []
+        groups = {}
+        for index, name in enumerate(names):
+            groups.setdefault(name, []).append(index)
+        return [(ACTIVATIONS[name], np.asarray(members)) for name, members in groups.items() if name != "linear"]
+
+    def predict_scaled(self, X):
+        """
+        Run all members on raw inputs and return their mean prediction in the scaled output space.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        W, b = self.layers[0]
+        k, _, width = W.shape
+        h = np.ascontiguousarray((X @ self.first_kernel).reshape(len(X), k, width).transpose(1, 0, 2))
+        h += b[:, None, :]
+        for i, (W, b) in enumerate(self.layers):
+            if i:
+                h = np.matmul(h, W)
+                h += b[:, None, :]
+            for activation, members in self.activations[i]:
+                if members is None:
+                    h = activation(h)
+                else:
+                    h[members] = activation(h[members])
+        return h.mean(axis=0)
+
+    def predict(self, X):
+        """
+        Run the ensemble on raw inputs and return predictions in the original output scale.
+        """
+        return (self.predict_scaled(X) - self.y_offset) / self.y_scale
+
+
+def serving_dir(model_dir, head=None):
+    """Artifact directory of a model; multi-project models get one artifact per project head."""
+    return os.path.join(model_dir, SERVING_DIRNAME if head is None else f"{SERVING_DIRNAME}_{head}")
+
+
+def source_mtime(model_dir):
+    """Modification time of the SavedModel an artifact was exported from."""
+    saved_model = os.path.join(model_dir, "best_model", "saved_model.pb")
+    return os.path.getmtime(saved_model) if os.path.exists(saved_model) else None
+
+
+def scaler_digest(data_dir):
+    """
+    Digest of a project version's scalers. Artifacts fold the input and output scalers into their
+    weights, so an artifact only matches the project data its scalers came from.
+    """
+    digests = []
+    for name in ("scaler_X.pkl", "scaler_y.pkl"):
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in _digest_cache:
+            _digest_cache[key] = file_digest(path)
+        digests.append(_digest_cache[key])
+    return ":".join(digests)
+
+
+def matches_project(manifest, project_name, data_dir):
+    """Check that an artifact was exported for this project and its current scalers."""
+    return manifest.get("project_name") == project_name and manifest.get("scaler_digest") == scaler_digest(data_dir)
+
+
+def has_serving_artifact(model_dir, head=None):
+    """
+    Check whether an up-to-date serving artifact exists for a model directory.
+
+    An artifact exported before the model was retrained is stale and ignored.
+    """
+    manifest_path = os.path.join(serving_dir(model_dir, head), "manifest.json")
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    current = source_mtime(model_dir)
+    return current is None or manifest.get("source_mtime") == current
+
+
+def dequantize(arrays, name, quantization):
+    if quantization == "int8":
+        return arrays[f"{name}_q"].astype(np.float32) * arrays[f"{name}_scale"]
+    return arrays[name].astype(np.float32)
+
+
+def load_serving_model(model_dir, head=None):
+    """
+    Load the serving artifact of a model directory.
+    """
+    return load_serving_artifact(serving_dir(model_dir, head))
+
+
+def load_serving_artifact(artifact_dir):
+    """
+    Load a serving artifact directory.
+
+    Loaded models are cached per artifact and reloaded when the artifact changes on disk.
+    """
+    manifest_path = os.path.join(artifact_dir, "manifest.json")
+    weights_path = os.path.join(artifact_dir, "model.npz")
+    key = os.path.abspath(artifact_dir)
+    version = (os.path.getmtime(manifest_path), os.path.getmtime(weights_path))
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    model_class = {SERVING_FORMAT: ServingModel, ENSEMBLE_FORMAT: EnsembleServingModel}.get(manifest.get("format"))
+    if model_class is None:
+        raise ValueError(f"Unsupported serving artifact format: {manifest.get('format')}")
+
+    quantization = manifest.get("quantization")
+    with np.load(weights_path) as arrays:
+        layers = [
+            (dequantize(arrays, f"W{i}", quantization), arrays[f"b{i}"].astype(np.float32))
+            for i in range(len(manifest["activations"]))
+        ]
+        y_scale = arrays["y_scale"].astype(np.float32)
+        y_offset = arrays["y_offset"].astype(np.float32)
+
+    model = model_class(layers, manifest["activations"], y_scale, y_offset, manifest)
+    with _cache_lock:
+        _cache[key] = (version, model)
+    return model
@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import time
+import hashlib
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager
+from app.config import LOCK_DIRECTORY, MODEL_DIRECTORY, PROCESSED_DIRECTORY, STAGING_DIRECTORY
+
+try:
+    import fcntl
+except ImportError:  # Windows has no shared locks, fall back to exclusive ones
+    fcntl = None
+    import msvcrt
+
+# Processed data is written into immutable versions/<n> directories; CURRENT names the live one
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILENAME = "CURRENT"
+
+# Number of processed data versions kept per project
+KEEP_VERSIONS = 3
+
+
+class StorageLock:
+    def __init__(self, name, exclusive=False):
+        """
+        Cross-process read/write lock backed by a lock file in LOCK_DIRECTORY.
+
+        Any number of readers may hold the lock together; a writer holds it alone.
+
+        Args:
+            name (str): Name of the locked resource, e.g. 'project-CFP_4800'.
+            exclusive (bool): Take the lock for writing instead of reading.
+        """
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+        self.path = os.path.join(LOCK_DIRECTORY, f"{safe_name}.lock")
+        self.exclusive = exclusive
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a+")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+
+def read_lock(name):
+    return StorageLock(name, exclusive=False)
+
+
+def write_lock(name):
+    return StorageLock(name, exclusive=True)
+
+
+def project_lock_name(project_name):
+    return f"project-{project_name}"
+
+
+def model_lock_name(model_name):
+    return f"model-{model_name}"
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Open a temporary file next to `path` and rename it over `path` once it is complete.
+
+    Readers either see the previous file or the new one, never a partially written file.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path, data):
+    with atomic_write(path, "w") as f:
+        json.dump(data, f)
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, used to identify datasets independent of their name."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def current_project_dir(project_name):
+    """
+    Return the directory holding the live processed data of a project.
+
+    Projects preprocessed before versioning was introduced keep their files directly in
+    the project directory, which is returned unchanged.
+    """
+    project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+    current_path = os.path.join(project_dir, CURRENT_FILENAME)
+    if not os.path.exists(current_path):
+        return project_dir
+    with open(current_path, "r") as f:
+        version = f.read().strip()
+    return os.path.join(project_dir, VERSIONS_DIRNAME, version)
+
+
+def list_project_versions(project_name):
+    versions_dir = os.path.join(PROCESSED_DIRECTORY, project_name, VERSIONS_DIRNAME)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(d for d in os.listdir(versions_dir) if d.isdigit())
+
+
+@contextmanager
+def new_project_version(project_name):
+    """
+    Stage a new version of a project's processed data and publish it on success.
+
+    The caller writes all files into the yielded directory without holding any lock.
+    Publishing only swaps the CURRENT pointer under the project's write lock, so readers
+    keep a consistent snapshot of the previous version until they reload.
+    """
+    project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+    versions_dir = os.path.join(project_dir, VERSIONS_DIRNAME)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    staging_dir = tempfile.mkdtemp(dir=versions_dir, prefix=".staging-")
+    try:
+        yield staging_dir
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    with write_lock(project_lock_name(project_name)):
+        existing = list_project_versions(project_name)
+        version = f"{int(existing[-1]) + 1 if existing else 1:06d}"
+        os.replace(staging_dir, os.path.join(versions_dir, version))
+        with atomic_write(os.path.join(project_dir, CURRENT_FILENAME), "w") as f:
+            f.write(version)
+
+        # Old versions are only removed while no reader holds the project lock
+        for old_version in list_project_versions(project_name)[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(versions_dir, old_version), ignore_errors=True)
+
+    logging.info("Published version %s of project %s", version, project_name)
+
+
+def model_staging_directory():
+    """
+    Directory passed to AutoKeras while a model is being trained.
+
+    Every training run gets its own directory, so concurrent runs never share files.
+    """
+    return tempfile.mkdtemp(dir=STAGING_DIRECTORY, prefix=f"{int(time.time())}-")
+
+
+def publish_model_dir(staged_path, model_name):
+    """
+    Move a fully trained model directory into MODEL_DIRECTORY, replacing any previous one.
+
+    The swap happens under the model's write lock, so a reader holding the read lock
+    never sees a missing or half-replaced best_model.
+    """
+    final_path = os.path.join(MODEL_DIRECTORY, model_name)
+    with write_lock(model_lock_name(model_name)):
+        if os.path.exists(final_path):
+            trash_path = os.path.join(STAGING_DIRECTORY, f"replaced-{model_name}-{time.time_ns()}")
+            os.replace(final_path, trash_path)
+            os.replace(staged_path, final_path)
+        else:
+            trash_path = None
+            os.replace(staged_path, final_path)
+
+    if trash_path:
+        shutil.rmtree(trash_path, ignore_errors=True)
+    return final_path
@@ -21,4 +21,4 @@ async def handle_upload(file: UploadFile):
 
         return {"message": f"File {file.filename} uploaded successfully."}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,118 @@
+"""
+Compare the ingestion engine with the plain pandas readers on parse throughput and peak memory.
+
+Every reader runs in its own subprocess, so the peak RSS of one run does not hide the next.
+
+    python benchmark_ingestion.py app/datas/uploads/scenario.json --columns Bandwidth Throughput
+    python benchmark_ingestion.py --generate 500000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def read_pandas(file_path, columns):
+    """The readers DataPreprocessor used before the ingestion engine, including the Throughput parsing."""
+    import ast
+    import pandas as pd
+    data = pd.read_csv(file_path) if file_path.endswith(".csv") else pd.read_json(file_path)
+    data = data[columns] if columns else data
+    if "Throughput" in data.columns:
+        data = data.assign(Throughput=data["Throughput"].map(lambda value: ast.literal_eval(value)["Sink"]))
+    return data
+
+
+def read_engine(file_path, columns):
+    from app.services.ingestion import read_dataset
+    return read_dataset(file_path, columns=columns or None)
+
+
+READERS = {"pandas": read_pandas, "engine": read_engine}
+
+
+def run_child(reader, file_path, columns):
+    # Import the libraries before measuring, both readers pay the same import cost
+    import pandas  # noqa: F401
+    import pyarrow  # noqa: F401
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    data = READERS[reader](file_path, columns)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "reader": reader,
+        "rows": int(len(data)),
+        "seconds": seconds,
+        "mb_per_s": os.path.getsize(file_path) / 1024 ** 2 / seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_above_baseline_mb": peak_rss_mb() - baseline,
+        "frame_mb": float(data.memory_usage(deep=True).sum()) / 1024 ** 2,
+    }))
+
+
+def generate(file_path, rows):
+    """Write a column-oriented scenario export like the ones produced by the simulation."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    ids = [f"ID_{i}" for i in range(rows)]
+    data = pd.DataFrame({
+        "Bandwidth": rng.uniform(10, 1000, rows),
+        "Latency": rng.uniform(0.1, 50, rows),
+        "Buffer": rng.integers(1, 512, rows),
+        "Nodes": rng.integers(2, 64, rows),
+        "Throughput": [str({"Sink": float(v), "Source": float(v) * 1.1}) for v in rng.uniform(0, 100, rows)],
+    }, index=ids)
+    data.to_json(file_path)
+    return ["Bandwidth", "Latency", "Buffer", "Nodes", "Throughput"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("file", nargs="?", help="CSV or JSON dataset to read")
+    parser.add_argument("--columns", nargs="*", default=[], help="Columns to read (default: all)")
+    parser.add_argument("--generate", type=int, metavar="ROWS", help="Benchmark a generated scenario file")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per reader; the fastest is reported")
+    parser.add_argument("--child", choices=sorted(READERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file, args.columns)
+        return
+
+    file_path, columns = args.file, args.columns
+    if args.generate:
+        os.makedirs(os.path.join("app", "datas", "uploads"), exist_ok=True)
+        file_path = os.path.join("app", "datas", "uploads", f"benchmark_{args.generate}.json")
+        columns = columns or generate(file_path, args.generate)
+    if not file_path:
+        parser.error("a dataset file or --generate is required")
+
+    size_mb = os.path.getsize(file_path) / 1024 ** 2
+    print(f"{file_path}: {size_mb:.1f} MB, columns: {', '.join(columns) if columns else 'all'}")
+    print(f"{'reader':<8} {'rows':>10} {'seconds':>9} {'MB/s':>8} {'peak MB':>9} {'frame MB':>9}")
+    for reader in READERS:
+        results = []
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, __file__, file_path, "--child", reader, "--columns", *columns],
+                capture_output=True, text=True, check=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(results, key=lambda result: result["seconds"])
+        print(f"{reader:<8} {best['rows']:>10} {best['seconds']:>9.2f} {best['mb_per_s']:>8.1f} "
+              f"{best['peak_above_baseline_mb']:>9.1f} {best['frame_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Load generator for the admission control of the API: measures interactive prediction latency
+alone and under mixed load, and fails if the p95 latency under load misses the SLO.
+
+Start the API (python main.py), then for example:
+
+    python loadgen.py --project CFP_4800 --model CFP_4800_random --file scenario.json
+
+The heavy clients profile the file, batch score it and preprocess it into a scratch project
+(--preprocess-project), so the served project itself is never rewritten.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))] if ordered else float("nan")
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+
+    def add(self, status, seconds):
+        with self.lock:
+            self.statuses[status] += 1
+            if status == 200:
+                self.latencies.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+        return {
+            "ok": len(ordered),
+            "statuses": dict(self.statuses),
+            "p50_ms": percentile(ordered, 0.5) * 1000,
+            "p95_ms": percentile(ordered, 0.95) * 1000,
+            "p99_ms": percentile(ordered, 0.99) * 1000,
+        }
+
+
+def send(recorder, method, url, client_id, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = requests.request(method, url, headers={"X-Client-ID": client_id}, timeout=120, **kwargs)
+        status = response.status_code
+    except requests.RequestException:
+        status = "error"
+    recorder.add(status, time.perf_counter() - start)
+
+
+def interactive_client(args, index, stop, recorder, input_params):
+    """Send predictions at a steady rate, like a user of the Predict page."""
+    url = f"{args.url}/predict/predict/"
+    interval = 1.0 / args.interactive_rate
+    while not stop.is_set():
+        body = {
+            "model_name": args.model,
+            "project_name": args.project,
+            "input_data": {param: random.uniform(0, 1) for param in input_params},
+        }
+        send(recorder, "POST", url, f"interactive-{index}", json=body)
+        stop.wait(interval * random.uniform(0.5, 1.5))
+
+
+def heavy_client(args, index, stop, recorder, params):
+    """Keep profiling (full pass over the file), batch scoring and preprocessing requests in flight."""
+    while not stop.is_set():
+        if index % 3 == 0:
+            send(recorder, "GET", f"{args.url}/upload/profile/", f"heavy-{index}",
+                 params={"file_name": args.file, "refresh": "true"})
+        elif index % 3 == 1:
+            send(recorder, "POST", f"{args.url}/predict/batch/", f"heavy-{index}",
+                 json={"file_name": args.file, "project_name": args.project, "model_name": args.model})
+        else:
+            send(recorder, "POST", f"{args.url}/upload/preprocess/", f"heavy-{index}",
+                 json={"project_name": args.preprocess_project, "file_name": args.file,
+                       "input_params": params["input_params"], "output_params": params["output_params"],
+                       "scaler_type": "StandardScaler"})
+        stop.wait(0.1)
+
+
+def run_phase(args, heavy_clients, params):
+    stop = threading.Event()
+    interactive, heavy = Recorder(), Recorder()
+    with ThreadPoolExecutor(max_workers=args.interactive_clients + heavy_clients) as executor:
+        for index in range(args.interactive_clients):
+            executor.submit(interactive_client, args, index, stop, interactive, params["input_params"])
+        for index in range(heavy_clients):
+            executor.submit(heavy_client, args, index, stop, heavy, params)
+        time.sleep(args.duration)
+        stop.set()
+    return interactive.summary(), heavy.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--project", required=True, help="Processed project used for predictions")
+    parser.add_argument("--model", required=True, help="Model used for predictions and batch scoring")
+    parser.add_argument("--file", required=True, help="Uploaded dataset used for the heavy requests")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per phase")
+    parser.add_argument("--interactive-clients", type=int, default=8)
+    parser.add_argument("--interactive-rate", type=float, default=5, help="Predictions per second per client")
+    parser.add_argument("--heavy-clients", type=int, default=6)
+    parser.add_argument("--slo-ms", type=float, default=250, help="p95 latency target of interactive predictions")
+    parser.add_argument("--preprocess-project", default=None,
+                        help="Scratch project the heavy clients preprocess into (default: <project>_loadgen)")
+    args = parser.parse_args()
+    args.preprocess_project = args.preprocess_project or f"{args.project}_loadgen"
+
+    params = requests.get(f"{args.url}/predict/params/{args.project}", timeout=30).json()
+    # The scratch project needs its parameters saved before it can be preprocessed
+    requests.post(f"{args.url}/upload/save_params/", timeout=30, json={
+        "project_name": args.preprocess_project, "file_name": args.file, "input_params": params["input_params"],
+        "output_params": params["output_params"], "scaler_type": "StandardScaler"
+    }).raise_for_status()
+
+    print(f"Baseline: {args.interactive_clients} interactive clients for {args.duration:.0f}s")
+    baseline, _ = run_phase(args, 0, params)
+    print(f"  interactive {json.dumps(baseline)}")
+
+    print(f"Mixed: {args.interactive_clients} interactive and {args.heavy_clients} heavy clients")
+    mixed, heavy = run_phase(args, args.heavy_clients, params)
+    print(f"  interactive {json.dumps(mixed)}")
+    print(f"  heavy       {json.dumps(heavy)}")
+
+    metrics = requests.get(f"{args.url}/scheduler/metrics", timeout=30).json()
+    for name, work_class in metrics["classes"].items():
+        print(f"  {name:<12} admitted={work_class['admitted']} rate_limited={work_class['rate_limited']} "
+              f"queue_full={work_class['queue_full']} timed_out={work_class['timed_out']} "
+              f"queue p95={work_class['queue_seconds']['p95']}")
+
+    if not mixed["ok"] or mixed["p95_ms"] > args.slo_ms:
+        print(f"FAIL: interactive p95 {mixed['p95_ms']:.0f} ms exceeds the {args.slo_ms:.0f} ms SLO under load")
+        sys.exit(1)
+    print(f"PASS: interactive p95 {mixed['p95_ms']:.0f} ms within the {args.slo_ms:.0f} ms SLO under load")
+
+
+if __name__ == "__main__":
+    main()
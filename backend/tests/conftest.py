@@ -0,0 +1,28 @@
+import os
+import sys
+import shutil
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# app.config resolves its directories relative to the working directory, so the tests run in
+# a scratch tree created before any app module is imported
+os.chdir(tempfile.mkdtemp(prefix="automl-tests-"))
+
+
+@pytest.fixture(autouse=True)
+def data_tree():
+    """Give every test an empty data, model and registry tree."""
+    from app import config
+    from app.services import registry
+
+    yield os.getcwd()
+    shutil.rmtree("./app", ignore_errors=True)
+    for directory in (config.UPLOAD_DIRECTORY, config.MODEL_DIRECTORY, config.PROCESSED_DIRECTORY,
+                      config.LOCK_DIRECTORY, config.STAGING_DIRECTORY, config.PROFILE_DIRECTORY,
+                      config.BATCH_DIRECTORY, config.ARCHIVE_DIRECTORY):
+        os.makedirs(directory, exist_ok=True)
+    registry._schema_ready = False
+    registry._served_marks.clear()
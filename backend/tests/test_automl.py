@@ -0,0 +1,30 @@
+import os
+import json
+import pytest
+from pydantic import ValidationError
+from app.config import MODEL_DIRECTORY
+from app.schemas.train import MultiTrainRequest
+
+automl = pytest.importorskip("app.services.automl", exc_type=ImportError)
+
+
+def test_group_name_is_validated():
+    for name in ("../outside", "a/b", ".hidden", ""):
+        with pytest.raises(ValueError):
+            automl.check_group_name(name, ["alpha", "beta"], ["random"])
+        with pytest.raises(ValidationError):
+            MultiTrainRequest(group_name=name, project_names=["alpha", "beta"])
+    automl.check_group_name("group", ["alpha", "beta"], ["random"])
+
+    # Single-project models and groups of other projects must not be replaced
+    os.makedirs(os.path.join(MODEL_DIRECTORY, "alpha_random", "best_model"))
+    with pytest.raises(ValueError):
+        automl.check_group_name("alpha", ["alpha", "beta"], ["random"])
+    group_dir = os.path.join(MODEL_DIRECTORY, "group_bayesian")
+    os.makedirs(group_dir)
+    with open(os.path.join(group_dir, "heads.json"), "w") as f:
+        json.dump({"projects": {"alpha": [0, 1], "beta": [1, 2]}}, f)
+    with pytest.raises(ValueError):
+        automl.check_group_name("group", ["alpha", "gamma"], ["random", "bayesian"])
+    # Retraining the same group replaces its model
+    automl.check_group_name("group", ["alpha", "beta"], ["random", "bayesian"])
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import UPLOAD_DIRECTORY
+from app.services import batch_scoring
+
+
+class SumPredictor:
+    """Predicts the sum of the inputs; fails once `fail_after` calls were made."""
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def predict(self, X):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("worker killed")
+        return np.asarray(X, dtype=np.float64).sum(axis=1, keepdims=True)
+
+
+def use_predictor(monkeypatch, predictor):
+    monkeypatch.setattr(batch_scoring, "load_serving_components",
+                        lambda model_name, project_name: (predictor, ["a", "b"], ["total"]))
+
+
+def write_input(name, offset, rows=50):
+    path = os.path.join(UPLOAD_DIRECTORY, name)
+    pd.DataFrame({"a": np.arange(rows) + offset, "b": np.ones(rows)}).to_csv(path, index=False)
+    return path
+
+
+def scorer(file_name="data.csv", project_name="alpha"):
+    return batch_scoring.BatchScorer(file_name, project_name, "group_random", chunk_size=10, max_workers=1)
+
+
+def test_interrupted_job_resumes_from_written_parts(monkeypatch):
+    write_input("data.csv", 0)
+    # One warm-up call and two chunks succeed, then the run dies
+    use_predictor(monkeypatch, SumPredictor(fail_after=3))
+    job = scorer()
+    with pytest.raises(RuntimeError):
+        job.run()
+    parts_before = len(os.listdir(job.job_dir))
+    assert 0 < parts_before < 5
+    assert batch_scoring.get_batch_progress(job.job_id)["status"] == "failed"
+
+    predictor = SumPredictor()
+    use_predictor(monkeypatch, predictor)
+    progress = scorer().run()
+    assert progress["status"] == "completed"
+    # Only the missing chunks are scored again, after the warm-up call
+    assert predictor.calls == 1 + 5 - parts_before
+    output = pd.read_csv(progress["output_path"])
+    np.testing.assert_allclose(output["total"], np.arange(50) + 1)
+
+
+def test_changed_upload_and_other_project_start_new_jobs(monkeypatch):
+    use_predictor(monkeypatch, SumPredictor())
+    path = write_input("data.csv", 0)
+    first = scorer().run()
+
+    # Scoring the same file for another head of the model is another job
+    assert scorer(project_name="beta").job_id != first["job_id"]
+
+    # Uploads overwrite files of the same name
+    write_input("data.csv", 100)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = scorer().run()
+    assert second["job_id"] != first["job_id"]
+    np.testing.assert_allclose(pd.read_csv(second["output_path"])["total"], np.arange(50) + 101)
+    np.testing.assert_allclose(pd.read_csv(first["output_path"])["total"], np.arange(50) + 1)
@@ -0,0 +1,74 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from app.config import PROCESSED_DIRECTORY, UPLOAD_DIRECTORY
+from app.services import registry
+from app.services.data_preprocessor import DataPreprocessor
+
+INPUTS = ["x1", "x2"]
+
+
+def write_upload(name, rng, rows, shift=0.0):
+    frame = pd.DataFrame({
+        "x1": rng.normal(shift, 1.0, rows), "x2": rng.uniform(0, 10, rows),
+        "y1": rng.normal(5.0, 2.0, rows), "y2": rng.normal(-3.0, 0.5, rows),
+    })
+    frame.to_csv(os.path.join(UPLOAD_DIRECTORY, name), index=False)
+    return frame
+
+
+def preprocess(project_name, outputs, file_name, scaler_type="StandardScaler"):
+    os.makedirs(os.path.join(PROCESSED_DIRECTORY, project_name), exist_ok=True)
+    with open(os.path.join(PROCESSED_DIRECTORY, project_name, "params.json"), "w") as f:
+        json.dump({"input_params": INPUTS, "output_params": outputs, "file_name": file_name}, f)
+    DataPreprocessor(project_name, scaler_type, INPUTS, outputs, file_name).preprocess()
+
+
+def raw_rows(preprocessor, split):
+    X_train, X_test, y_train, y_test, scaler_X, scaler_y, _ = preprocessor.load_current_version()
+    X, y = (X_train, y_train) if split == "train" else (X_test, y_test)
+    return np.hstack([scaler_X.inverse_transform(X), scaler_y.inverse_transform(y)])
+
+
+def sort_rows(rows):
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def test_append_matches_full_preprocess_of_merged_file():
+    rng = np.random.default_rng(0)
+    base = write_upload("base.csv", rng, 400)
+    extra = write_upload("extra.csv", rng, 100, shift=1.5)
+    pd.concat([base, extra]).to_csv(os.path.join(UPLOAD_DIRECTORY, "merged.csv"), index=False)
+    for project_name, outputs in (("alpha", ["y1"]), ("beta", ["y2"]), ("merged", ["y1"])):
+        preprocess(project_name, outputs, "merged.csv" if project_name == "merged" else "base.csv")
+    registry.register_model("alpha_random", "ready", metrics={})
+
+    report = DataPreprocessor.from_project("alpha", "extra.csv").append()
+    assert report["appended_rows"] == 100
+    assert report["appended_train_rows"] + report["appended_test_rows"] == 100
+    assert report["stale_models"] == ["alpha_random"]
+    assert set(report["input_shift"]) == set(INPUTS) and set(report["output_shift"]) == {"y1"}
+    # The inputs of the new file are shifted by 1.5 standard deviations
+    assert report["input_shift"]["x1"] > 0.2 and report["retrain_recommended"]
+
+    appended = DataPreprocessor.from_project("alpha", "extra.csv")
+    merged = DataPreprocessor.from_project("merged", "merged.csv")
+    *_, scaler_X, scaler_y, params = appended.load_current_version()
+    *_, full_scaler_X, full_scaler_y, _ = merged.load_current_version()
+    assert params["appended_files"] == ["extra.csv"] and params["file_name"] == "base.csv"
+    # partial_fit reaches the statistics of a full fit on the merged file
+    np.testing.assert_allclose(scaler_X.mean_, full_scaler_X.mean_, rtol=1e-9)
+    np.testing.assert_allclose(scaler_X.scale_, full_scaler_X.scale_, rtol=1e-9)
+    np.testing.assert_allclose(scaler_y.mean_, full_scaler_y.mean_, rtol=1e-9)
+
+    # Rescaling keeps every row: all rows of the merged file come back in the original scale
+    rows = np.vstack([raw_rows(appended, "train"), raw_rows(appended, "test")])
+    expected = pd.concat([base, extra])[INPUTS + ["y1"]].to_numpy()
+    np.testing.assert_allclose(sort_rows(rows), sort_rows(expected), rtol=1e-6, atol=1e-9)
+
+    # A project with the same inputs and another target splits the new rows alike
+    DataPreprocessor.from_project("beta", "extra.csv").append()
+    beta = DataPreprocessor.from_project("beta", "extra.csv")
+    for split in ("train", "test"):
+        np.testing.assert_allclose(raw_rows(appended, split)[:, :2], raw_rows(beta, split)[:, :2], rtol=1e-9)
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+import urllib.error
+import urllib.request
+from multiprocessing import shared_memory
+import numpy as np
+import pytest
+from conftest import BACKEND_DIR
+from app.config import STAGING_DIRECTORY
+from app.services import distributed
+from app.services.distributed import TOKEN_HEADER, DistributedCoordinator, ParallelTrialsBackend, get_json
+
+
+def test_remote_bind_requires_token(monkeypatch):
+    monkeypatch.delenv("AUTOML_WORKER_TOKEN", raising=False)
+    with pytest.raises(ValueError):
+        DistributedCoordinator(bind_host="0.0.0.0")
+    assert DistributedCoordinator(bind_host="0.0.0.0", token="secret").token == "secret"
+    # Loopback coordinators generate a token for their local workers
+    assert DistributedCoordinator().token
+
+
+def test_side_channel_rejects_requests_without_token():
+    coordinator = DistributedCoordinator()
+    coordinator.job = {"project_name": "demo", "digest": "0"}
+    coordinator.start_server()
+    try:
+        assert coordinator.data_port != 0
+        url = f"http://127.0.0.1:{coordinator.data_port}/job"
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url, timeout=10)
+        assert error.value.code == 403
+        with pytest.raises(urllib.error.HTTPError):
+            get_json(url, "wrong")
+        assert get_json(url, coordinator.token) == coordinator.job
+
+        request = urllib.request.Request(f"http://127.0.0.1:{coordinator.data_port}/heartbeat",
+                                         data=json.dumps({"worker_id": "w"}).encode(),
+                                         headers={TOKEN_HEADER: coordinator.token})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert json.loads(response.read()) == {"stop": False}
+        assert "w" in coordinator.heartbeats
+    finally:
+        coordinator.server.shutdown()
+        coordinator.server.server_close()
+
+
+def search_job(monkeypatch, max_trials, epochs):
+    """An AutoMLRegressor on a small sum-of-inputs problem, searched with few trials and epochs."""
+    pytest.importorskip("autokeras")
+    from app.services import automl as automl_module
+
+    monkeypatch.setattr(automl_module, "MAX_TRIALS", max_trials)
+    monkeypatch.setattr(automl_module, "EPOCHS", epochs)
+    # The worker process imports the app from the source tree but runs in the scratch tree
+    monkeypatch.setenv("PYTHONPATH", BACKEND_DIR)
+
+    rng = np.random.default_rng(0)
+    X_train = rng.random((64, 3))
+    y_train = X_train.sum(axis=1, keepdims=True)
+    os.makedirs("data", exist_ok=True)
+    np.savez("data/train_data.npz", X_train=X_train, y_train=y_train)
+
+    automl = automl_module.AutoMLRegressor(project_name="demo", tuner_types=["random"],
+                                           train_data_path="data/train_data.npz")
+    automl.X_train, automl.y_train = X_train, y_train
+    return automl
+
+
+def test_search_with_localhost_worker(monkeypatch):
+    automl = search_job(monkeypatch, max_trials=2, epochs=2)
+
+    coordinator = DistributedCoordinator(local_workers=1, threads_per_worker=1)
+    regressor = coordinator.search(automl, "random", os.path.abspath("search"))
+
+    trials = regressor.tuner.oracle.trials.values()
+    assert len(trials) == 2
+    assert all(trial.status == "COMPLETED" for trial in trials)
+    assert not regressor.tuner.oracle.ongoing_trials
+    assert regressor.predict(automl.X_train[:4]).shape == (4, 1)
+
+
+def kill_first_trial(coordinator, killed):
+    """Kill the worker process running the first trial after it trained for a second."""
+    started = {}
+    while not coordinator.stopping.is_set():
+        ongoing = dict(coordinator.oracle.ongoing_trials) if coordinator.oracle is not None else {}
+        for worker_id, trial in ongoing.items():
+            process = coordinator.processes.get(worker_id)
+            if process is not None and time.time() - started.setdefault(trial.trial_id, time.time()) > 1:
+                process.kill()
+                killed.update(worker_id=worker_id, trial_id=trial.trial_id, status=trial.status)
+                return
+        time.sleep(0.05)
+
+
+def test_trial_of_killed_worker_completes_on_another(monkeypatch):
+    automl = search_job(monkeypatch, max_trials=2, epochs=200)
+    monkeypatch.setattr(distributed, "HEARTBEAT_INTERVAL", 0.5)
+
+    coordinator = DistributedCoordinator(local_workers=1, threads_per_worker=1)
+    killed = {}
+    killer = threading.Thread(target=kill_first_trial, args=(coordinator, killed), daemon=True)
+    killer.start()
+    regressor = coordinator.search(automl, "random", os.path.abspath("search"))
+    killer.join(5)
+
+    # The worker died before reporting the trial
+    assert killed["status"] == "RUNNING" and coordinator.restarts == 1
+    # The replacement worker picked up the trial again instead of the search losing it
+    oracle = regressor.tuner.oracle
+    assert len(oracle.trials) == 2
+    assert oracle.trials[killed["trial_id"]].status == "COMPLETED"
+    assert all(trial.status == "COMPLETED" for trial in oracle.trials.values())
+    assert not oracle.ongoing_trials
+
+
+def test_parallel_trials_share_memory_and_unlink_it(monkeypatch):
+    automl = search_job(monkeypatch, max_trials=2, epochs=2)
+    blocks = []
+    original = distributed.share_arrays
+
+    def recording_share_arrays(arrays):
+        block, spec = original(arrays)
+        blocks.append(spec["name"])
+        return block, spec
+    monkeypatch.setattr(distributed, "share_arrays", recording_share_arrays)
+
+    backend = ParallelTrialsBackend(parallel_trials=2)
+    regressor = backend.search(automl, "random", os.path.abspath("search"))
+
+    # Trial results land in the oracle's layout, as in a sequential search
+    project_dir = os.path.join(os.path.abspath("search"), "demo_random")
+    trial_ids = sorted(regressor.tuner.oracle.trials)
+    assert len(trial_ids) == 2
+    for trial_id in trial_ids:
+        with open(os.path.join(project_dir, f"trial_{trial_id}", "trial.json"), "r") as f:
+            trial = json.load(f)
+        assert trial["status"] == "COMPLETED" and trial["score"] is not None
+    # Both workers attached to the block instead of downloading the data
+    assert backend.job["shared_memory"]["name"] == blocks[0]
+    assert not os.path.exists(os.path.join(STAGING_DIRECTORY, "worker-cache"))
+
+    # The coordinator unlinked the block once the search finished
+    assert len(blocks) == 1 and backend.shared_block is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=blocks[0])
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pytest
+from app.config import MODEL_DIRECTORY
+from app.services import ensemble
+from app.services.serving_runtime import ACTIVATIONS, EnsembleServingModel
+
+
+def random_network(rng, sizes, activations):
+    """(W, b, activation) dense layers as build_mlp returns them."""
+    return [(rng.normal(size=(fan_in, fan_out)), rng.normal(size=fan_out), activation)
+            for fan_in, fan_out, activation in zip(sizes[:-1], sizes[1:], activations)]
+
+
+def forward(network, X):
+    h = X
+    for W, b, activation in network:
+        h = ACTIVATIONS[activation](h @ W + b)
+    return h
+
+
+def test_fused_ensemble_matches_mean_of_members():
+    rng = np.random.default_rng(0)
+    # Different widths, depths and activations, so padding and identity layers are exercised
+    networks = [
+        random_network(rng, [4, 8, 2], ["relu", "linear"]),
+        random_network(rng, [4, 5, 3, 2], ["tanh", "relu", "linear"]),
+        random_network(rng, [4, 6, 2], ["sigmoid", "linear"]),
+    ]
+    layers, activations = ensemble.stack_networks(networks)
+    assert len(layers) == 3
+    assert layers[0][0].shape == (3, 4, 8)
+
+    model = EnsembleServingModel(
+        [(W.astype(np.float32), b.astype(np.float32)) for W, b in layers], activations,
+        np.array([2.0, 0.5], dtype=np.float32), np.array([1.0, -1.0], dtype=np.float32), {}
+    )
+    X = rng.normal(size=(32, 4))
+    members = [forward(network, X) for network in networks]
+    expected = np.mean(members, axis=0)
+    np.testing.assert_allclose(model.predict_scaled(X), expected, rtol=1e-4, atol=1e-4)
+    np.testing.assert_allclose(model.predict(X), (expected - [1.0, -1.0]) / [2.0, 0.5], rtol=1e-4, atol=1e-4)
+
+
+def test_ensemble_name_is_validated():
+    for name in ("../outside", "a/b", ".hidden", ""):
+        with pytest.raises(ValueError):
+            ensemble.check_ensemble_name(name)
+    ensemble.check_ensemble_name("demo_ensemble")
+
+    # An existing model that is not an ensemble must not be replaced
+    os.makedirs(os.path.join(MODEL_DIRECTORY, "demo_random", "best_model"))
+    with pytest.raises(ValueError):
+        ensemble.check_ensemble_name("demo_random")
+
+
+def test_k_larger_than_available_trials_fails(monkeypatch):
+    monkeypatch.setattr(ensemble, "select_members", lambda project_name, k, tuner: [
+        (0.1, "demo_random", "1"), (0.2, "demo_random", "2"), (0.3, "demo_random", "3")
+    ])
+    with pytest.raises(ValueError, match="only 3"):
+        ensemble.export_ensemble("demo", k=5, tuner="random")
+
+
+def test_other_autokeras_versions_are_refused(monkeypatch):
+    ak = pytest.importorskip("autokeras")
+    monkeypatch.setattr(ak, "__version__", "1.1.0")
+    with pytest.raises(RuntimeError, match=ensemble.SUPPORTED_AUTOKERAS):
+        ensemble.load_trial_models("demo_random", ["1"], np.zeros((4, 2)), np.zeros((4, 1)))
@@ -0,0 +1,42 @@
+import json
+import numpy as np
+import pandas as pd
+from app.services.ingestion import downcast, json_layout, read_dataset
+
+
+def test_downcast_keeps_float64_unless_lossless():
+    frame = downcast(pd.DataFrame({
+        "decimal": [0.1, 0.25, np.nan],
+        "halves": [0.5, 1.5, np.nan],
+        "large": [1e39, 1.0, 2.0],
+        "count": [3, 4, 5],
+    }))
+    assert frame["decimal"].dtype == np.float64
+    assert frame["halves"].dtype == np.float32
+    assert frame["large"].dtype == np.float64
+    assert frame["count"].dtype == np.int8
+
+
+def test_json_layout(tmp_path):
+    nested_lines = tmp_path / "nested.json"
+    nested_lines.write_text("\n".join(json.dumps({"a": {"x": i}, "b": [i]}) for i in range(3)) + "\n")
+    assert json_layout(str(nested_lines)) == "lines"
+
+    plain_lines = tmp_path / "plain.json"
+    plain_lines.write_text(json.dumps({"a": 1, "b": 2}) + "\n")
+    assert json_layout(str(plain_lines)) == "lines"
+
+    columns = tmp_path / "columns.json"
+    pd.DataFrame({"a": [1.5, 2.5], "b": [3.5, 4.5]}).to_json(columns)
+    assert json_layout(str(columns)) == "columns"
+
+    records = tmp_path / "records.json"
+    pd.DataFrame({"a": [1.5, 2.5]}).to_json(records, orient="records")
+    assert json_layout(str(records)) == "records"
+
+
+def test_read_dataset_keeps_decimal_precision(tmp_path):
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"x": [0.1, 0.2, 0.3], "y": [1, 2, 3]}).to_csv(path, index=False)
+    data = read_dataset(str(path))
+    assert data["x"].tolist() == [0.1, 0.2, 0.3]
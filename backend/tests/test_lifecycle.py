@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import tarfile
+from app.config import (
+    ARCHIVE_DIRECTORY, MODEL_DIRECTORY, PROCESSED_DIRECTORY, STAGING_DIRECTORY, UPLOAD_DIRECTORY
+)
+from app.services import lifecycle, registry
+from app.services.artifacts import TRIAL_INDEX_FILENAME
+
+NO_QUOTAS = {"models": None, "processed": None, "uploads": None}
+
+
+def write_file(path, size=100):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+
+
+def make_project(project_name, file_name="data.csv", appended_files=None):
+    project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+    params = {"input_params": ["a"], "output_params": ["b"], "file_name": file_name}
+    if appended_files:
+        params["appended_files"] = appended_files
+    os.makedirs(project_dir)
+    with open(os.path.join(project_dir, "params.json"), "w") as f:
+        json.dump(params, f)
+    write_file(os.path.join(project_dir, "train_data.npz"))
+    registry.register_project(project_name, "ready")
+
+
+def make_search(model_name, trials=3, checkpoint_bytes=1000, heads=None, project=None):
+    """A published search with a best model and trials whose score is their number."""
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    write_file(os.path.join(model_dir, "best_model", "saved_model.pb"))
+    for i in range(trials):
+        trial_dir = os.path.join(model_dir, f"trial_{i:03d}")
+        write_file(os.path.join(trial_dir, "checkpoint.index"), 10)
+        write_file(os.path.join(trial_dir, "checkpoint.data-00000-of-00001"), checkpoint_bytes)
+        with open(os.path.join(trial_dir, "trial.json"), "w") as f:
+            json.dump({"trial_id": f"{i:03d}", "status": "COMPLETED", "score": float(i)}, f)
+    if heads is not None:
+        with open(os.path.join(model_dir, "heads.json"), "w") as f:
+            json.dump({"projects": heads}, f)
+    registry.register_model(model_name, "ready", project=project, tuner="random" if project else None)
+
+
+def age_everything(days):
+    """Make every file and registry entry look untouched for `days` days."""
+    then = time.time() - days * lifecycle.DAY
+    for root, dirs, files in os.walk("./app"):
+        for name in dirs + files:
+            os.utime(os.path.join(root, name), (then, then))
+    with registry.transaction() as connection:
+        connection.execute("UPDATE artifacts SET updated_at = ?, created_at = ?, served_at = NULL", (then, then))
+
+
+def archive_members(project_name):
+    with tarfile.open(lifecycle.archive_path(project_name), "r:gz") as archive:
+        return {name.split("/")[1] for name in archive.getnames() if name.count("/") == 1}
+
+
+def test_archive_and_restore_round_trip():
+    make_project("alpha")
+    make_search("alpha_random")
+    make_project("beta")
+    make_search("group_random", heads={"alpha": [0, 1], "beta": [1, 2]}, project="alpha")
+    age_everything(100)
+    # Only beta is used for predictions, through the multi-project model
+    registry.mark_served("group_random", "beta")
+
+    report = lifecycle.run_lifecycle(quotas=NO_QUOTAS)
+    assert report["by_action"]["archive"] > 0
+    assert not os.path.exists(os.path.join(PROCESSED_DIRECTORY, "alpha"))
+    assert not os.path.exists(os.path.join(MODEL_DIRECTORY, "alpha_random"))
+    # beta still needs the multi-project model
+    assert os.path.isdir(os.path.join(MODEL_DIRECTORY, "group_random"))
+    assert os.path.isdir(os.path.join(PROCESSED_DIRECTORY, "beta"))
+    assert archive_members("alpha") == {"alpha", "alpha_random"}
+    assert registry.get_entry("project", "alpha")["status"] == "archived"
+    assert registry.get_entry("model", "alpha_random")["status"] == "archived"
+    assert registry.get_entry("model", "group_random")["status"] == "ready"
+
+    assert lifecycle.restore_project("alpha") == ["alpha", "alpha_random"]
+    assert os.path.exists(os.path.join(PROCESSED_DIRECTORY, "alpha", "params.json"))
+    assert os.path.exists(os.path.join(MODEL_DIRECTORY, "alpha_random", "best_model", "saved_model.pb"))
+    assert not os.path.exists(lifecycle.archive_path("alpha"))
+    assert registry.get_entry("project", "alpha")["status"] == "ready"
+    assert registry.get_entry("model", "alpha_random")["status"] == "ready"
+
+    # Archiving both projects puts the multi-project model into the archive of the last one
+    age_everything(100)
+    lifecycle.run_lifecycle(quotas=NO_QUOTAS)
+    assert not os.path.exists(os.path.join(MODEL_DIRECTORY, "group_random"))
+    holders = [name for name in ("alpha", "beta") if "group_random" in archive_members(name)]
+    assert len(holders) == 1
+    lifecycle.restore_project("beta")
+    lifecycle.restore_project("alpha")
+    entry = registry.get_entry("model", "group_random")
+    assert entry["status"] == "ready" and entry["project"] == "alpha"
+
+
+def test_dry_run_changes_nothing():
+    make_project("alpha")
+    make_search("alpha_random", trials=8)
+    os.remove(os.path.join(MODEL_DIRECTORY, "alpha_random", TRIAL_INDEX_FILENAME))
+    age_everything(100)
+    entries = {entry["name"]: entry for entry in registry.list_entries("model")[0]}
+
+    report = lifecycle.run_lifecycle(dry_run=True, quotas=NO_QUOTAS)
+    assert report["by_action"]["prune_trials"] == 3 * 1010
+    assert report["by_action"]["archive"] > 0
+    assert os.listdir(ARCHIVE_DIRECTORY) == []
+    assert os.path.exists(os.path.join(MODEL_DIRECTORY, "alpha_random", "trial_007", "checkpoint.index"))
+    assert not os.path.exists(os.path.join(MODEL_DIRECTORY, "alpha_random", TRIAL_INDEX_FILENAME))
+    assert {entry["name"]: entry for entry in registry.list_entries("model")[0]} == entries
+
+
+def test_orphan_rules():
+    make_project("alpha", file_name="base.csv", appended_files=["extra.csv"])
+    make_search("lost_random", project="lost")
+    make_search("kept_random", project="kept")
+    registry.upsert("project", "kept", project="kept", status="archived")
+    for name in ("base.csv", "extra.csv", "orphan.csv"):
+        write_file(os.path.join(UPLOAD_DIRECTORY, name))
+    os.makedirs(os.path.join(STAGING_DIRECTORY, "crashed"))
+    # Left 'training' by a server process that stopped before this one started
+    registry.register_model("ghost_random", "training")
+    age_everything(30)
+
+    write_file(os.path.join(UPLOAD_DIRECTORY, "fresh.csv"))
+    registry.register_model("busy_random", "training")
+    os.makedirs(os.path.join(STAGING_DIRECTORY, "running"))
+
+    lifecycle.run_lifecycle(quotas=NO_QUOTAS)
+    assert sorted(os.listdir(UPLOAD_DIRECTORY)) == ["base.csv", "extra.csv", "fresh.csv"]
+    assert os.listdir(STAGING_DIRECTORY) == ["running"]
+    assert not os.path.exists(os.path.join(MODEL_DIRECTORY, "lost_random"))
+    assert registry.get_entry("model", "lost_random") is None
+    # The project of this model is archived, it is needed again after a restore
+    assert os.path.isdir(os.path.join(MODEL_DIRECTORY, "kept_random"))
+
+
+def test_quota_prunes_trials_before_archiving():
+    make_project("old")
+    make_search("old_random", trials=8, checkpoint_bytes=10000)
+    make_project("new")
+    make_search("new_random", trials=8, checkpoint_bytes=10000)
+    age_everything(30)
+    registry.mark_served("new_random", "new")
+    size = lifecycle.usage()["models"]
+
+    # Pruning to keep_trials frees enough, nothing is archived
+    report = lifecycle.run_lifecycle(quotas={**NO_QUOTAS, "models": size - 50000}, dry_run=True)
+    assert report["over_quota"] == {}
+    assert "archive" not in report["by_action"]
+
+    # A quota below the best models escalates to pruning every trial, then archiving idle projects
+    report = lifecycle.run_lifecycle(quotas={**NO_QUOTAS, "models": 1})
+    actions = [action["action"] for action in report["actions"]]
+    assert actions.index("archive") > max(i for i, action in enumerate(actions) if action == "prune_trials")
+    assert not os.path.exists(os.path.join(MODEL_DIRECTORY, "new_random", "trial_000", "checkpoint.index"))
+    assert os.path.exists(lifecycle.archive_path("old"))
+    # Recently served projects are not archived to meet a quota
+    assert os.path.isdir(os.path.join(PROCESSED_DIRECTORY, "new"))
+    assert "models" in report["over_quota"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from app.services.model_export import build_mlp, quantize, scaler_affine
+from app.services.serving_runtime import ServingModel, dequantize
+
+keras = pytest.importorskip("tensorflow").keras
+
+
+def small_model(rng, relu=None):
+    """Normalization -> Dense -> BatchNormalization -> ReLU -> Dense, as AutoKeras builds them."""
+    normalization = keras.layers.Normalization()
+    normalization.adapt(rng.normal(2.0, 3.0, size=(256, 3)).astype(np.float32))
+    inputs = keras.Input(shape=(3,))
+    h = normalization(inputs)
+    h = keras.layers.Dense(8)(h)
+    batch_norm = keras.layers.BatchNormalization()
+    h = batch_norm(h)
+    h = (relu or keras.layers.ReLU())(h)
+    outputs = keras.layers.Dense(2)(h)
+    model = keras.Model(inputs, outputs)
+    # Trained statistics instead of the identity initialization
+    gamma, beta, mean, variance = batch_norm.get_weights()
+    batch_norm.set_weights([
+        rng.uniform(0.5, 2.0, size=gamma.shape), rng.normal(size=beta.shape),
+        rng.normal(size=mean.shape), rng.uniform(0.5, 2.0, size=variance.shape)
+    ])
+    return model
+
+
+@pytest.mark.parametrize("quantization, tolerance", [(None, 1e-4), ("float16", 1e-2), ("int8", 5e-2)])
+def test_build_mlp_matches_keras(quantization, tolerance):
+    rng = np.random.default_rng(0)
+    model = small_model(rng)
+    X_raw = rng.normal(10.0, 5.0, size=(64, 3))
+    scaler_X = StandardScaler().fit(X_raw)
+
+    layers = build_mlp(model, scaler_X)
+    assert [activation for _, _, activation in layers] == ["relu", "linear"]
+    arrays, weights = {}, []
+    for i, (W, b, _) in enumerate(layers):
+        quantize(arrays, f"W{i}", W, quantization)
+        weights.append((dequantize(arrays, f"W{i}", quantization), b.astype(np.float32)))
+    runtime = ServingModel(weights, ["relu", "linear"], np.ones(2, dtype=np.float32),
+                           np.zeros(2, dtype=np.float32), {})
+
+    # The exported network takes raw inputs, the Keras model scaled ones
+    expected = model.predict(scaler_X.transform(X_raw).astype(np.float32), verbose=0)
+    delta = np.max(np.abs(runtime.predict_scaled(X_raw) - expected))
+    assert delta <= tolerance * max(1.0, np.max(np.abs(expected)))
+
+
+def test_scaler_affine_reproduces_transform():
+    X = np.random.default_rng(1).normal(3.0, 2.0, size=(20, 4))
+    scaler = StandardScaler().fit(X)
+    scale, offset = scaler_affine(scaler)
+    np.testing.assert_allclose(X * scale + offset, scaler.transform(X), rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.parametrize("relu", [
+    lambda: keras.layers.ReLU(max_value=6.0),
+    lambda: keras.layers.ReLU(negative_slope=0.1),
+    lambda: keras.layers.ReLU(threshold=0.5),
+])
+def test_parameterized_relu_is_rejected(relu):
+    model = small_model(np.random.default_rng(2), relu=relu())
+    scaler_X = StandardScaler().fit(np.random.default_rng(3).normal(size=(16, 3)))
+    with pytest.raises(ValueError, match="ReLU"):
+        build_mlp(model, scaler_X)
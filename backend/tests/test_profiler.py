@@ -0,0 +1,86 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from app.config import UPLOAD_DIRECTORY
+from app.services.profiler import KMV_SIZE, QUANTILES, ColumnStats, Reservoir, profile_dataset
+
+
+def stream(column_stats, values, chunk_size=10000):
+    for start in range(0, len(values), chunk_size):
+        column_stats.update(pd.Series(values[start:start + chunk_size]))
+
+
+def test_distinct_counts_are_exact_then_estimated():
+    small = ColumnStats("small")
+    stream(small, np.tile(np.arange(500), 4), chunk_size=300)
+    assert small.distinct() == (500, True)
+
+    large = ColumnStats("large")
+    stream(large, np.random.default_rng(0).permutation(np.repeat(np.arange(50000), 2)))
+    estimate, exact = large.distinct()
+    # The sketch's relative error is about 1 / sqrt(KMV_SIZE), ~3%
+    assert not exact
+    assert abs(estimate - 50000) / 50000 < 3 / np.sqrt(KMV_SIZE)
+
+    # Integer and float chunks of the same values are counted once
+    mixed = ColumnStats("mixed")
+    mixed.update(pd.Series([1, 2, 3]))
+    mixed.update(pd.Series([3.0, 2.0, np.nan]))
+    assert mixed.distinct() == (3, True) and mixed.dtype == "float"
+
+
+def test_reservoir_quantiles_match_the_stream():
+    values = np.random.default_rng(1).permutation(100000).astype(np.float64)
+    samples = []
+    for _ in range(2):
+        reservoir = Reservoir(["x"], size=5000, seed=0)
+        for start in range(0, len(values), 7000):
+            reservoir.update(pd.DataFrame({"x": values[start:start + 7000]}))
+        samples.append(reservoir.column(0))
+    assert reservoir.seen == len(values) and len(samples[0]) == 5000
+    # The sample is reproducible for a seed and holds distinct rows of the stream
+    np.testing.assert_array_equal(samples[0], samples[1])
+    assert len(np.unique(samples[0])) == 5000
+    np.testing.assert_allclose(np.quantile(samples[0], QUANTILES), np.quantile(values, QUANTILES),
+                               atol=0.02 * len(values))
+
+
+def test_profile_reports_nulls_and_flags():
+    pd.DataFrame({
+        "x": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "sparse": [1.0, None, None, None, 2.0],
+        "constant": [7, 7, 7, 7, 7],
+        "label": ["a", "b", "a", "b", "c"],
+    }).to_csv(os.path.join(UPLOAD_DIRECTORY, "data.csv"), index=False)
+
+    columns = {column["name"]: column for column in profile_dataset("data.csv")["columns"]}
+    assert columns["sparse"]["nulls"] == 3 and columns["sparse"]["null_ratio"] == 0.6
+    assert columns["sparse"]["warnings"] == ["mostly_null"]
+    assert columns["x"]["null_ratio"] == 0.0 and columns["x"]["warnings"] == []
+    assert columns["x"]["quantiles"]["0.5"] == 3.0 and columns["x"]["std"] == np.std([1, 2, 3, 4, 5], ddof=1)
+    assert columns["constant"]["warnings"] == ["constant"]
+    assert columns["label"]["distinct"] == 3 and columns["label"]["warnings"] == ["non_numeric"]
+
+
+def test_profiles_are_cached_by_content():
+    path = os.path.join(UPLOAD_DIRECTORY, "data.csv")
+    pd.DataFrame({"x": np.arange(100), "y": np.arange(100) * 2.0}).to_csv(path, index=False)
+
+    first = profile_dataset("data.csv")
+    assert not first["cached"]
+    again = profile_dataset("data.csv")
+    assert again["cached"] and again["columns"] == first["columns"]
+
+    # A renamed copy has the same content hash
+    shutil.copy(path, os.path.join(UPLOAD_DIRECTORY, "copy.csv"))
+    copy = profile_dataset("copy.csv")
+    assert copy["cached"] and copy["digest"] == first["digest"] and copy["file_name"] == "copy.csv"
+    # Other sample sizes and refreshes recompute it
+    assert not profile_dataset("data.csv", sample_size=10)["cached"]
+    assert not profile_dataset("data.csv", refresh=True)["cached"]
+
+    # Changed content is profiled again
+    pd.DataFrame({"x": np.arange(50), "y": np.arange(50) * 2.0}).to_csv(path, index=False)
+    changed = profile_dataset("data.csv")
+    assert not changed["cached"] and changed["rows"] == 50 and changed["digest"] != first["digest"]
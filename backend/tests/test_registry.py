@@ -0,0 +1,91 @@
+import os
+import json
+import pytest
+from fastapi import HTTPException
+from app.config import MODEL_DIRECTORY, PROCESSED_DIRECTORY
+from app.routers import visualR
+from app.services import registry
+from app.services.serving_runtime import ENSEMBLE_FORMAT, serving_dir
+
+
+def make_dir(*parts, files=()):
+    path = os.path.join(*parts)
+    os.makedirs(path, exist_ok=True)
+    for name in files:
+        with open(os.path.join(path, name), "w") as f:
+            f.write("{}")
+    return path
+
+
+def test_list_entries_filters_and_pages():
+    for project in ("alpha", "beta"):
+        for tuner in registry.TUNER_TYPES:
+            registry.register_model(f"{project}_{tuner}", "training")
+    registry.upsert("model", "alpha_random", status="failed")
+
+    entries, total = registry.list_entries("model", project="alpha")
+    assert total == 4
+    assert [entry["name"] for entry in entries] == sorted(f"alpha_{tuner}" for tuner in registry.TUNER_TYPES)
+    assert registry.list_names("model", status="failed") == ["alpha_random"]
+    assert registry.list_names("model", project="beta", tuner="greedy") == ["beta_greedy"]
+
+    # Pages follow the name order and the total ignores offset and limit
+    names = registry.list_names("model")
+    pages = [registry.list_entries("model", offset=offset, limit=3) for offset in range(0, 8, 3)]
+    assert [entry["name"] for page, _ in pages for entry in page] == names
+    assert {total for _, total in pages} == {8}
+    assert registry.list_entries("model", offset=10, limit=3) == ([], 8)
+
+    response = visualR.get_registry_entries("model", project="beta", status="training", offset=1, limit=2)
+    assert response["total"] == 4
+    assert [entry["name"] for entry in response["entries"]] == ["beta_greedy", "beta_hyperband"]
+    with pytest.raises(HTTPException) as error:
+        visualR.get_registry_entries("dataset")
+    assert error.value.status_code == 404
+
+
+def test_rebuild_index_backfills_existing_directories():
+    # Versioned and legacy projects, and one that was only configured
+    alpha = make_dir(PROCESSED_DIRECTORY, "alpha", "versions", "000001", files=["params.json", "train_data.npz"])
+    with open(os.path.join(PROCESSED_DIRECTORY, "alpha", "CURRENT"), "w") as f:
+        f.write(os.path.basename(alpha))
+    make_dir(PROCESSED_DIRECTORY, "legacy", files=["params.json", "train_data.npz"])
+    make_dir(PROCESSED_DIRECTORY, "draft", files=["params.json"])
+
+    make_dir(MODEL_DIRECTORY, "alpha_random", "best_model")
+    group = make_dir(MODEL_DIRECTORY, "group_bayesian", "best_model")
+    with open(os.path.join(os.path.dirname(group), "heads.json"), "w") as f:
+        json.dump({"projects": {"legacy": [0, 1], "alpha": [1, 2]}}, f)
+    manifest_dir = make_dir(serving_dir(os.path.join(MODEL_DIRECTORY, "alpha_best")))
+    with open(os.path.join(manifest_dir, "manifest.json"), "w") as f:
+        json.dump({"format": ENSEMBLE_FORMAT, "project_name": "alpha"}, f)
+    make_dir(MODEL_DIRECTORY, "interrupted")
+
+    # Entries of removed directories are dropped, failures stay listed
+    registry.upsert("model", "gone_random", project="gone", status="ready",
+                    path=os.path.join(MODEL_DIRECTORY, "gone_random"))
+    registry.upsert("model", "crashed_random", project="crashed", status="failed")
+    registry.upsert("model", "dead_random", project="dead", status="training",
+                    path=make_dir(MODEL_DIRECTORY, "dead_random"))
+    with registry.transaction() as connection:
+        connection.execute("UPDATE artifacts SET updated_at = ? WHERE name = 'dead_random'",
+                           (registry.PROCESS_STARTED_AT - 60,))
+
+    registry.rebuild_index()
+    projects = {entry["name"]: entry for entry in registry.list_entries("project")[0]}
+    assert {name: entry["status"] for name, entry in projects.items()} == \
+        {"alpha": "ready", "legacy": "ready", "draft": "configured"}
+    models = {entry["name"]: entry for entry in registry.list_entries("model")[0]}
+    assert {name: entry["status"] for name, entry in models.items()} == {
+        "alpha_random": "ready", "group_bayesian": "ready", "alpha_best": "ready",
+        "interrupted": "incomplete", "crashed_random": "failed", "dead_random": "failed",
+    }
+    assert (models["alpha_random"]["project"], models["alpha_random"]["tuner"]) == ("alpha", "random")
+    # Multi-project models are listed under their first project and serve all of them
+    assert (models["group_bayesian"]["project"], models["group_bayesian"]["tuner"]) == ("legacy", "bayesian")
+    assert models["group_bayesian"]["metrics"]["projects"] == ["legacy", "alpha"]
+    assert (models["alpha_best"]["project"], models["alpha_best"]["tuner"]) == ("alpha", "ensemble")
+
+    # Running it again changes nothing
+    registry.rebuild_index()
+    assert registry.list_names("model") == sorted(models)
@@ -0,0 +1,146 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import CLIENT_HEADER, Scheduler, admit
+
+# Small caps and short waits; the rates are high enough not to interfere unless a test lowers them
+CLASSES = {
+    "interactive": {"concurrency": 2, "queue": 2, "max_wait": 1.0, "rate": 1000.0, "burst": 1000},
+    "batch": {"concurrency": 1, "queue": 1, "max_wait": 0.2, "rate": 1000.0, "burst": 1000},
+    "train": {"concurrency": 1, "queue": 1, "max_wait": None, "rate": 1000.0, "burst": 1000},
+}
+
+
+class Backend:
+    """App with one endpoint per class; batch and train requests run until they are released."""
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.running = {name: 0 for name in CLASSES}
+        self.peak = dict(self.running)
+        self.app = FastAPI()
+        for name in CLASSES:
+            self.app.post(f"/{name}", dependencies=[Depends(admit(name))])(self.endpoint(name))
+
+    def endpoint(self, name):
+        async def run():
+            self.running[name] += 1
+            self.peak[name] = max(self.peak[name], self.running[name])
+            try:
+                if name != "interactive":
+                    await self.release.wait()
+            finally:
+                self.running[name] -= 1
+            return {"class": name}
+        return run
+
+    def client(self):
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url="http://test")
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    fresh = Scheduler({name: dict(settings) for name, settings in CLASSES.items()})
+    monkeypatch.setattr(scheduler_module, "scheduler", fresh)
+    return fresh
+
+
+async def until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_token_bucket_rejects_with_retry_after(scheduler):
+    scheduler.classes["interactive"].rate = 0.1
+    scheduler.classes["interactive"].burst = 2
+
+    async def scenario():
+        async with Backend().client() as client:
+            responses = [await client.post("/interactive", headers={CLIENT_HEADER: "alice"}) for _ in range(3)]
+            other = await client.post("/interactive", headers={CLIENT_HEADER: "bob"})
+        return responses, other
+
+    responses, other = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    # One token refills in 1 / rate seconds
+    assert responses[2].headers["Retry-After"] == "10"
+    # Buckets are per client
+    assert other.status_code == 200
+    assert scheduler.classes["interactive"].counters["rate_limited"] == 1
+
+
+def test_class_cap_queues_then_rejects(scheduler):
+    batch = scheduler.classes["batch"]
+    batch.max_wait = None
+
+    async def scenario():
+        backend = Backend()
+        async with backend.client() as client:
+            first = asyncio.create_task(client.post("/batch"))
+            await until(lambda: backend.running["batch"] == 1)
+            queued = asyncio.create_task(client.post("/batch"))
+            await until(lambda: len(batch.waiters) == 1)
+            # The queue of one is full
+            rejected = await client.post("/batch")
+            backend.release.set()
+            return await first, await queued, rejected, backend.peak["batch"]
+
+    first, queued, rejected, peak = asyncio.run(scenario())
+    assert (first.status_code, queued.status_code) == (200, 200)
+    assert rejected.status_code == 503 and rejected.headers["Retry-After"] == "1"
+    assert peak == 1
+    assert batch.counters["queue_full"] == 1 and batch.counters["admitted"] == 2
+    assert (batch.running, len(batch.waiters)) == (0, 0)
+
+
+def test_queued_request_times_out(scheduler):
+    batch = scheduler.classes["batch"]
+
+    async def scenario():
+        backend = Backend()
+        async with backend.client() as client:
+            first = asyncio.create_task(client.post("/batch"))
+            await until(lambda: backend.running["batch"] == 1)
+            timed_out = await client.post("/batch")
+            backend.release.set()
+            return await first, timed_out
+
+    first, timed_out = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert timed_out.status_code == 503 and timed_out.headers["Retry-After"] == "1"
+    assert "Timed out" in timed_out.json()["detail"]
+    assert batch.counters["timed_out"] == 1
+    # The expired waiter left the queue and its slot was not leaked
+    assert (batch.running, len(batch.waiters)) == (0, 0)
+
+
+def test_interactive_requests_pass_saturated_batch_and_train(scheduler):
+    scheduler.classes["batch"].max_wait = None
+
+    async def scenario():
+        backend = Backend()
+        async with backend.client() as client:
+            held = []
+            for name in ("batch", "train"):
+                held.append(asyncio.create_task(client.post(f"/{name}")))
+                await until(lambda: backend.running[name] == 1)
+                held.append(asyncio.create_task(client.post(f"/{name}")))
+                await until(lambda: len(scheduler.classes[name].waiters) == 1)
+
+            # Every batch and train slot and queue place is taken, predictions still get through
+            interactive = await asyncio.wait_for(
+                asyncio.gather(*[client.post("/interactive") for _ in range(10)]), timeout=5
+            )
+            saturated = {name: (work_class.running, len(work_class.waiters))
+                         for name, work_class in scheduler.classes.items() if name != "interactive"}
+            backend.release.set()
+            return interactive, saturated, await asyncio.gather(*held)
+
+    interactive, saturated, held = asyncio.run(scenario())
+    assert [response.status_code for response in interactive] == [200] * 10
+    assert saturated == {"batch": (1, 1), "train": (1, 1)}
+    assert scheduler.classes["interactive"].counters["admitted"] == 10
+    assert [response.status_code for response in held] == [200] * 4
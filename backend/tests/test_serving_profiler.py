@@ -0,0 +1,104 @@
+import os
+import json
+import pickle
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from conftest import BACKEND_DIR
+from app.config import MODEL_DIRECTORY, PROCESSED_DIRECTORY
+from app.routers import visualR
+from app.services import registry
+from app.services.artifacts import PROFILE_FILENAME, load_profile, summarize_profile
+from app.services.model_export import scaler_affine
+from app.services.serving_runtime import SERVING_FORMAT, scaler_digest, serving_dir, source_mtime
+
+# The exported network is y = X @ COEFFICIENTS + INTERCEPT on raw inputs
+COEFFICIENTS = np.array([[2.0], [-1.0], [0.5]])
+INTERCEPT = 3.0
+
+
+def make_project(project_name="demo"):
+    """A processed project whose test outputs the exported linear model predicts exactly."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(5.0, 2.0, size=(200, 3))
+    y = X @ COEFFICIENTS + INTERCEPT
+    scaler_X, scaler_y = StandardScaler().fit(X), StandardScaler().fit(y)
+    project_dir = os.path.join(PROCESSED_DIRECTORY, project_name)
+    os.makedirs(project_dir)
+    # Pickled like the preprocessor writes them
+    for name, scaler in (("scaler_X.pkl", scaler_X), ("scaler_y.pkl", scaler_y)):
+        with open(os.path.join(project_dir, name), "wb") as f:
+            pickle.dump(scaler, f)
+    np.savez(os.path.join(project_dir, "test_data.npz"), X_test=scaler_X.transform(X), y_test=scaler_y.transform(y))
+    with open(os.path.join(project_dir, "params.json"), "w") as f:
+        json.dump({"input_params": ["a", "b", "c"], "output_params": ["y"]}, f)
+    return project_dir, scaler_y
+
+
+def make_model(project_dir, scaler_y, model_name="demo_random"):
+    """A searched model with one trial, a SavedModel placeholder and an exported numpy-mlp artifact."""
+    model_dir = os.path.join(MODEL_DIRECTORY, model_name)
+    os.makedirs(os.path.join(model_dir, "best_model"))
+    with open(os.path.join(model_dir, "best_model", "saved_model.pb"), "wb") as f:
+        f.write(b"\0")
+    os.makedirs(os.path.join(model_dir, "trial_0"))
+    with open(os.path.join(model_dir, "trial_0", "trial.json"), "w") as f:
+        json.dump({"trial_id": "0", "status": "COMPLETED", "score": 0.1,
+                   "metrics": {"metrics": {"val_loss": {"observations": [{"value": [0.1]}]}}}}, f)
+
+    # The artifact predicts scaled outputs from raw inputs, like model_export writes it
+    y_scale, y_offset = scaler_affine(scaler_y)
+    artifact_dir = serving_dir(model_dir)
+    os.makedirs(artifact_dir)
+    np.savez(os.path.join(artifact_dir, "model.npz"),
+             W0=(COEFFICIENTS * y_scale).astype(np.float32), b0=(INTERCEPT * y_scale + y_offset).astype(np.float32),
+             y_scale=y_scale.astype(np.float32), y_offset=y_offset.astype(np.float32))
+    with open(os.path.join(artifact_dir, "manifest.json"), "w") as f:
+        json.dump({"format": SERVING_FORMAT, "model_name": model_name, "project_name": "demo",
+                   "scaler_digest": scaler_digest(project_dir), "quantization": None, "activations": ["linear"],
+                   "source_mtime": source_mtime(model_dir)}, f)
+    registry.register_model(model_name, "ready")
+    return model_dir
+
+
+@pytest.fixture
+def profiled(monkeypatch):
+    # The profiler subprocess imports the app from the source tree but runs in the scratch tree
+    monkeypatch.setenv("PYTHONPATH", BACKEND_DIR)
+    model_dir = make_model(*make_project())
+    profile = visualR.profile_serving_cost("demo_random")
+    return model_dir, profile
+
+
+def test_profile_is_stored_and_merged_into_the_registry(profiled):
+    model_dir, profile = profiled
+    assert profile["runtime"] == SERVING_FORMAT and profile["project_name"] == "demo"
+    assert profile["source_mtime"] == source_mtime(model_dir)
+    assert set(profile["throughput"]) == {"1", "32", "256", "4096"}
+    assert profile["test_rows"] == 200 and profile["test_mae"] < 1e-4
+    assert load_profile(model_dir) == profile
+    assert os.path.exists(os.path.join(model_dir, PROFILE_FILENAME))
+
+    # The summary is merged into the registry metrics next to the search metrics
+    metrics = registry.get_entry("model", "demo_random")["metrics"]
+    assert metrics["serving"] == summarize_profile(profile)
+    assert metrics["best_val_loss"] == 0.1
+    compared = visualR.compare_models(project="demo")["models"]
+    assert [model["serving"] for model in compared] == [summarize_profile(profile)]
+    assert visualR.get_model_visualization_data("demo_random")["serving_profile"] == profile
+
+    # Re-registering the model keeps the serving cost of the unchanged SavedModel
+    registry.register_model("demo_random", "ready")
+    assert registry.get_entry("model", "demo_random")["metrics"]["serving"] == summarize_profile(profile)
+
+
+def test_profile_is_ignored_once_the_model_is_retrained(profiled):
+    model_dir, profile = profiled
+    saved_model = os.path.join(model_dir, "best_model", "saved_model.pb")
+    os.utime(saved_model, (profile["source_mtime"] + 10, profile["source_mtime"] + 10))
+
+    assert load_profile(model_dir) == profile
+    assert visualR.get_model_visualization_data("demo_random")["serving_profile"] is None
+    # Publishing the retrained model indexes it without the outdated serving cost
+    registry.register_model("demo_random", "ready")
+    assert "serving" not in registry.get_entry("model", "demo_random")["metrics"]
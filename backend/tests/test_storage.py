@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+import multiprocessing
+import pytest
+from app.config import MODEL_DIRECTORY, PROCESSED_DIRECTORY, STAGING_DIRECTORY
+from app.services import storage
+from app.services.storage import (
+    CURRENT_FILENAME, KEEP_VERSIONS, current_project_dir, list_project_versions, new_project_version,
+    project_lock_name, publish_model_dir, read_lock
+)
+
+pytestmark = pytest.mark.skipif(storage.fcntl is None, reason="shared locks need fcntl")
+
+fork = multiprocessing.get_context("fork")
+
+
+def publish_version(project_name, content):
+    with new_project_version(project_name) as version_dir:
+        with open(os.path.join(version_dir, "data.txt"), "w") as f:
+            f.write(content)
+
+
+def current_version(project_name):
+    with open(os.path.join(PROCESSED_DIRECTORY, project_name, CURRENT_FILENAME), "r") as f:
+        return f.read()
+
+
+def hold_read_lock(project_name, holding, release, results):
+    """Child process: take the read lock, resolve the current version and read it after being released."""
+    with read_lock(project_lock_name(project_name)):
+        version_dir = current_project_dir(project_name)
+        holding.set()
+        release.wait(10)
+        with open(os.path.join(version_dir, "data.txt"), "r") as f:
+            results.put((os.path.basename(version_dir), f.read()))
+
+
+def start_reader(project_name):
+    holding, release, results = fork.Event(), fork.Event(), fork.Queue()
+    process = fork.Process(target=hold_read_lock, args=(project_name, holding, release, results))
+    process.start()
+    assert holding.wait(10)
+    return process, release, results
+
+
+def test_versions_are_published_and_pruned():
+    for i in range(1, 6):
+        publish_version("alpha", f"v{i}")
+    assert current_version("alpha") == "000005"
+    assert list_project_versions("alpha") == [f"{i:06d}" for i in range(6 - KEEP_VERSIONS, 6)]
+    with open(os.path.join(current_project_dir("alpha"), "data.txt"), "r") as f:
+        assert f.read() == "v5"
+
+    # A failed preprocessing leaves neither a staging directory nor a new version behind
+    with pytest.raises(RuntimeError):
+        with new_project_version("alpha"):
+            raise RuntimeError("preprocessing failed")
+    assert current_version("alpha") == "000005"
+    assert sorted(os.listdir(os.path.join(PROCESSED_DIRECTORY, "alpha", storage.VERSIONS_DIRNAME))) == \
+        list_project_versions("alpha")
+
+
+def test_reader_keeps_its_version_while_a_writer_publishes():
+    for i in range(1, KEEP_VERSIONS + 1):
+        publish_version("alpha", f"v{i}")
+    oldest = list_project_versions("alpha")[0]
+    reader, release, results = start_reader("alpha")
+
+    writer = threading.Thread(target=publish_version, args=("alpha", "new"))
+    writer.start()
+    time.sleep(0.5)
+    # The new version is staged, but neither published nor pruning while the reader holds the lock
+    assert writer.is_alive()
+    assert current_version("alpha") == f"{KEEP_VERSIONS:06d}"
+    assert oldest in list_project_versions("alpha")
+
+    release.set()
+    reader.join(10)
+    writer.join(10)
+    assert results.get(timeout=5) == (f"{KEEP_VERSIONS:06d}", f"v{KEEP_VERSIONS}")
+    assert current_version("alpha") == f"{KEEP_VERSIONS + 1:06d}"
+    assert oldest not in list_project_versions("alpha")
+
+
+def test_readers_share_the_lock():
+    publish_version("alpha", "v1")
+    first = start_reader("alpha")
+    # A second reader gets the lock while the first one still holds it
+    second = start_reader("alpha")
+    for process, release, results in (first, second):
+        release.set()
+        process.join(10)
+        assert results.get(timeout=5) == ("000001", "v1")
+
+
+def test_publish_model_dir_replaces_the_previous_model():
+    for content in ("old", "new"):
+        staged = os.path.join(STAGING_DIRECTORY, f"run-{content}", "demo_random")
+        os.makedirs(os.path.join(staged, "best_model"))
+        with open(os.path.join(staged, "best_model", "saved_model.pb"), "w") as f:
+            f.write(content)
+        assert publish_model_dir(staged, "demo_random") == os.path.join(MODEL_DIRECTORY, "demo_random")
+
+    with open(os.path.join(MODEL_DIRECTORY, "demo_random", "best_model", "saved_model.pb"), "r") as f:
+        assert f.read() == "new"
+    # The replaced model was moved out of the way and removed
+    assert not any(name.startswith("replaced-") for name in os.listdir(STAGING_DIRECTORY))
@@ -12,6 +12,8 @@ const Upload = () => {
   const [outputParams, setOutputParams] = useState([]); // Selected output parameters
   const [projectName, setProjectName] = useState(""); // Project name
   const [scalerType, setScalerType] = useState(""); // Selected scaler type (StandardScaler or MinMaxScaler)
+  const [profile, setProfile] = useState({}); // Column statistics of the selected file, keyed by column name
+  const [profiling, setProfiling] = useState(false);
 
   // Fetch available files from UPLOAD_DIRECTORY
   useEffect(() => {
@@ -45,6 +47,56 @@ const Upload = () => {
       console.error("Error fetching columns:", error);
       setColumns([]); // Set empty array in case of error
     }
+    fetchProfile(fileName);
+  };
+
+  // Fetch column statistics; cached on the server, so only the first request for a file takes long
+  const fetchProfile = async (fileName) => {
+    setProfile({});
+    setProfiling(true);
+    try {
+      const res = await axios.get(
+        `http://localhost:8000/upload/profile/?file_name=${fileName}`
+      );
+      const byName = {};
+      (res.data.columns || []).forEach((col) => {
+        byName[col.name] = col;
+      });
+      setProfile(byName);
+    } catch (error) {
+      console.error("Error fetching profile:", error);
+    } finally {
+      setProfiling(false);
+    }
+  };
+
+  // Format a number for the column summaries
+  const formatNumber = (value) => {
+    if (value === null || value === undefined) return "-";
+    return Math.abs(value) >= 1e4 || (value !== 0 && Math.abs(value) < 1e-2)
+      ? value.toExponential(2)
+      : Number(value.toFixed(3)).toString();
+  };
+
+  // Short statistics shown under a column name, with warnings for columns unfit for training
+  const renderColumnStats = (col) => {
+    const stats = profile[col];
+    if (!stats) return null;
+    return (
+      <div className="ml-6 text-xs text-gray-500">
+        <div>
+          {stats.dtype}, {(stats.null_ratio * 100).toFixed(1)}% null, ~{stats.distinct} distinct
+        </div>
+        {stats.mean !== null && (
+          <div>
+            {formatNumber(stats.min)} .. {formatNumber(stats.max)}, mean {formatNumber(stats.mean)}, std {formatNumber(stats.std)}
+          </div>
+        )}
+        {stats.warnings.length > 0 && (
+          <div className="text-red-500">{stats.warnings.join(", ").replace(/_/g, " ")}</div>
+        )}
+      </div>
+    );
   };
 
   // Handle parameter selection (checkboxes)
@@ -201,20 +253,25 @@ const Upload = () => {
             />
           </div>
 
+          {profiling && <p className="text-gray-600">Profiling columns...</p>}
+
           {/* Input parameters */}
           <div>
             <label className="block text-lg font-medium mb-2">Select Input Parameters</label>
             <div className="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-5 gap-4">
               {columns.map((col) => (
-                <label key={col} className="flex items-center">
-                  <input
-                    type="checkbox"
-                    checked={inputParams.includes(col)}
-                    onChange={() => handleParamSelection(col, "input")}
-                    className="mr-2"
-                  />
-                  {col}
-                </label>
+                <div key={col}>
+                  <label className="flex items-center">
+                    <input
+                      type="checkbox"
+                      checked={inputParams.includes(col)}
+                      onChange={() => handleParamSelection(col, "input")}
+                      className="mr-2"
+                    />
+                    {col}
+                  </label>
+                  {renderColumnStats(col)}
+                </div>
               ))}
             </div>
           </div>
@@ -224,15 +281,18 @@ const Upload = () => {
             <label className="block text-lg font-medium mb-2">Select Output Parameters</label>
             <div className="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-4 lg:grid-cols-5 gap-4">
               {columns.map((col) => (
-                <label key={col} className="flex items-center">
-                  <input
-                    type="checkbox"
-                    checked={outputParams.includes(col)}
-                    onChange={() => handleParamSelection(col, "output")}
-                    className="mr-2"
-                  />
-                  {col}
-                </label>
+                <div key={col}>
+                  <label className="flex items-center">
+                    <input
+                      type="checkbox"
+                      checked={outputParams.includes(col)}
+                      onChange={() => handleParamSelection(col, "output")}
+                      className="mr-2"
+                    />
+                    {col}
+                  </label>
+                  {renderColumnStats(col)}
+                </div>
               ))}
             </div>
           </div>
@@ -7,6 +7,8 @@ const Visualize = () => {
   const [selectedModels, setSelectedModels] = useState([]);
   const [trialMAE, setTrialMAE] = useState({});
   const [trainingTime, setTrainingTime] = useState({});
+  const [servingProfiles, setServingProfiles] = useState({}); // Serving cost per model, if profiled
+  const [profiling, setProfiling] = useState(false);
   const [error, setError] = useState("");
 
 
@@ -28,6 +30,7 @@ const Visualize = () => {
 
     const newTrialMAE = {};
     const newTrainingTime = {};
+    const newServingProfiles = {};
 
     await Promise.all(
       selectedModels.map(async (model) => {
@@ -35,6 +38,9 @@ const Visualize = () => {
           const res = await axios.get(`http://localhost:8000/visualize/data/${model}`);
           newTrialMAE[model] = res.data.trial_mae || [];
           newTrainingTime[model] = res.data.training_time || 0;
+          if (res.data.serving_profile) {
+            newServingProfiles[model] = res.data.serving_profile;
+          }
         } catch {
           setError(`Failed to load data for ${model}`);
         }
@@ -43,6 +49,25 @@ const Visualize = () => {
 
     setTrialMAE(newTrialMAE);
     setTrainingTime(newTrainingTime);
+    setServingProfiles(newServingProfiles);
+  };
+
+  // Measure load time, memory, latency and throughput of the selected models that have no profile yet
+  const handleProfile = async () => {
+    const unprofiled = selectedModels.filter((model) => !servingProfiles[model]);
+    if (unprofiled.length === 0) return;
+    setProfiling(true);
+    const newServingProfiles = { ...servingProfiles };
+    for (const model of unprofiled) {
+      try {
+        const res = await axios.post(`http://localhost:8000/visualize/profile/${model}`);
+        newServingProfiles[model] = res.data;
+      } catch {
+        setError(`Failed to profile ${model}`);
+      }
+    }
+    setServingProfiles(newServingProfiles);
+    setProfiling(false);
   };
 
   const handleModelChange = (e) => {
@@ -80,6 +105,45 @@ const Visualize = () => {
       >
         Visualize
       </button>
+      <button
+        onClick={handleProfile}
+        disabled={selectedModels.length === 0 || profiling}
+        className="w-full mt-2 bg-gray-500 text-white py-2 rounded-md hover:bg-gray-600 focus:outline-none disabled:bg-gray-300"
+      >
+        {profiling ? "Profiling..." : "Profile Serving Cost"}
+      </button>
+
+      {/* Accuracy vs. latency vs. memory of the profiled models */}
+      {Object.keys(servingProfiles).length > 0 && (
+        <div className="mt-6 p-4 bg-white rounded-lg shadow-md">
+          <h4 className="text-lg font-semibold text-center">Test MAE vs. Latency (marker size: memory)</h4>
+          <Plot
+            data={[
+              {
+                x: Object.values(servingProfiles).map((p) => p.single_row_ms.p95),
+                y: Object.values(servingProfiles).map((p) => p.test_mae),
+                text: Object.keys(servingProfiles).map(
+                  (model) =>
+                    `${model} (${servingProfiles[model].runtime}, ${servingProfiles[model].model_rss_mb.toFixed(0)} MB, ` +
+                    `load ${servingProfiles[model].load_seconds.toFixed(2)} s)`
+                ),
+                mode: "markers",
+                type: "scatter",
+                marker: {
+                  size: Object.values(servingProfiles).map((p) => 10 + Math.sqrt(Math.max(p.model_rss_mb, 0)) * 2),
+                  color: "green",
+                },
+              },
+            ]}
+            layout={{
+              xaxis: { title: "Single-row p95 latency (ms)" },
+              yaxis: { title: "Test MAE" },
+              height: 400,
+              width: 1000,
+            }}
+          />
+        </div>
+      )}
 
       {/* Display graphs in a 2x2 grid */}
       {selectedModels.length > 0 && (